@@ -0,0 +1,671 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Benchmark module for Serialization Application
+
+Runs every class registered in encoder.registry and display_output.output_registry on synthetic shot
+datasets and records for every format and dataset size :
+
+    *   Throughput (rows per second and MB per second of output)
+    *   Latency percentiles of the repeated runs
+    *   Peak resident memory (every run is done in a fresh interpreter, so the numbers are not mixed)
+    *   Output file size
+    *   Compression ratio of the serializers for every codec given with --codecs (see scripts/compression.py)
+
+The results are saved as JSON. A stored result file can be used as baseline, any format which got slower,
+bigger or hungrier than the threshold is reported as a regression and the exit code is 1.
+
+Usage :
+    python benchmark.py --sizes 1000 100000 --output results.json
+    python benchmark.py --sizes 1000 100000 --compare results.json --threshold 0.1
+    python benchmark.py --formats JsonSerializer HtmlExporter --decode
+    python benchmark.py --sizes 100000 --decode --codecs none zlib bz2    # compression ratio against speed
+    python benchmark.py --records --rows 100000     # compare the OrderedDict and Record layouts
+    python benchmark.py --pickle --rows 100000      # compare the pickle protocols with the old protocol 0 writer
+    python benchmark.py --startup                   # import time of the application against STARTUP_BUDGET
+    python benchmark.py --server --rows 10          # request latency of the server against a fresh process
+    python benchmark.py --schema --rows 1000000     # parse time with and without the schema validation
+    python benchmark.py --columnar --rows 1000000   # read time of the FrameNum column, with and without schema
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import pickle
+import platform
+import resource
+import tempfile
+import subprocess
+from collections import OrderedDict
+
+import config
+from scripts import encoder, columnar, display_output, parser, compression
+from scripts.common import io
+from scripts.records import record_type
+
+SHOT_HEADERS = ["Sequence", "ShotName", "FrameNum", "Assignee"]
+ARTISTS = ["Unassigned", "Bob", "Kathy", "Josh", "Kyle", "Samual", "David"]
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+# Maximum median time in seconds for importing the application in a fresh interpreter
+STARTUP_BUDGET = 0.15
+
+# Modules which should never be imported by `import serialization_app`, they are imported on first use
+STARTUP_LAZY_MODULES = ["multiprocessing", "argparse", "webbrowser", "scripts.columnar", "scripts.sharding",
+                        "scripts.incremental", "scripts.batch", "scripts.transcode",
+                        "scripts.html_pages"]
+
+STARTUP_SCRIPT = """
+import sys, time, json
+start_time = time.time()
+import serialization_app
+duration = time.time() - start_time
+print(json.dumps([duration, sorted(name for name, module in sys.modules.items() if module is not None)]))
+"""
+
+# Schema of the synthetic shot rows, for --schema
+SHOT_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "shot_schema.json")
+
+# Metrics which are checked against the baseline. 1 : bigger is a regression, -1 : smaller is a regression
+REGRESSION_METRICS = {
+    "throughput_rows_per_sec": -1,
+    "peak_rss_bytes": 1,
+    "output_bytes": 1,
+}
+
+
+def synthetic_rows(rows):
+    """
+    Generate the synthetic shot rows, same shape as the template database
+    """
+    for index in xrange(rows):
+        yield ["sq%03d0" % (index // 1000), "sh%07d" % index, str(index % 250 + 1), ARTISTS[index % len(ARTISTS)]]
+
+
+def build_rows(layout, rows):
+    """
+    Build the rows in the given layout. `layout` is "OrderedDict" or "Record"
+    """
+    if layout == "OrderedDict":
+        return [OrderedDict(zip(SHOT_HEADERS, data)) for data in synthetic_rows(rows)]
+
+    shot_record = record_type(SHOT_HEADERS)
+    return [shot_record(data) for data in synthetic_rows(rows)]
+
+
+def write_synthetic_csv(filePath, rows):
+    """
+    Write a synthetic shot database with given number of rows, If it does not exist already
+    """
+    if os.path.isfile(filePath):
+        return filePath
+
+    temp_path = filePath + ".tmp"
+    with open(temp_path, "wb") as csv_write:
+        writer = csv.writer(csv_write, delimiter=',', quotechar='|')
+        writer.writerow(SHOT_HEADERS)
+        writer.writerows(synthetic_rows(rows))
+    os.rename(temp_path, filePath)
+    return filePath
+
+
+def get_benchmark_formats(names=None):
+    """
+    All the registered serializers and exporters, as a list of (kind, name, class)
+    """
+    formats = [("serializer", name, cls) for name, cls in sorted(encoder.registry.items())]
+    formats += [("exporter", name, cls) for name, cls in sorted(display_output.output_registry.items())]
+    if names:
+        formats = [each_format for each_format in formats if each_format[1] in names]
+    return formats
+
+
+def resident_memory():
+    """
+    Current resident memory of this process in bytes.
+
+    ru_maxrss is inherited from the parent process on linux, so /proc is preferred when it exists.
+    """
+    if os.path.isfile("/proc/self/statm"):
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    return peak_memory()
+
+
+def peak_memory():
+    """
+    Peak resident memory of this process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of the values
+    """
+    ordered = sorted(values)
+    rank = int(-(-percent * len(ordered) // 100))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def output_size(filePath):
+    """
+    Size in bytes of an output file, or of all the files of an output directory
+    """
+    if os.path.isdir(filePath):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(filePath) for name in names)
+    return os.path.getsize(filePath)
+
+
+def run_trial(kind, name, operation, csv_path, output_path):
+    """
+    Run one timed operation in this process and return the measurements.
+    Called in a fresh interpreter by measure_trial()
+    """
+    cls = dict((each[1], each[2]) for each in get_benchmark_formats())[name]
+    user_data = parser.DataContainer(information={"filePath": csv_path})
+
+    # the codec of the serializers is given by the extension of the output path
+    codec_name = compression.get_codec_name(output_path)
+
+    start_time = time.time()
+    if operation == "decode":
+        for _ in cls.decode(filePath=output_path):
+            pass
+    elif operation == "encode":
+        cls(data=user_data).encode(filePath=output_path, compression=codec_name)
+    else:
+        cls(data=user_data).export(filePath=output_path)
+    duration = time.time() - start_time
+
+    result = {"duration": duration, "peak_rss_bytes": peak_memory(), "output_bytes": output_size(output_path)}
+    if codec_name:
+        result["uncompressed_bytes"] = compression.get_uncompressed_size(output_path)
+    return result
+
+
+def measure_trial(kind, name, operation, csv_path, output_path):
+    """
+    Run one trial in a fresh interpreter and return its measurements
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--trial", kind, name, operation, csv_path, output_path]
+    output = subprocess.check_output(command)
+    # io messages are printed as well, the result is always on the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmarks(sizes, repeat=3, formats=None, decode=False, data_dir=None, codecs=None):
+    """
+    Benchmark all the registered formats on all the dataset sizes.
+
+    :param  `codecs`   `list`   Compression codecs of the serializers, "none" is uncompressed. Default is ["none"]
+
+    :return  `dict`   Result document which can be saved as JSON and used as baseline.
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix="serialization_benchmark_")
+    work_dir = tempfile.mkdtemp(prefix="serialization_outputs_")
+    results = list()
+    try:
+        for rows in sizes:
+            io.info("Preparing synthetic dataset with %s rows" % rows)
+            csv_path = write_synthetic_csv(os.path.join(data_dir, "shots_%d.csv" % rows), rows)
+
+            for kind, name, cls in get_benchmark_formats(formats):
+                extension = cls.TEMP_FILE_EXT if kind == "serializer" else cls.EXPORT_FILE_EXT
+                output_path = os.path.join(work_dir, "%s_%d%s" % (name, rows, extension))
+
+                if kind == "exporter":
+                    operations = ["export"]
+                    format_codecs = [None]
+                else:
+                    operations = ["encode", "decode"] if decode else ["encode"]
+                    format_codecs = [None if codec == "none" else codec for codec in codecs or ["none"]]
+
+                for codec in format_codecs:
+                    codec_path = compression.get_compressed_path(output_path, codec)
+                    for operation in operations:
+                        trials = [measure_trial(kind, name, operation, csv_path, codec_path) for _ in xrange(repeat)]
+                        result = summarize(kind, name, operation, rows, trials, codec=codec)
+                        results.append(result)
+                        print_result(result)
+    finally:
+        shutil.rmtree(work_dir)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def summarize(kind, name, operation, rows, trials, codec=None):
+    """
+    Collect the measurements of the trials of one format in one result
+    """
+    durations = [trial["duration"] for trial in trials]
+    median = percentile(durations, 50)
+    output_bytes = trials[-1]["output_bytes"]
+    uncompressed_bytes = trials[-1].get("uncompressed_bytes", output_bytes)
+    return OrderedDict([
+        ("kind", kind),
+        ("name", name),
+        ("operation", operation),
+        ("codec", codec),
+        ("rows", rows),
+        ("durations", durations),
+        ("latency", OrderedDict([("min", min(durations)),
+                                 ("p50", median),
+                                 ("p90", percentile(durations, 90)),
+                                 ("p99", percentile(durations, 99)),
+                                 ("max", max(durations)),
+                                 ("mean", sum(durations) / len(durations))])),
+        ("throughput_rows_per_sec", rows / median if median else None),
+        ("throughput_mb_per_sec", output_bytes / 1024.0 / 1024.0 / median if median else None),
+        ("peak_rss_bytes", max(trial["peak_rss_bytes"] for trial in trials)),
+        ("output_bytes", output_bytes),
+        ("compression_ratio", float(uncompressed_bytes) / output_bytes if output_bytes else None),
+    ])
+
+
+def print_result(result):
+    message = "{kind:<10} {name:<20} {operation:<6} {codec_name:<5} {rows:>9} rows : p50 {p50:>8.3f} sec " \
+              "| {rate:>11.0f} rows/sec | peak {rss:>8.1f} MB | output {size:>9.1f} MB | ratio {ratio:>5.2f}"
+    io.echo(message.format(p50=result["latency"]["p50"], rate=result["throughput_rows_per_sec"] or 0,
+                           rss=result["peak_rss_bytes"] / 1024.0 / 1024.0,
+                           size=result["output_bytes"] / 1024.0 / 1024.0, codec_name=result.get("codec") or "none",
+                           ratio=result.get("compression_ratio") or 0, **result))
+
+
+def _result_key(result):
+    return result["kind"], result["name"], result["operation"], result.get("codec"), result["rows"]
+
+
+def compare_results(current, baseline, threshold=0.1):
+    """
+    Compare a result document against a baseline document.
+
+    :return  `list`   One dict for every metric which regressed more than the threshold.
+    """
+    baseline_results = dict((_result_key(result), result) for result in baseline["results"])
+    regressions = list()
+    for result in current["results"]:
+        old_result = baseline_results.get(_result_key(result))
+        if old_result is None:
+            continue
+
+        for metric, direction in sorted(REGRESSION_METRICS.items()):
+            old_value, new_value = old_result.get(metric), result.get(metric)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / float(old_value)
+            if change * direction > threshold:
+                regressions.append({"kind": result["kind"], "name": result["name"],
+                                    "operation": result["operation"], "codec": result.get("codec"),
+                                    "rows": result["rows"],
+                                    "metric": metric, "baseline": old_value, "current": new_value,
+                                    "change": change})
+    return regressions
+
+
+def measure_memory(layout, rows):
+    """
+    Memory in bytes used for holding the rows. Measured in a fresh interpreter for clean numbers.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--memory_worker", layout, "--rows", str(rows)]
+    return int(subprocess.check_output(command).strip())
+
+
+def memory_worker(layout, rows):
+    """
+    Build the rows and print the growth of the memory in bytes. Used by measure_memory()
+    """
+    before = resident_memory()
+    data = build_rows(layout, rows)
+    print(resident_memory() - before)
+    return data
+
+
+def measure_encode(layout, rows, serializer_class):
+    """
+    Time in seconds taken by the serializer to encode the rows
+    """
+    data = build_rows(layout, rows)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        filePath = os.path.join(temp_dir, "benchmark" + serializer_class.TEMP_FILE_EXT)
+        serializer = serializer_class(data=data)
+        start_time = time.time()
+        with open(filePath, serializer.WRITE_MODE) as writeFile:
+            serializer.write(writeFile, data)
+        return time.time() - start_time
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def run_records_benchmark(rows):
+    """
+    Compare the OrderedDict and Record layouts and print the results in terminal
+    """
+    io.info("Benchmarking record layouts with %s rows" % rows)
+    for layout in ["OrderedDict", "Record"]:
+        memory = measure_memory(layout, rows)
+        io.echo("{0:<12} memory : {1:>8.1f} MB ({2:.0f} bytes per row)".format(
+            layout, memory / 1024.0 / 1024.0, float(memory) / rows))
+
+        for serializer_class in [encoder.JsonSerializer, encoder.PickleSerializer]:
+            duration = measure_encode(layout, rows, serializer_class)
+            io.echo("{0:<12} {1:<16} : {2:>8.3f} sec".format(layout, serializer_class.__name__, duration))
+
+
+def measure_startup(repeat=5):
+    """
+    Import the application in `repeat` fresh interpreters.
+
+    :return  `tuple`   (median import time in seconds, modules imported by the application)
+    """
+    durations = list()
+    modules = list()
+    for _ in xrange(repeat):
+        output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        duration, modules = json.loads(output.strip().splitlines()[-1])
+        durations.append(duration)
+    return percentile(durations, 50), modules
+
+
+def run_startup_benchmark(repeat=5):
+    """
+    Print the import time of the application and check it against STARTUP_BUDGET
+
+    :return  `bool`   True If the import time is in the budget and no lazy module is imported at startup
+    """
+    duration, modules = measure_startup(repeat=repeat)
+    eager_modules = [name for name in STARTUP_LAZY_MODULES if name in modules]
+    io.echo("import serialization_app : {0:.1f} ms (budget {1:.1f} ms), {2} modules".format(
+        duration * 1000, STARTUP_BUDGET * 1000, len(modules)))
+    if eager_modules:
+        io.error("Modules imported at startup, they should be imported on first use : %s" % eager_modules)
+    if duration > STARTUP_BUDGET:
+        io.error("Startup is over the budget")
+    return duration <= STARTUP_BUDGET and not eager_modules
+
+
+def write_legacy_pickle(stream, records):
+    """
+    The pickle writer of the older versions : pure python pickle, text protocol 0, one dump() per record
+    """
+    for each_record in records:
+        pickle.dump(each_record, stream)
+
+
+def read_legacy_pickle(filePath):
+    """
+    The pickle reader of the older versions : pure python pickle, one load() per record
+    """
+    records = list()
+    with open(filePath, "rb") as readFile:
+        while True:
+            try:
+                records.append(pickle.load(readFile))
+            except EOFError:
+                return records
+
+
+def run_pickle_benchmark(rows):
+    """
+    Compare the size and speed of the PickleSerializer for every pickle protocol against the older
+    protocol 0 writer, and print the results in terminal
+    """
+    io.info("Benchmarking pickle protocols with %s rows" % rows)
+    data = build_rows("Record", rows)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        filePath = os.path.join(temp_dir, "benchmark" + encoder.PickleSerializer.TEMP_FILE_EXT)
+        runs = [("legacy", write_legacy_pickle, read_legacy_pickle)]
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            runs.append(("protocol %s" % protocol, encoder.PickleSerializer(data=data, protocol=protocol).write,
+                         encoder.PickleSerializer.read_file))
+
+        for label, write, read in runs:
+            start_time = time.time()
+            with open(filePath, "wb") as writeFile:
+                write(writeFile, data)
+            encode_time = time.time() - start_time
+
+            start_time = time.time()
+            decoded = read(filePath)
+            decode_time = time.time() - start_time
+            assert len(decoded) == rows
+            io.echo("{0:<12} size : {1:>8.1f} MB   encode : {2:>8.3f} sec   decode : {3:>8.3f} sec".format(
+                label, os.path.getsize(filePath) / 1024.0 / 1024.0, encode_time, decode_time))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def measure_process_request(records, repeat=5):
+    """
+    Median time of serializing the records in a fresh interpreter, like one run of the application per request
+    """
+    script = ("import sys, json; from scripts import encoder; "
+              "encoder.JsonSerializer(data=json.load(sys.stdin)).encode_string()")
+    durations = list()
+    for _ in xrange(repeat):
+        start_time = time.time()
+        process = subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        process.communicate(json.dumps(records))
+        durations.append(time.time() - start_time)
+    return percentile(durations, 50)
+
+
+def run_server_benchmark(rows, requests=200, clients=4):
+    """
+    Print the request latency of the serialization server (one client) and its throughput with concurrent
+    clients, against serializing the same records in a fresh process
+    """
+    import threading
+    from scripts import server
+
+    records = [OrderedDict(zip(SHOT_HEADERS, data)) for data in synthetic_rows(rows)]
+    process_time = measure_process_request(records)
+    io.echo("fresh process      : {0:>8.2f} ms per request".format(process_time * 1000))
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for label, address in [("http", {"port": 0}), ("unix socket", {"socket_path": os.path.join(temp_dir, "sock")})]:
+            with server.SerializationServer(**address) as serialization_server:
+                serialization_server.start()
+                if "port" in address:
+                    address = {"port": serialization_server.address[1]}
+
+                with server.ServerClient(**address) as client:
+                    durations = list()
+                    for _ in xrange(requests):
+                        start_time = time.time()
+                        client.encode("JsonSerializer", records)
+                        durations.append(time.time() - start_time)
+
+                def send_requests():
+                    with server.ServerClient(**address) as client:
+                        for _ in xrange(requests // clients):
+                            client.encode("JsonSerializer", records)
+
+                threads = [threading.Thread(target=send_requests) for _ in xrange(clients)]
+                start_time = time.time()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                throughput = clients * (requests // clients) / (time.time() - start_time)
+
+            io.echo("server {0:<11} : p50 {1:>6.2f} ms   p95 {2:>6.2f} ms   {3} clients : {4:>8.0f} "
+                    "requests/sec".format(label, percentile(durations, 50) * 1000, percentile(durations, 95) * 1000,
+                                          clients, throughput))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def run_schema_benchmark(rows, repeat=3):
+    """
+    Print the time of parsing a CSV file without and with the validation of SHOT_SCHEMA_FILE
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        filePath = write_synthetic_csv(os.path.join(temp_dir, "shots_%s.csv" % rows), rows)
+        durations = dict()
+        for label, schema_file in [("no schema", None), ("schema", SHOT_SCHEMA_FILE)]:
+            config.SCHEMA_FILE = schema_file
+            trials = list()
+            for _ in xrange(repeat):
+                start_time = time.time()
+                count = sum(1 for _ in parser.DataContainer(information={"filePath": filePath}))
+                trials.append(time.time() - start_time)
+                assert count == rows
+            durations[label] = percentile(trials, 50)
+            io.echo("{0:<10} : {1:>8.3f} sec   {2:>10.0f} rows/sec".format(label, durations[label],
+                                                                          rows / durations[label]))
+        io.echo("validation adds {0:.1%} to the parse time".format(
+            durations["schema"] / durations["no schema"] - 1))
+    finally:
+        config.SCHEMA_FILE = None
+        shutil.rmtree(temp_dir)
+
+
+def run_columnar_benchmark(rows, repeat=3):
+    """
+    Print the decode time of a columnar file and the read time of its FrameNum column, for the CSV file
+    serialized with the default settings (text column) and with SHOT_SCHEMA_FILE (int64 column)
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        csvPath = write_synthetic_csv(os.path.join(temp_dir, "shots_%s.csv" % rows), rows)
+        filePath = os.path.join(temp_dir, "shots" + columnar.ColumnarSerializer.TEMP_FILE_EXT)
+        for label, schema_file in [("no schema", None), ("schema", SHOT_SCHEMA_FILE)]:
+            config.SCHEMA_FILE = schema_file
+            columnar.ColumnarSerializer(data=parser.DataContainer(information={"filePath": csvPath})).encode(
+                filePath=filePath)
+
+            decode_trials, read_trials = list(), list()
+            for _ in xrange(repeat):
+                start_time = time.time()
+                dataset = columnar.ColumnarSerializer.decode(filePath=filePath)
+                decode_trials.append(time.time() - start_time)
+
+                frames = dataset.columns["FrameNum"]
+                start_time = time.time()
+                values = frames.toarray() if isinstance(frames, columnar.IntColumn) else frames.tolist()
+                read_trials.append(time.time() - start_time)
+                assert len(values) == rows
+                dataset.close()
+            io.echo("{0:<10} : {1:<12} decode : {2:>8.4f} sec   FrameNum : {3:>8.4f} sec".format(
+                label, type(frames).__name__, percentile(decode_trials, 50), percentile(read_trials, 50)))
+    finally:
+        config.SCHEMA_FILE = None
+        shutil.rmtree(temp_dir)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Benchmarks for the serialization app')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Number of rows of the synthetic datasets')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs for every format and size')
+    parser.add_argument('--formats', type=str, nargs='+', help='Names of the registered classes to benchmark')
+    parser.add_argument('--decode', action='store_true', help='Benchmark decode of the serializers as well')
+    parser.add_argument('--data_dir', type=str, help='Directory for keeping the synthetic csv files')
+    parser.add_argument('--codecs', type=str, nargs='+', choices=["none"] + compression.codecs.keys(),
+                        help='Compression codecs of the serializers. Default is none')
+    parser.add_argument('--output', type=str, help='Save the results in this JSON file')
+    parser.add_argument('--compare', type=str, help='Baseline JSON file to compare the results with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Allowed relative change against the baseline, 0.1 is 10%%')
+
+    parser.add_argument('--records', action='store_true', help='Compare the OrderedDict and Record layouts')
+    parser.add_argument('--pickle', action='store_true',
+                        help='Compare the pickle protocols with the old protocol 0 writer')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the import time of the application against the startup budget')
+    parser.add_argument('--server', action='store_true',
+                        help='Measure the request latency of the serialization server against a fresh process')
+    parser.add_argument('--schema', action='store_true',
+                        help='Measure the parse time with and without the schema validation')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Measure the read time of the columnar FrameNum column with and without schema')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='Number of rows for --records, --pickle, --schema and --columnar, rows per request '
+                             'for --server')
+
+    parser.add_argument('--trial', type=str, nargs=5, help=argparse.SUPPRESS)
+    parser.add_argument('--memory_worker', type=str, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    if args.trial:
+        print(json.dumps(run_trial(*args.trial)))
+        return 0
+
+    if args.memory_worker:
+        memory_worker(layout=args.memory_worker, rows=args.rows)
+        return 0
+
+    if args.records:
+        run_records_benchmark(rows=args.rows)
+        return 0
+
+    if args.pickle:
+        run_pickle_benchmark(rows=args.rows)
+        return 0
+
+    if args.startup:
+        return 0 if run_startup_benchmark(repeat=args.repeat) else 1
+
+    if args.server:
+        run_server_benchmark(rows=args.rows)
+        return 0
+
+    if args.schema:
+        run_schema_benchmark(rows=args.rows, repeat=args.repeat)
+        return 0
+
+    if args.columnar:
+        run_columnar_benchmark(rows=args.rows, repeat=args.repeat)
+        return 0
+
+    report = run_benchmarks(sizes=args.sizes, repeat=args.repeat, formats=args.formats, decode=args.decode,
+                            data_dir=args.data_dir, codecs=args.codecs)
+    if args.output:
+        with open(args.output, "w") as writeFile:
+            json.dump(report, writeFile, indent=4)
+        io.info("Benchmark results saved here :  %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as readFile:
+            baseline = json.load(readFile)
+
+        regressions = compare_results(report, baseline, threshold=args.threshold)
+        for regression in regressions:
+            io.error("REGRESSION {kind} {name} {operation} {rows} rows : {metric} {baseline:.4g} -> {current:.4g} "
+                     "({change:+.1%})".format(**regression))
+        if regressions:
+            return 1
+        io.info("No regression against the baseline %s" % args.compare)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,9 +22,123 @@ OUTPUT_DIRECTORY = os.path.join(PACKAGE_DIRECTORY, "output_files")
 SERIALIZE_FILE_NAME = "serialized_data"
 OUTPUT_FILE_NAME = "display_output"
 
-for directory in [OUTPUT_DIRECTORY, OUTPUT_DIRECTORY]:
-    if not os.path.isdir(directory):
-        os.makedirs(directory)
+# Columns of the columnar files with at most this many distinct values are dictionary encoded. 0 turns it off
+COLUMNAR_DICTIONARY_SIZE = 65536
+
+# The records of the parser which are all kept in memory share one string for every value of the columns with at
+# most this many distinct values in the first SHARED_VALUES_SAMPLE_ROWS rows. 0 turns it off
+SHARED_VALUES_MAX = 256
+SHARED_VALUES_SAMPLE_ROWS = 1000
+
+# Rows per page of the html display output. None writes all the rows in one html file, see scripts/html_pages.py
+HTML_PAGE_SIZE = None
+
+# The index page of the paginated html output lists the pages of every value of this field
+HTML_INDEX_FIELD = "Sequence"
+
+# Also write the virtual scrolling viewer with the paginated html output
+HTML_VIEWER = False
+
+# Write the outputs of every run in its own directory, OUTPUT_DIRECTORY/runs/<run id>
+OUTPUT_PER_RUN = False
+
+# Buffer size in bytes used for writing the output files
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Flush the output files to the disk before they are renamed in place. None, "file", or "full" (also the
+# directory, so the rename survives a power failure). See common.AtomicFile
+OUTPUT_FSYNC = None
+
+# Write an offset index next to every serialized file, for random access decode of single records
+WRITE_OFFSET_INDEX = False
+
+# Secondary indexes written next to every serialized file, {field: "hash" or "sorted"}. See scripts/secondary_index.py
+SECONDARY_INDEXES = dict()
+
+# Compression codec of the serialized files ("zlib", "gzip", "bz2" or "lzma"). None writes them uncompressed
+COMPRESSION = None
+
+# Compression level of the codec. None is the default level of the codec
+COMPRESSION_LEVEL = None
+
+# Size in bytes of the uncompressed chunks. A random access read decompresses one chunk
+COMPRESSION_CHUNK_SIZE = 256 * 1024
+
+# Write the json files without indentation and spaces. The default pretty printed files are much bigger
+JSON_COMPACT = False
+
+# Json module for decoding whole json files. "json" is the standard library. The faster backends ("orjson", "ujson",
+# "simplejson", or None for the fastest installed one) decode the same files to str or unicode, and the floats
+# differently, so they are only used when they are set here
+JSON_BACKEND = "json"
+
+# Pickle protocol of the PickleSerializer. None is the highest protocol of the interpreter, 0 is the old text format
+PICKLE_PROTOCOL = None
+
+# Number of records which share the pickle memo, the repeated values of these records are written only once.
+# Not used when an offset index is written, every record is pickled on its own then
+PICKLE_MEMO_RECORDS = 1000
+
+# Block size in bytes used for streaming the records out of the serialized files
+READ_BLOCK_SIZE = 64 * 1024
+
+# Number of requests the encode_async(), decode_async() and export_async() methods run at the same time
+BACKGROUND_WORKERS = 4
+
+# "thread" or "process" pool of the background requests. See scripts/background.py
+BACKGROUND_EXECUTOR = "thread"
+
+# Number of background requests which can wait for a worker before the caller is blocked. None is unbounded
+BACKGROUND_MAX_PENDING = None
+
+# Maximum estimated memory size in bytes of the decoded data kept by the decode cache
+DECODE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Directory for the on-disk decode cache. None keeps the decoded data in memory only
+DECODE_CACHE_DIRECTORY = None
+
+# Lowest level of the printed messages, "DEBUG", "INFO", "WARN" or "ERROR"
+LOG_LEVEL = "INFO"
+
+# Number of message lines buffered before they are written in terminal
+LOG_BUFFER_LINES = 64
+
+# Record the metrics of every encode, decode and export. See scripts/metrics.py
+METRICS_ENABLED = True
+
+# Number of the last traced operations kept in memory
+METRICS_TRACE_SIZE = 1000
+
+# Schema file of the CSV rows, see scripts/schema.py. None reads all the values as text without validation
+SCHEMA_FILE = None
+
+# What happens to the invalid rows, "skip" drops and reports them, "fail" raises an error after reading all the rows
+SCHEMA_ERRORS = "skip"
+
+# Number of rows validated in one batch
+SCHEMA_BATCH_ROWS = 1000
+
+# Maximum number of errors kept in the validation report
+SCHEMA_MAX_ERRORS = 100
+
+# Infer the schema from the first rows of the file when there is no schema file. False reads the values as text
+SCHEMA_INFER = False
+
+# Number of rows sampled for the inferred schema
+SCHEMA_INFER_ROWS = 1000
+
+# Address of the serialization server. See scripts/server.py
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Seconds the server waits for more requests to batch with the first one. 0 batches only the waiting requests
+SERVER_BATCH_WINDOW = 0.0
+
+# Maximum number of requests the server runs in one batch
+SERVER_MAX_BATCH = 64
+
+# Seconds a ServerClient waits for the response of the server
+SERVER_REQUEST_TIMEOUT = 60
 
 
 def update_sys_path():
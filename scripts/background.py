@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for running the serializers and exporters in the background.
+
+encode_async(), decode_async() and export_async() hand the work over to a pool of threads (or processes for the
+CPU bound encoding) and return a BackgroundTask at once, so the caller is not blocked by the file I/O and the
+encoding. Many small requests run side by side instead of queueing behind each other.
+
+    *   `workers`       : Number of requests which run at the same time
+    *   `max_pending`   : Number of requests which can wait for a worker. submit() blocks when the queue is full,
+                          so a busy service does not pile up requests in memory
+
+    Example :
+        task = encoder.JsonSerializer(data=user_data).encode_async(filePath)
+        ...
+        filePath = task.get()
+
+The pool is bounded, `workers` threads or processes and at most `max_pending` waiting requests. A service is
+notified of the finished tasks through BackgroundTask.add_done_callback().
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import threading
+import traceback
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import config
+
+PROCESS = "process"
+THREAD = "thread"
+EXECUTORS = [PROCESS, THREAD]
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def call_method(target, method_name, args, kwargs):
+    """
+    Call a method of an object or a class. Bound methods can not be pickled in python 2,
+    so the process workers get the object and the method name.
+    """
+    return getattr(target, method_name)(*args, **kwargs)
+
+
+def _run_task(function, args, kwargs):
+    # errors are returned, not raised, so the result callback of the pool is always called
+    try:
+        return True, function(*args, **kwargs)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def _run_pickled_task(data):
+    """
+    Run a task of the process executor. The call comes in pickled and the outcome goes back pickled. The pool
+    only calls its result callback for a result which it could pickle, so an outcome which can not be pickled
+    is sent back as the error of the task.
+    """
+    try:
+        function, args, kwargs = pickle.loads(data)
+    except Exception:
+        outcome = False, traceback.format_exc()
+    else:
+        outcome = _run_task(function, args, kwargs)
+    try:
+        return pickle.dumps(outcome, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return pickle.dumps((False, traceback.format_exc()), pickle.HIGHEST_PROTOCOL)
+
+
+class BackgroundError(Exception):
+    """
+    Error raised in a background task. The message has the traceback of the worker.
+    """
+
+
+class BackgroundTask(object):
+    """
+    Result of a request running in the background
+    """
+
+    def __init__(self):
+        super(BackgroundTask, self).__init__()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = list()
+        self._succeeded = None
+        self._value = None
+
+    def _finish(self, outcome):
+        with self._lock:
+            self._succeeded, self._value = outcome
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, list()
+        for callback in callbacks:
+            callback(self)
+
+    def ready(self):
+        return self._done.is_set()
+
+    def successful(self):
+        if not self.ready():
+            raise ValueError("Background task is not finished yet")
+        return self._succeeded
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.ready()
+
+    def get(self, timeout=None):
+        """
+        Result of the request. Errors of the request are raised again as BackgroundError
+        """
+        if not self.wait(timeout):
+            raise RuntimeError("Background task is not finished after %s sec" % timeout)
+        if not self._succeeded:
+            raise BackgroundError(self._value)
+        return self._value
+
+    def add_done_callback(self, callback):
+        """
+        Call callback(task) when the task is finished, from the thread which finished it.
+        Called at once If the task is already finished.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+
+class BackgroundExecutor(object):
+    """
+    Bounded pool of workers for the background requests
+
+    @:param `workers`       `int`   : Number of requests running at the same time. Default is config.BACKGROUND_WORKERS
+    @:param `executor`      `str`   : "thread" or "process". Processes do not share the GIL, but the data and the
+                                      results are pickled to and from the workers
+    @:param `max_pending`   `int`   : Number of requests waiting for a worker before submit() blocks.
+                                      Default is config.BACKGROUND_MAX_PENDING, None is unbounded
+    """
+
+    def __init__(self, workers=None, executor=THREAD, max_pending=None):
+        super(BackgroundExecutor, self).__init__()
+        if executor not in EXECUTORS:
+            raise ValueError("Unknown executor %r. Use one of %s" % (executor, EXECUTORS))
+        self.workers = workers or config.BACKGROUND_WORKERS
+        self.executor = executor
+        max_pending = config.BACKGROUND_MAX_PENDING if max_pending is None else max_pending
+        self._slots = threading.BoundedSemaphore(self.workers + max_pending) if max_pending is not None else None
+
+        # multiprocessing is slow to import, it is only imported when an executor is created
+        import multiprocessing
+        from multiprocessing.pool import ThreadPool
+        if executor == THREAD:
+            self._pool = ThreadPool(processes=self.workers)
+        else:
+            self._pool = multiprocessing.Pool(processes=self.workers)
+        self.closed = False
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Run function(*args, **kwargs) in the pool. With the process executor the function and its
+        arguments have to be picklable, use call_method() for methods. They are pickled here, so a call
+        which can not be pickled raises at once.
+
+        :return  `BackgroundTask`
+        """
+        if self.closed:
+            raise RuntimeError("Background executor is closed")
+        data = None
+        if self.executor == PROCESS:
+            data = pickle.dumps((function, args, kwargs), pickle.HIGHEST_PROTOCOL)
+        if self._slots is not None:
+            self._slots.acquire()
+
+        task = BackgroundTask()
+
+        def finish(outcome):
+            if self._slots is not None:
+                self._slots.release()
+            task._finish(outcome)
+
+        def finish_pickled(outcome_data):
+            try:
+                outcome = pickle.loads(outcome_data)
+            except Exception:
+                outcome = False, traceback.format_exc()
+            finish(outcome)
+
+        try:
+            if data is None:
+                self._pool.apply_async(_run_task, (function, args, kwargs), callback=finish)
+            else:
+                self._pool.apply_async(_run_pickled_task, (data,), callback=finish_pickled)
+        except Exception:
+            finish((False, traceback.format_exc()))
+        return task
+
+    def submit_method(self, target, method_name, *args, **kwargs):
+        """
+        Run target.method_name(*args, **kwargs) in the pool
+        """
+        return self.submit(call_method, target, method_name, args, kwargs)
+
+    def close(self):
+        """
+        Wait for the submitted requests and stop the workers
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_default_executor():
+    """
+    Shared BackgroundExecutor of the *_async() methods. It is created on first use
+    with config.BACKGROUND_WORKERS and config.BACKGROUND_EXECUTOR.
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None or _default_executor.closed:
+            _default_executor = BackgroundExecutor(executor=config.BACKGROUND_EXECUTOR)
+        return _default_executor
+
+
+def shutdown():
+    """
+    Wait for the requests of the default executor and stop its workers
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is not None:
+            _default_executor.close()
+            _default_executor = None
+
+
+def submit_method(target, method_name, args, kwargs, executor=None):
+    """
+    Run a method of a serializer or exporter in the given executor, or in the default one
+    """
+    return (executor or get_default_executor()).submit_method(target, method_name, *args, **kwargs)
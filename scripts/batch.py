@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the batch mode. Many CSV files are serialized and exported in one run of the application.
+
+Launching the application once per file pays the interpreter startup and the imports for every file. The batch
+mode takes files, directories (all the .csv files in them) and glob patterns, and runs all the registered formats
+for every input in a pool of `jobs` processes. Every input gets its own output directory, named after the file :
+
+    output_files/batch/shots_a/serialized_data.json
+    output_files/batch/shots_b/serialized_data.json
+
+    Example :
+        summaries = run_batch(collect_inputs(["nightly/*.csv", "extra_shots.csv"]), jobs=4)
+        report_batch(summaries)
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import glob
+import time
+import traceback
+
+import config
+from scripts import metrics, parser, runner, sharding
+from scripts.common import io
+
+BATCH_DIRECTORY = "batch"
+INPUT_EXT = ".csv"
+
+
+def collect_inputs(patterns):
+    """
+    CSV files of the batch, in the given order and without duplicates
+
+    @:param `patterns`   `list`   : File paths, directories and glob patterns
+    """
+    filePaths = list()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*" + INPUT_EXT)))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+
+        if not matches:
+            io.warn("No input file found for %s" % pattern)
+        for filePath in matches:
+            if not filePath.lower().endswith(INPUT_EXT) or not os.path.isfile(filePath):
+                io.warn("Skipping %s, it is not a %s file." % (filePath, INPUT_EXT))
+                continue
+            filePaths.append(filePath)
+
+    seen = set()
+    return [filePath for filePath in filePaths
+            if os.path.abspath(filePath) not in seen and not seen.add(os.path.abspath(filePath))]
+
+
+def get_output_directories(filePaths, output_directory=None):
+    """
+    Distinct output directory for every input, named after the file. "shots.csv" -> "<output>/shots",
+    a second "shots.csv" from another directory -> "<output>/shots-2"
+    """
+    output_directory = output_directory or os.path.join(config.OUTPUT_DIRECTORY, BATCH_DIRECTORY)
+    directories = list()
+    used = set()
+    for filePath in filePaths:
+        name = os.path.splitext(os.path.basename(filePath))[0]
+        candidate, count = name, 1
+        while candidate in used:
+            count += 1
+            candidate = "%s-%s" % (name, count)
+        used.add(candidate)
+        directories.append(os.path.join(output_directory, candidate))
+    return directories
+
+
+class _CountingContainer(parser.DataContainer):
+    """
+    DataContainer which keeps the number of rows read by the last complete iteration
+    """
+
+    rows = None
+
+    def __iter__(self):
+        rows = 0
+        for each_record in super(_CountingContainer, self).__iter__():
+            rows += 1
+            yield each_record
+        self.rows = rows
+
+
+def process_input(task):
+    """
+    Run all the formats for one input file. Errors are returned in the summary, so one broken
+    input does not stop the batch.
+
+    :return  `dict`   input, output_directory, rows, input_bytes, output_bytes, duration, results and error
+    """
+    filePath, output_directory, names = task
+    summary = {"input": filePath, "output_directory": output_directory, "rows": 0, "input_bytes": 0,
+               "output_bytes": 0, "duration": 0.0, "results": list(), "error": None}
+    start_time = time.time()
+    try:
+        if not os.path.isdir(output_directory):
+            os.makedirs(output_directory)
+        summary["input_bytes"] = os.path.getsize(filePath)
+
+        user_data = _CountingContainer(information={"filePath": filePath})
+        results = runner.run_all_formats(user_data, jobs=1, names=names, output_directory=output_directory)
+        summary["results"] = results
+        summary["rows"] = user_data.rows or 0
+        summary["output_bytes"] = sum(os.path.getsize(result["filePath"]) for result in results
+                                      if result["filePath"] and os.path.isfile(result["filePath"]))
+
+        errors = ["%s : %s" % (result["name"], result["error"]) for result in results if result["error"]]
+        if errors:
+            summary["error"] = "\n".join(errors)
+    except Exception:
+        summary["error"] = traceback.format_exc()
+
+    summary["duration"] = time.time() - start_time
+    # the metrics of a pool worker are sent back to run_batch() with the summary
+    summary["metrics"] = metrics.default_metrics.dump(reset=True)
+    return summary
+
+
+def run_batch(filePaths, jobs=1, names=None, output_directory=None):
+    """
+    Run all the registered formats for every input file, `jobs` inputs at a time.
+
+    :param  `names`   `list`   Run only the formats with these class names. Default is all of them
+
+    :return  `list`   One summary per input, in the same order as filePaths
+    """
+    directories = get_output_directories(filePaths, output_directory=output_directory)
+    tasks = [(filePath, directory, names) for filePath, directory in zip(filePaths, directories)]
+    io.info("Running batch of %s input files with %s workers" % (len(tasks), max(min(jobs, len(tasks)), 1)))
+    return runner.merge_worker_metrics(sharding.run_tasks(process_input, tasks, jobs=jobs))
+
+
+def report_batch(summaries):
+    """
+    Print the summary table of the batch in terminal.
+
+    :return  `bool`   True If all the inputs finished without error
+    """
+    line = "{0:<40} {1:>10} {2:>14} {3:>14} {4:>10}   {5}"
+    io.echo(line.format("input", "rows", "input bytes", "output bytes", "sec", "status"))
+    for summary in summaries:
+        io.echo(line.format(summary["input"][-40:], summary["rows"], summary["input_bytes"], summary["output_bytes"],
+                            "%.3f" % summary["duration"], "FAILED" if summary["error"] else "ok"))
+    io.echo(line.format("total (%s files)" % len(summaries), sum(summary["rows"] for summary in summaries),
+                        sum(summary["input_bytes"] for summary in summaries),
+                        sum(summary["output_bytes"] for summary in summaries),
+                        "%.3f" % sum(summary["duration"] for summary in summaries), ""))
+
+    for summary in summaries:
+        if summary["error"]:
+            io.error("%s failed :\n%s" % (summary["input"], summary["error"]))
+    return not any(summary["error"] for summary in summaries)
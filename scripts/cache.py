@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for caching the decoded data of the serialized files.
+
+Services which decode the same serialized_data.* files again and again can skip the parsing with a DecodeCache.
+The cache is keyed on the serializer class and the file path plus its modification time and size (or a hash of
+its content), so a file which changed is never served from the cache.
+
+    *   In-process LRU cache bounded by the estimated size of the decoded data in bytes
+    *   Optional on-disk cache which keeps the decoded data as a binary pickle, much faster to load than parsing
+    *   Hit/miss statistics with get_stats()
+
+    Example :
+        data = encoder.JsonSerializer.decode(filePath, cache=True)                  # module default cache
+        data = encoder.JsonSerializer.decode(filePath, cache=DecodeCache(directory="/tmp/decoded"))
+
+Cached data is shared between the callers, so it should be treated as read only.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import sys
+import glob
+import hashlib
+import threading
+import cPickle
+from itertools import islice
+from collections import OrderedDict
+
+import config
+from scripts import metrics
+from scripts.common import io, open_atomic
+
+STAT = "stat"
+CONTENT = "content"
+
+# Number of items used for estimating the size of a decoded list
+SIZE_SAMPLE = 100
+
+
+def estimate_size(value):
+    """
+    Estimate the memory size in bytes of the decoded data from a sample of its items
+    """
+    size = sys.getsizeof(value)
+    if not isinstance(value, (list, tuple)) or not value:
+        return size
+
+    sample = list(islice(value, SIZE_SAMPLE))
+    sample_size = sum(_item_size(item) for item in sample)
+    return size + sample_size * len(value) // len(sample)
+
+
+def _item_size(item):
+    size = sys.getsizeof(item)
+    if hasattr(item, "iteritems"):
+        size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in item.iteritems())
+    return size
+
+
+def file_digest(filePath, block_size=1024 * 1024):
+    """
+    md5 hex digest of the content of a file
+    """
+    digest = hashlib.md5()
+    with open(filePath, "rb") as readFile:
+        for block in iter(lambda: readFile.read(block_size), ""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DecodeCache(object):
+    """
+    Bounded LRU cache of the decoded data, with an optional on-disk cache.
+
+    @:param `max_bytes`    `int`   : Maximum estimated size of the decoded data kept in memory
+    @:param `directory`    `str`   : Set this If you want to keep the decoded data on disk as well
+    @:param `validation`   `str`   : "stat" compares modification time and size, "content" a hash of the content
+    """
+
+    def __init__(self, max_bytes=None, directory=None, validation=STAT):
+        super(DecodeCache, self).__init__()
+        self.max_bytes = config.DECODE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory = directory
+        self.validation = validation
+
+        self._entries = OrderedDict()
+        self._keys_by_path = dict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(["hits", "misses", "disk_hits", "evictions", "invalidations"], 0)
+
+    def get_key(self, format_name, filePath):
+        """
+        Cache key of a file. It changes whenever the file changes.
+        """
+        filePath = os.path.abspath(filePath)
+        if self.validation == CONTENT:
+            return format_name, filePath, file_digest(filePath)
+
+        status = os.stat(filePath)
+        return format_name, filePath, status.st_mtime, status.st_size, status.st_ino
+
+    def get(self, format_name, filePath, loader):
+        """
+        Return the decoded data of the file from the cache. On a miss the data is decoded with the loader
+        and kept in the cache.
+
+        @:param `loader`   `callable`   : Function without arguments which decodes the file
+        """
+        key = self.get_key(format_name, filePath)
+        with self._lock:
+            if key in self._entries:
+                value, size = self._entries.pop(key)
+                self._entries[key] = (value, size)
+                self.stats["hits"] += 1
+                metrics.increment("cache_lookups", format=format_name, result="hit")
+                return value
+            self._invalidate_older(key)
+
+        value = self._load_from_disk(key)
+        if value is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            metrics.increment("cache_lookups", format=format_name, result="disk_hit")
+        else:
+            value = loader()
+            with self._lock:
+                self.stats["misses"] += 1
+            metrics.increment("cache_lookups", format=format_name, result="miss")
+            if value is not None:
+                self._save_to_disk(key, value)
+
+        if value is not None:
+            self._put(key, value)
+        return value
+
+    def _put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes or key in self._entries:
+                return
+            while self._entries and self._size + size > self.max_bytes:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self._forget(old_key, old_size)
+                self.stats["evictions"] += 1
+
+            self._entries[key] = (value, size)
+            self._keys_by_path.setdefault(key[:2], set()).add(key)
+            self._size += size
+
+    def _forget(self, key, size):
+        self._size -= size
+        keys = self._keys_by_path.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[key[:2]]
+
+    def _invalidate_older(self, key):
+        """
+        Drop the entries of older versions of the same file
+        """
+        for old_key in list(self._keys_by_path.get(key[:2], [])):
+            _, old_size = self._entries.pop(old_key)
+            self._forget(old_key, old_size)
+            self.stats["invalidations"] += 1
+
+    def invalidate(self, filePath=None):
+        """
+        Drop the cached data of one file, or of all the files
+        """
+        filePath = filePath and os.path.abspath(filePath)
+        with self._lock:
+            for key in list(self._entries):
+                if filePath is None or key[1] == filePath:
+                    _, size = self._entries.pop(key)
+                    self._forget(key, size)
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self):
+        """
+        Statistics of the cache. hits, misses, disk_hits, evictions, invalidations, entries and bytes
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes})
+        return stats
+
+    def _disk_prefix(self, key):
+        return os.path.join(self.directory, hashlib.md5(repr(key[:2])).hexdigest())
+
+    def _disk_path(self, key):
+        return "{0}-{1}.pickle".format(self._disk_prefix(key), hashlib.md5(repr(key[2:])).hexdigest())
+
+    def _load_from_disk(self, key):
+        if not self.directory:
+            return None
+
+        disk_path = self._disk_path(key)
+        if not os.path.isfile(disk_path):
+            return None
+        try:
+            with open(disk_path, "rb") as readFile:
+                return cPickle.load(readFile)
+        except Exception, e:
+            io.warn("Ignoring broken decode cache file {0} because {1}".format(disk_path, e))
+            return None
+
+    def _save_to_disk(self, key, value):
+        if not self.directory:
+            return
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        # drop the pre-parsed data of the older versions of the same file
+        disk_path = self._disk_path(key)
+        for old_path in glob.glob(self._disk_prefix(key) + "-*.pickle"):
+            if old_path != disk_path:
+                os.remove(old_path)
+
+        try:
+            with open_atomic(disk_path, "wb") as writeFile:
+                cPickle.dump(value, writeFile, cPickle.HIGHEST_PROTOCOL)
+        except Exception, e:
+            io.warn("Cannot save decode cache file {0} because {1}".format(disk_path, e))
+
+
+# Default cache used by Serializer.decode(cache=True)
+default_cache = DecodeCache(directory=config.DECODE_CACHE_DIRECTORY)
+
+
+def resolve_cache(cache):
+    """
+    DecodeCache for the cache argument of Serializer.decode(). True is the default cache, None/False is no cache
+    """
+    if cache is True:
+        return default_cache
+    return cache or None
+
+
+def get_stats():
+    """
+    Statistics of the default decode cache
+    """
+    return default_cache.get_stats()
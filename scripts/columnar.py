@@ -0,0 +1,890 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the binary columnar serializer.
+
+JSON and PICKLE files have to be parsed completely even for reading a single column. The columnar file
+keeps every column in its own typed section, so decode() only memory-maps the file and every column is
+a lazy view on the mapped bytes. Nothing is parsed before it is read.
+
+File layout (all numbers are little-endian) :
+
+    header       : MAGIC "SCOL" | version `uint16` | 2 pad bytes | directory offset `uint64` | directory size `uint64`
+    sections     : 8 bytes aligned column data
+    directory    : json text with the number of rows and the description of every column
+
+    int64 column   : `rows` x int64 values
+    float64 column : `rows` x float64 values
+    bool column    : `rows` x 1 byte values
+    string column  : (`rows` + 1) x uint64 offsets followed by the utf-8 blob of all the values.
+                     Value N is blob[offsets[N]:offsets[N + 1]]
+    dict column    : `rows` x uint16 codes, followed by the dictionary of the distinct values in the layout
+                     of a string column. Value N is dictionary[codes[N]]
+    null bitmap    : optional section of a column with None values, bit N (bit N % 8 of byte N / 8) is set when
+                     value N is None. The value in the column section is only a place holder.
+
+Every column has one type, from its first value which is not None : int64 for the python integers, float64 for
+the floats, bool for the booleans, and string for the str and unicode values. Text columns are dictionary encoded
+while they have at most config.COLUMNAR_DICTIONARY_SIZE distinct values and most of their values repeat (Sequence,
+Assignee). Values of another type, or of a type which has no column (lists, dates), raise a ValueError instead of
+being written as text, so every value is decoded as it was encoded.
+Files with dict, float64 or bool columns, or with null values, are version 2.
+
+The CSV reader gives text values, so without a schema every column of a CSV file is a text column, FrameNum too.
+Typed columns like an int64 FrameNum need a schema : config.SCHEMA_FILE (--schema) or config.SCHEMA_INFER
+(--infer_schema), see scripts/schema.py. `python benchmark.py --columnar` compares both paths.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import sys
+import json
+import mmap
+import array
+import pickle
+import struct
+import shutil
+import tempfile
+from itertools import chain, izip
+from collections import OrderedDict
+
+import config
+from scripts.encoder import Serializer, RegisterMetaClass
+from scripts.offset_index import resolve_record_ids
+from scripts.records import Record, record_type
+
+MAGIC = "SCOL"
+VERSION = 1
+# version of the files with dict, float64 or bool columns, or with null values
+EXTENDED_VERSION = 2
+HEADER = struct.Struct("<4sHxxQQ")
+ALIGNMENT = 8
+
+INT64 = "int64"
+FLOAT64 = "float64"
+BOOL = "bool"
+STRING = "string"
+DICTIONARY = "dict"
+# type of the values of the string and dict columns
+TEXT = "text"
+
+# struct format of the values of the fixed size columns
+VALUE_FORMATS = {INT64: "q", FLOAT64: "d", BOOL: "?"}
+
+# python types of the values of every column type, other types are checked with _value_type()
+VALUE_TYPES = {INT64: (int,), FLOAT64: (float,), BOOL: (bool,), STRING: (str, unicode), DICTIONARY: (str, unicode)}
+
+# values written in place of None, the null bitmap tells them apart
+PLACE_HOLDERS = {INT64: 0, FLOAT64: 0.0, BOOL: False, STRING: "", DICTIONARY: ""}
+
+# Sections of the column types, in the order of the file. The null bitmap comes after them
+SECTION_KEYS = {INT64: ["offset"], FLOAT64: ["offset"], BOOL: ["offset"], STRING: ["offset", "blob_offset"],
+                DICTIONARY: ["offset", "dictionary_offset", "blob_offset"]}
+NULL_KEY = "null_offset"
+
+# Dictionary codes are uint16, so a dictionary has at most 65536 values
+CODE_FORMAT = "H"
+CODE = struct.Struct("<" + CODE_FORMAT)
+CODE_SIZE = CODE.size
+MAX_DICTIONARY_SIZE = 2 ** (8 * CODE_SIZE)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Number of values packed in one struct call while writing or iterating the columns. A multiple of 8, so the
+# chunks start on a byte of the null bitmap
+VALUES_PER_CHUNK = 65536
+
+# memoryview.cast() is only available in python 3, that is the real zero-copy path
+ZERO_COPY_MEMORYVIEW = hasattr(memoryview, "cast") and sys.byteorder == "little"
+
+# protocol 5 out-of-band buffers (python 3.8+) pickle a mapped dataset without copying its bytes
+PickleBuffer = getattr(pickle, "PickleBuffer", None)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _int64_typecode():
+    for typecode in ["q", "l"]:
+        try:
+            if array.array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            continue
+
+# array.array type code of 64 bit integers on this platform
+INT64_TYPECODE = _int64_typecode()
+
+
+def _is_int64(value):
+    return isinstance(value, (int, long)) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX
+
+
+def _value_type(value):
+    """
+    Type of the column for a value, INT64, FLOAT64, BOOL or TEXT. None If the value can not be written
+    """
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, (int, long)):
+        return INT64 if _is_int64(value) else None
+    if isinstance(value, float):
+        return FLOAT64
+    if isinstance(value, basestring):
+        return TEXT
+    return None
+
+
+def _padding(size):
+    return (ALIGNMENT - size % ALIGNMENT) % ALIGNMENT
+
+
+class _ColumnWriter(object):
+    """
+    Spools the values of one column in temporary files while the records are streamed in.
+
+    The type of the column is set by its first value which is not None. A text column starts as dict, the codes
+    are spooled and the distinct values are kept in memory. It switches to string when there are too many distinct
+    values, or at the end If most of the values are distinct. None values are written as a place holder and set in
+    the null bitmap, which is kept in memory (one bit per row).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.type = None
+        self.is_unicode = False
+        self.rows = 0
+        self.nulls = None
+        self._types = ()
+        self._place_holder = None
+        self._leading_nulls = 0
+        self._pending = list()
+        self._data = None
+        self._blob = None
+        self._blob_size = 0
+        self._null_data = None
+        # utf-8 value -> code of the dict column
+        self._dictionary = None
+        self._dictionary_writer = None
+
+    def append(self, value):
+        if value is None:
+            self._add_null()
+            value = self._place_holder
+        elif type(value) not in self._types:
+            self._check_type(value)
+
+        self._pending.append(value)
+        if len(self._pending) >= VALUES_PER_CHUNK:
+            self._flush()
+
+    def _add_null(self):
+        # number of the row, the rows of the flushed, pending and leading null values
+        row = self.rows + len(self._pending) + self._leading_nulls
+        if self.nulls is None:
+            self.nulls = bytearray()
+        byte = row >> 3
+        if byte >= len(self.nulls):
+            self.nulls.extend("\0" * (byte + 1 - len(self.nulls)))
+        self.nulls[byte] |= 1 << (row & 7)
+
+    def _check_type(self, value):
+        value_type = _value_type(value)
+        if value_type is None:
+            raise ValueError("Value %r of column %s can not be written in the columnar format. The columns hold "
+                             "integers, floats, booleans, text and None" % (value, self.name))
+        column_type = TEXT if self.type in (STRING, DICTIONARY) else self.type
+        if column_type is None:
+            self._start(value_type)
+        elif value_type != column_type:
+            raise ValueError("Column %s has %s values and a %s value %r. All the values of a column should have "
+                             "the same type" % (self.name, column_type, value_type, value))
+
+    def _start(self, value_type):
+        """
+        Set the type of the column and write the place holders of the None values before the first value
+        """
+        if value_type == TEXT:
+            if config.COLUMNAR_DICTIONARY_SIZE:
+                self.type = DICTIONARY
+                self._dictionary = dict()
+                self._data = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+            else:
+                self._start_string()
+        else:
+            self.type = value_type
+            self._data = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+        self._types = VALUE_TYPES[self.type]
+        self._place_holder = PLACE_HOLDERS[self.type]
+
+        # all the values before the first one are None
+        pending = [self._place_holder] * len(self._pending)
+        while self._leading_nulls:
+            count = min(self._leading_nulls, VALUES_PER_CHUNK)
+            self._leading_nulls -= count
+            self._pending = [self._place_holder] * count
+            self._flush()
+        self._pending = pending
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        if self.type is None:
+            # only None values so far, the type is not known yet
+            self._leading_nulls += len(self._pending)
+        elif self.type in VALUE_FORMATS:
+            self._data.write(struct.pack("<%d%s" % (len(self._pending), VALUE_FORMATS[self.type]), *self._pending))
+            self.rows += len(self._pending)
+        elif self.type == DICTIONARY:
+            dictionary = self._dictionary
+            max_size = min(config.COLUMNAR_DICTIONARY_SIZE, MAX_DICTIONARY_SIZE)
+            codes = list()
+            for index, value in enumerate(self._pending):
+                value = self._text(value)
+                code = dictionary.get(value)
+                if code is None:
+                    if len(dictionary) >= max_size:
+                        # too many distinct values, the column is written as string
+                        self._write_codes(codes)
+                        self._pending = self._pending[index:]
+                        self._switch_to_string()
+                        return
+                    code = dictionary[value] = len(dictionary)
+                codes.append(code)
+            self._write_codes(codes)
+        else:
+            offsets = list()
+            for value in self._pending:
+                value = self._text(value)
+                self._blob.write(value)
+                self._blob_size += len(value)
+                offsets.append(self._blob_size)
+            self._data.write(struct.pack("<%dQ" % len(offsets), *offsets))
+            self.rows += len(offsets)
+
+        self._pending = list()
+
+    def _text(self, value):
+        """
+        utf-8 bytes of a value of a string or dict column
+        """
+        if isinstance(value, unicode):
+            self.is_unicode = True
+            return value.encode("utf-8")
+        return value
+
+    def _write_codes(self, codes):
+        self._data.write(struct.pack("<%d%s" % (len(codes), CODE_FORMAT), *codes))
+        self.rows += len(codes)
+
+    def _start_string(self):
+        self._data = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+        self._blob = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+        self._data.write(struct.pack("<Q", 0))
+        self.type = STRING
+        self.rows = 0
+
+    def _switch_to_string(self):
+        """
+        Re-write the dictionary codes already spooled as strings
+        """
+        values = sorted(self._dictionary, key=self._dictionary.get)
+        code_data = self._data
+        self._dictionary = None
+        self._start_string()
+
+        pending = self._pending
+        code_data.seek(0)
+        while True:
+            packed = code_data.read(CODE_SIZE * VALUES_PER_CHUNK)
+            if not packed:
+                break
+            self._pending = map(values.__getitem__,
+                                struct.unpack("<%d%s" % (len(packed) // CODE_SIZE, CODE_FORMAT), packed))
+            self._flush()
+        code_data.close()
+        self._pending = pending
+        self._flush()
+
+    def finish(self):
+        """
+        Flush the pending values and return the spooled sections of the column, the null bitmap last
+        """
+        if self.type is None and (self._pending or self._leading_nulls):
+            # only None values, written as an empty text column
+            self._start(TEXT)
+        self._flush()
+        if self.type is None:
+            # no rows at all
+            self.type = INT64
+            self._data = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+        if self.type == DICTIONARY and len(self._dictionary) * 2 > self.rows:
+            # most of the values are distinct, the codes would only add to the size
+            self._switch_to_string()
+
+        if self.type == DICTIONARY:
+            # the distinct values are written in the layout of a string column
+            self._dictionary_writer = _ColumnWriter(self.name)
+            self._dictionary_writer._start_string()
+            self._dictionary_writer._pending = sorted(self._dictionary, key=self._dictionary.get)
+            sections = [self._data] + self._dictionary_writer.finish()
+        elif self.type == STRING:
+            sections = [self._data, self._blob]
+        else:
+            sections = [self._data]
+
+        if self.nulls is not None:
+            self.nulls.extend("\0" * ((self.rows + 7) // 8 - len(self.nulls)))
+            self._null_data = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+            self._null_data.write(self.nulls)
+            sections.append(self._null_data)
+        return sections
+
+    def close(self):
+        for spool in [self._data, self._blob, self._null_data]:
+            if spool is not None:
+                spool.close()
+        if self._dictionary_writer is not None:
+            self._dictionary_writer.close()
+
+
+class ColumnarSerializer(Serializer):
+    """
+    Binary Columnar Serializer class. This has methods for encode/decode the user inputs
+
+    This is a inherited class of Serializer. decode() returns a ColumnarDataset, a memory mapped
+    view of the file, instead of a list.
+
+    The columns have the types of the values. The values of a CSV file are text, unless the file is read with
+    a schema.
+    """
+
+    # Register this class
+    __metaclass__ = RegisterMetaClass
+
+    FORMAT_NAME = "COLUMNAR"
+    TEMP_FILE_EXT = ".col"
+    TEMP_FILE_NAME = "{0}{1}".format(config.SERIALIZE_FILE_NAME, TEMP_FILE_EXT)
+
+    WRITE_MODE = "wb"
+    READ_MODE = "rb"
+
+    # decode() only maps the file, there is nothing to gain from a decode cache
+    CACHEABLE = False
+    COLUMNAR = True
+
+    def __init__(self, data=None):
+        super(ColumnarSerializer, self).__init__(data)
+
+    def write(self, stream, records):
+        """
+        Spool every column while streaming the records and then write the columns one after another.
+        All the records should have the same headers.
+        """
+        fields = None
+        writers = list()
+        try:
+            for each_record in records:
+                record_fields = each_record.fields if isinstance(each_record, Record) else tuple(each_record.keys())
+                if fields is None:
+                    fields = record_fields
+                    writers = [_ColumnWriter(name=field) for field in fields]
+                elif record_fields != fields:
+                    raise ValueError("All the records should have the same headers. Expected %s, got %s" % (
+                        list(fields), list(record_fields)))
+
+                for writer, value in izip(writers, each_record.itervalues()):
+                    writer.append(value)
+
+            self._write_columns(stream, writers)
+        finally:
+            for writer in writers:
+                writer.close()
+
+    def _write_columns(self, stream, writers):
+        directory = {"rows": 0, "columns": list()}
+        all_sections = list()
+
+        # every section size is known from the spools, so the offsets can be calculated before writing
+        offset = HEADER.size
+        version = VERSION
+        for writer in writers:
+            sections = writer.finish()
+            column = {"name": writer.name, "type": writer.type}
+            section_keys = list(SECTION_KEYS[writer.type])
+            if writer.type in (STRING, DICTIONARY):
+                column["unicode"] = writer.is_unicode
+            if writer.type == DICTIONARY:
+                column["values"] = len(writer._dictionary)
+            if writer.nulls is not None:
+                section_keys.append(NULL_KEY)
+            if writer.type not in (INT64, STRING) or writer.nulls is not None:
+                # older readers can not read these columns, the other files keep the version 1
+                version = EXTENDED_VERSION
+
+            for key, section in izip(section_keys, sections):
+                section.seek(0, 2)
+                column[key] = offset
+                offset += section.tell() + _padding(section.tell())
+                all_sections.append(section)
+            directory["columns"].append(column)
+            directory["rows"] = writer.rows
+
+        directory_text = json.dumps(directory)
+        stream.write(HEADER.pack(MAGIC, version, offset, len(directory_text)))
+        for section in all_sections:
+            size = section.tell()
+            section.seek(0)
+            shutil.copyfileobj(section, stream, config.WRITE_BUFFER_SIZE)
+            stream.write("\0" * _padding(size))
+        stream.write(directory_text)
+
+    @classmethod
+    def read(cls, stream):
+        """
+        Memory-map the file and return a ColumnarDataset. The file is not parsed.
+        Compressed files are decompressed in memory instead of memory mapped.
+        """
+        if not hasattr(stream, "fileno"):
+            # compressed file, the content is decompressed in memory
+            return ColumnarDataset(mapping=_MemoryMapping(stream.read()))
+        return ColumnarDataset(mapping=mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def iter_read(cls, stream):
+        """
+        Yield the records of the memory mapped file one at a time
+        """
+        with cls.read(stream) as dataset:
+            for each_record in dataset:
+                yield each_record
+
+    @classmethod
+    def decode_records(cls, filePath, records):
+        """
+        Read only the requested records. The columns have fixed size offsets, no index is needed.
+        """
+        with cls.read_file(filePath) as dataset:
+            return [dataset[record_id] for record_id in resolve_record_ids(records, len(dataset))]
+
+    @classmethod
+    def decode_manifest(cls, manifestPath, cache=None, records=None):
+        """
+        Memory-map all the parts listed in the manifest and return them as one ShardedDataset
+        """
+        parts = cls.read_manifest(manifestPath)["parts"]
+        dataset = ShardedDataset([cls.decode(filePath=part["path"]) for part in parts])
+        if records is None:
+            return dataset
+
+        with dataset:
+            return [dataset[record_id] for record_id in resolve_record_ids(records, len(dataset))]
+
+
+def load_dataset(data):
+    """
+    Build a ColumnarDataset from the raw bytes of a columnar file. Used for un-pickling the datasets.
+    """
+    return ColumnarDataset(mapping=_MemoryMapping(data))
+
+
+class _MemoryMapping(str):
+    """
+    Decompressed content of a file, used in place of the memory map
+    """
+
+    def close(self):
+        pass
+
+
+class ColumnarDataset(object):
+    """
+    Memory mapped, read only view of a columnar file.
+
+        dataset.columns["FrameNum"]     # IntColumn, FloatColumn, BoolColumn, StringColumn or DictColumn view,
+                                        # in a NullableColumn when the column has None values. Nothing is copied
+        dataset[10]                     # one Record
+        dataset[10:20]                  # list of Records, like the list of the other serializers
+        list(dataset)                   # all the Records
+    """
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+        magic, version, directory_offset, directory_size = HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a columnar file. Magic number %r does not match" % magic)
+        if version > EXTENDED_VERSION:
+            raise ValueError("Columnar file version %s is not supported" % version)
+
+        directory = json.loads(mapping[directory_offset:directory_offset + directory_size])
+        self.rows = directory["rows"]
+        self.fields = tuple(column["name"].encode("utf-8") for column in directory["columns"])
+        self.columns = OrderedDict()
+        for name, column in izip(self.fields, directory["columns"]):
+            if column["type"] in FIXED_COLUMNS:
+                values = FIXED_COLUMNS[column["type"]](mapping, column["offset"], self.rows)
+            elif column["type"] == DICTIONARY:
+                values = DictColumn(mapping, column["offset"], self.rows,
+                                    StringColumn(mapping, column["dictionary_offset"], column["blob_offset"],
+                                                 column["values"], is_unicode=column["unicode"]))
+            else:
+                values = StringColumn(mapping, column["offset"], column["blob_offset"], self.rows,
+                                      is_unicode=column["unicode"])
+            if NULL_KEY in column:
+                values = NullableColumn(values, mapping, column[NULL_KEY], self.rows)
+            self.columns[name] = values
+        self._record_type = record_type(self.fields)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[each_index] for each_index in xrange(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("record index out of range")
+        return self._record_type([self.columns[field][index] for field in self.fields])
+
+    def __iter__(self):
+        columns = [iter(self.columns[field]) for field in self.fields]
+        return (self._record_type(values) for values in izip(*columns))
+
+    def close(self):
+        self._mapping.close()
+
+    def __reduce_ex__(self, protocol):
+        """
+        A dataset is pickled as the raw bytes of its file, never as records
+        """
+        if protocol >= 5 and PickleBuffer is not None:
+            return load_dataset, (PickleBuffer(self._mapping),)
+        return load_dataset, (self._mapping[:],)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ShardedDataset(object):
+    """
+    Several ColumnarDataset parts seen as one dataset. Same interface as ColumnarDataset.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.fields = parts[0].fields if parts else tuple()
+        self.rows = sum(len(part) for part in parts)
+        self.columns = OrderedDict((field, ShardedColumn([part.columns[field] for part in parts]))
+                                   for field in self.fields)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[each_index] for each_index in xrange(*index.indices(self.rows))]
+        part, part_index = _locate(self.parts, self.rows, index)
+        return part[part_index]
+
+    def __iter__(self):
+        return chain.from_iterable(self.parts)
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+
+    def __reduce__(self):
+        return ShardedDataset, (self.parts,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ShardedColumn(object):
+    """
+    Same column of several parts seen as one column
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self._rows = sum(len(part) for part in parts)
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        part, part_index = _locate(self.parts, self._rows, index)
+        return part[part_index]
+
+    def __iter__(self):
+        return chain.from_iterable(self.parts)
+
+    def tolist(self):
+        return list(self)
+
+
+def _locate(parts, rows, index):
+    """
+    Find the part which holds the given index of the whole dataset and the index inside that part
+    """
+    if index < 0:
+        index += rows
+    if not 0 <= index < rows:
+        raise IndexError("index out of range")
+    for part in parts:
+        if index < len(part):
+            return part, index
+        index -= len(part)
+
+
+class IntColumn(object):
+    """
+    Lazy view of an int64 column on the mapped file.
+
+    With python 3 the values are a zero-copy memoryview cast to int64. Otherwise values are unpacked
+    from the mapped memory only when they are read. buffer() gives the raw bytes without a copy and
+    numpy() a zero-copy numpy array when numpy is installed.
+    """
+
+    # struct format, numpy dtype and array.array type code of the values
+    FORMAT = "q"
+    NUMPY_TYPE = "<i8"
+    TYPECODE = INT64_TYPECODE
+
+    def __init__(self, mapping, offset, rows):
+        self._mapping = mapping
+        self._offset = offset
+        self._rows = rows
+        self._size = struct.calcsize(self.FORMAT)
+        self._view = None
+        if ZERO_COPY_MEMORYVIEW:
+            self._view = memoryview(mapping)[offset:offset + self._size * rows].cast(self.FORMAT)
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        if self._view is not None:
+            return self._view[index]
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("column index out of range")
+        return struct.unpack_from("<" + self.FORMAT, self._mapping, self._offset + self._size * index)[0]
+
+    def __iter__(self):
+        if self._view is not None:
+            return iter(self._view)
+        return self._iter_chunks()
+
+    def _iter_chunks(self):
+        for start in xrange(0, self._rows, VALUES_PER_CHUNK):
+            count = min(VALUES_PER_CHUNK, self._rows - start)
+            for value in struct.unpack_from("<%d%s" % (count, self.FORMAT), self._mapping,
+                                            self._offset + self._size * start):
+                yield value
+
+    def buffer(self):
+        """
+        raw little-endian bytes of the column, without a copy
+        """
+        if self._view is not None:
+            return self._view
+        return buffer(self._mapping, self._offset, self._size * self._rows)
+
+    def numpy(self):
+        """
+        zero-copy numpy array of the column. Needs numpy.
+        """
+        if numpy is None:
+            raise ImportError("numpy is not installed")
+        return numpy.frombuffer(self._mapping, dtype=self.NUMPY_TYPE, count=self._rows, offset=self._offset)
+
+    def tolist(self):
+        return list(self)
+
+    def toarray(self):
+        """
+        copy of the column in an array.array
+        """
+        values = array.array(self.TYPECODE)
+        values.fromstring(str(self.buffer()) if self._view is None else self._view.tobytes())
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+
+class FloatColumn(IntColumn):
+    """
+    Lazy view of a float64 column on the mapped file, see IntColumn
+    """
+
+    FORMAT = "d"
+    NUMPY_TYPE = "<f8"
+    TYPECODE = "d"
+
+
+class BoolColumn(IntColumn):
+    """
+    Lazy view of a bool column on the mapped file, one byte per value. toarray() gives the values as 0 and 1
+    """
+
+    FORMAT = "?"
+    NUMPY_TYPE = "?"
+    TYPECODE = "B"
+
+
+# Views of the fixed size column types
+FIXED_COLUMNS = {INT64: IntColumn, FLOAT64: FloatColumn, BOOL: BoolColumn}
+
+
+class StringColumn(object):
+    """
+    Lazy view of a string column on the mapped file. A value is sliced out of the blob when it is read.
+    """
+
+    def __init__(self, mapping, offset, blob_offset, rows, is_unicode=False):
+        self._mapping = mapping
+        self._offset = offset
+        self._blob_offset = blob_offset
+        self._rows = rows
+        self._is_unicode = is_unicode
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("column index out of range")
+        start, end = struct.unpack_from("<2Q", self._mapping, self._offset + 8 * index)
+        return self._value(self._mapping[self._blob_offset + start:self._blob_offset + end])
+
+    def __iter__(self):
+        for start in xrange(0, self._rows, VALUES_PER_CHUNK):
+            count = min(VALUES_PER_CHUNK, self._rows - start)
+            offsets = struct.unpack_from("<%dQ" % (count + 1), self._mapping, self._offset + 8 * start)
+            blob_start = self._blob_offset + offsets[0]
+            blob = self._mapping[blob_start:self._blob_offset + offsets[-1]]
+            for index in xrange(count):
+                yield self._value(blob[offsets[index] - offsets[0]:offsets[index + 1] - offsets[0]])
+
+    def raw(self, index):
+        """
+        utf-8 bytes of one value, without a copy
+        """
+        start, end = struct.unpack_from("<2Q", self._mapping, self._offset + 8 * index)
+        return buffer(self._mapping, self._blob_offset + start, end - start)
+
+    def _value(self, data):
+        if self._is_unicode:
+            return data.decode("utf-8")
+        return data
+
+    def tolist(self):
+        return list(self)
+
+
+class DictColumn(object):
+    """
+    Lazy view of a dictionary encoded column on the mapped file. The distinct values are read once, every row
+    is a uint16 code in the dictionary. The same value objects are returned for all the rows which share them.
+    """
+
+    def __init__(self, mapping, offset, rows, dictionary):
+        self._mapping = mapping
+        self._offset = offset
+        self._rows = rows
+        self.dictionary = dictionary.tolist()
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("column index out of range")
+        return self.dictionary[CODE.unpack_from(self._mapping, self._offset + CODE_SIZE * index)[0]]
+
+    def __iter__(self):
+        dictionary = self.dictionary
+        for codes in self._iter_codes():
+            for value in map(dictionary.__getitem__, codes):
+                yield value
+
+    def _iter_codes(self):
+        for start in xrange(0, self._rows, VALUES_PER_CHUNK):
+            count = min(VALUES_PER_CHUNK, self._rows - start)
+            yield struct.unpack_from("<%d%s" % (count, CODE_FORMAT), self._mapping, self._offset + CODE_SIZE * start)
+
+    def codes(self):
+        """
+        copy of the codes of the column in an array.array, value N is dictionary[codes[N]]
+        """
+        codes = array.array(CODE_FORMAT)
+        for chunk in self._iter_codes():
+            codes.extend(chunk)
+        return codes
+
+    def tolist(self):
+        return list(self)
+
+
+class NullableColumn(object):
+    """
+    Lazy view of a column with None values. `column` is the view of the values, a value is None when its bit
+    of the null bitmap is set.
+    """
+
+    def __init__(self, column, mapping, offset, rows):
+        self.column = column
+        self._mapping = mapping
+        self._offset = offset
+        self._rows = rows
+
+    def __len__(self):
+        return self._rows
+
+    def is_null(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("column index out of range")
+        return bool(ord(self._mapping[self._offset + (index >> 3)]) & (1 << (index & 7)))
+
+    def __getitem__(self, index):
+        if self.is_null(index):
+            return None
+        return self.column[index]
+
+    def __iter__(self):
+        values = iter(self.column)
+        for start in xrange(0, self._rows, VALUES_PER_CHUNK):
+            count = min(VALUES_PER_CHUNK, self._rows - start)
+            first_byte = self._offset + start // 8
+            bits = bytearray(self._mapping[first_byte:first_byte + (count + 7) // 8])
+            for index in xrange(count):
+                value = next(values)
+                yield None if bits[index >> 3] & (1 << (index & 7)) else value
+
+    def tolist(self):
+        return list(self)
@@ -9,22 +9,61 @@ Module for all the common methods
 __author__ = 'Arjun Prasad Namdeo'
 
 import os
+import sys
 import csv
-import webbrowser
+import time
+import errno
+import atexit
+import itertools
+import threading
+import importlib
 
-def readCsv(filePath):
+import config
+
+def readCsv(filePath, byteRange=None):
     """
     CSV File reader
+
+    @:param `byteRange`   `tuple`   : (start, end) byte offsets. Set this If you want only the rows whose line
+                                      starts in this range. Used for reading one shard of a big file.
     """
     if not validate_file_path(file_path=filePath):
         return
 
-    with open(filePath, "r") as csv_read:
-        reader = csv.reader(csv_read, delimiter=',', quotechar='|')
-        for row in reader:
+    with open(filePath, "r" if byteRange is None else "rb") as csv_read:
+        lines = csv_read if byteRange is None else iter_line_range(csv_read, *byteRange)
+        for row in readCsvLines(lines):
             yield row
 
 
+def readCsvLines(lines):
+    """
+    CSV reader for lines which are not in a file, like the CSV body of a request to scripts/server.py
+    """
+    return csv.reader(lines, delimiter=',', quotechar='|')
+
+
+def iter_line_range(fileObject, start, end):
+    """
+    Yield the lines of a file object opened in binary mode, which start between the `start` and `end` byte offsets.
+
+    Consecutive ranges never share a line, so a file can be split in byte ranges without looking at its content.
+    """
+    if start > 0:
+        fileObject.seek(start - 1)
+        if fileObject.read(1) != "\n":
+            # this line started in the previous range
+            fileObject.readline()
+
+    position = fileObject.tell()
+    while position < end:
+        line = fileObject.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line
+
+
 def validate_file_path(file_path, file_extension=None, check_existence=False):
     """
     common method for validating a file_path
@@ -51,6 +90,230 @@ def validate_file_path(file_path, file_extension=None, check_existence=False):
     return True
 
 
+def ensure_parent_directory(file_path):
+    """
+    Create the directory of a file path If it does not exist yet
+    """
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            # created by a parallel job in the meantime
+            if error.errno != errno.EEXIST:
+                raise
+
+
+TEMP_SUFFIX = ".tmp"
+RUNS_DIRECTORY = "runs"
+FSYNC_FILE = "file"
+FSYNC_FULL = "full"
+FSYNC_POLICIES = [None, FSYNC_FILE, FSYNC_FULL]
+
+_temp_counter = itertools.count()
+
+
+def is_temp_path(file_path):
+    """
+    True for the temporary files of AtomicFile, which belong to a writer and should not be touched
+    """
+    return file_path.endswith(TEMP_SUFFIX)
+
+
+def fsync_directory(directory):
+    """
+    Flush the entries of a directory to the disk, so a rename in it survives a crash
+    """
+    try:
+        handle = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        # directories can not be opened on windows
+        return
+    try:
+        os.fsync(handle)
+    finally:
+        os.close(handle)
+
+
+class AtomicFile(object):
+    """
+    File which is written in a temporary file next to the target, and renamed over the target by close().
+
+    Readers see the old file or the complete new one, never a half-written file. Every writer has its own
+    temporary file, so parallel jobs writing the same path do not mix their content, the last one wins.
+    An error in the `with` block (or discard()) removes the temporary file and keeps the old target.
+
+    @:param `buffering`   `int`   : Buffer size of the file. Default is config.WRITE_BUFFER_SIZE
+    @:param `fsync`       `str`   : None, "file" (flush the file to the disk before the rename) or "full" (also
+                                    flush the directory after the rename). Default is config.OUTPUT_FSYNC
+    """
+
+    def __init__(self, filePath, mode="w", buffering=None, fsync=None):
+        super(AtomicFile, self).__init__()
+        self.fsync = config.OUTPUT_FSYNC if fsync is None else fsync
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy %r. Use one of %s" % (self.fsync, FSYNC_POLICIES))
+
+        self.name = filePath
+        self.temp_path = "{0}.{1}-{2}-{3}{4}".format(filePath, os.getpid(), threading.current_thread().ident,
+                                                       next(_temp_counter), TEMP_SUFFIX)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | (getattr(os, "O_BINARY", 0) if "b" in mode else 0)
+        handle = os.open(self.temp_path, flags, 0666)
+        self._file = os.fdopen(handle, mode, config.WRITE_BUFFER_SIZE if buffering is None else buffering)
+        self.closed = False
+
+    def __getattr__(self, name):
+        # write(), tell(), seek(), flush() ... of the temporary file
+        if name == "_file":
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+    def close(self):
+        """
+        Finish the temporary file and rename it over the target
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            os.rename(self.temp_path, self.name)
+        except Exception:
+            self._remove_temp()
+            raise
+        if self.fsync == FSYNC_FULL:
+            fsync_directory(os.path.dirname(self.name))
+
+    def discard(self):
+        """
+        Remove the temporary file and keep the target as it is
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._remove_temp()
+
+    def _remove_temp(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.isfile(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, tb):
+        if error_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def open_atomic(filePath, mode="w", buffering=None):
+    """
+    Open a file for writing through an AtomicFile. The parent directory is created If needed.
+    """
+    ensure_parent_directory(filePath)
+    return AtomicFile(filePath, mode, buffering=buffering)
+
+
+def get_file_stamp(filePath):
+    """
+    (size, modification time in nanoseconds) of a file. The indexes and the schema of a serialized file keep the
+    stamp of the file, a file written again with the same size has another modification time.
+    """
+    status = os.stat(filePath)
+    return status.st_size, int(status.st_mtime * 1e9)
+
+
+def new_run_id():
+    """
+    Unique name of one run of the application, like "20240518-142501-4242-0"
+    """
+    return "{0}-{1}-{2}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid(), next(_temp_counter))
+
+
+def get_run_directory(output_directory=None, run_id=None):
+    """
+    Output directory of one run, "<output directory>/runs/<run id>". Parallel runs do not share any output file.
+    """
+    return os.path.join(output_directory or config.OUTPUT_DIRECTORY, RUNS_DIRECTORY, run_id or new_run_id())
+
+
+class LazyRegistry(dict):
+    """
+    Registry of classes which also knows the classes of the modules not imported yet.
+
+    declare() adds the name of a class with its module. The module is imported (and registers the class)
+    only when the class is looked up, so listing the names never imports anything.
+
+        registry.declare("ColumnarSerializer", "scripts.columnar")
+        sorted(registry)                    # no import
+        registry["ColumnarSerializer"]      # imports scripts.columnar
+    """
+
+    def __init__(self):
+        super(LazyRegistry, self).__init__()
+        self._modules = dict()
+
+    def declare(self, name, module_name):
+        if not dict.__contains__(self, name):
+            self._modules[name] = module_name
+
+    def load(self, name=None):
+        """
+        Import the module of one declared class, or of all of them
+        """
+        for each_name in [name] if name else self._modules.keys():
+            module_name = self._modules.pop(each_name, None)
+            if module_name and not dict.__contains__(self, each_name):
+                importlib.import_module(module_name)
+
+    def __missing__(self, name):
+        if name in self._modules:
+            self.load(name)
+            if dict.__contains__(self, name):
+                return dict.__getitem__(self, name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self._modules
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return dict.keys(self) + [name for name in self._modules if not dict.__contains__(self, name)]
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def values(self):
+        self.load()
+        return dict.values(self)
+
+    def items(self):
+        self.load()
+        return dict.items(self)
+
+    def itervalues(self):
+        self.load()
+        return dict.itervalues(self)
+
+    def iteritems(self):
+        self.load()
+        return dict.iteritems(self)
+
+
 def view_file(file_path=None):
     """
     Open up the file path in default browser.
@@ -58,6 +321,8 @@ def view_file(file_path=None):
     if not validate_file_path(file_path=file_path, check_existence=True):
         return
 
+    # webbrowser is slow to import and only needed here
+    import webbrowser
     try:
         webbrowser.open("file://" + file_path)
     except Exception, e:
@@ -70,11 +335,17 @@ class io(object):
 
     This class have following methods which will echo messages in terminal in their respective colors
 
+        io.debug(message) :   "DEFAULT" Color       (Details, hidden by default)
         io.warn(message)  :   "YELLOW" Color        (For any warning)
         io.info(message)  :   "GREEN" Color         (For any success)
         io.error(message) :   "RED" Color           (For any critical error)
         io.echo(message)  :   "DEFAULT" Color       (Normal message)
 
+    Messages below io.level (config.LOG_LEVEL) are dropped before they are formatted. In the hot loops,
+    check io.enabled(io.DEBUG) before building the message.
+
+    The lines are buffered and written config.LOG_BUFFER_LINES at a time. Warnings and errors, io.flush()
+    and the end of every traced operation (see scripts/metrics.py) write the buffer out.
     """
 
     GREEN = '\033[92m'
@@ -82,22 +353,82 @@ class io(object):
     RED = '\033[91m'
     RESET = '\033[0m'
 
+    DEBUG = 10
+    INFO = 20
+    WARN = 30
+    ERROR = 40
+    LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "ERROR": ERROR}
+
+    level = LEVELS[config.LOG_LEVEL]
+    _buffer = list()
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+    @classmethod
+    def set_level(cls, level):
+        """
+        @:param `level`   `str/int`   : "DEBUG", "INFO", "WARN", "ERROR" or one of the io level numbers
+        """
+        cls.level = cls.LEVELS[level.upper()] if isinstance(level, basestring) else level
+
+    @classmethod
+    def enabled(cls, level):
+        return level >= cls.level
+
+    @classmethod
+    def _check_process(cls):
+        if cls._pid != os.getpid():
+            # forked worker, the lines in the buffer are printed by the parent process
+            cls._pid = os.getpid()
+            cls._buffer = list()
+
+    @classmethod
+    def _write(cls, string, flush=False):
+        with cls._lock:
+            cls._check_process()
+            cls._buffer.append(string)
+            if not flush and len(cls._buffer) < config.LOG_BUFFER_LINES:
+                return
+        cls.flush()
+
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            cls._check_process()
+            lines, cls._buffer = cls._buffer, list()
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    @classmethod
+    def debug(cls, message):
+        if cls.level > cls.DEBUG:
+            return
+        cls._write(" DEBUG :  {MSG}".format(MSG=str(message)))
+
     @classmethod
     def warn(cls, message):
+        if cls.level > cls.WARN:
+            return
         string = "{COLOR} WARN :  {MSG}{RESET}".format(COLOR=cls.YELLOW, MSG=str(message), RESET=cls.RESET)
-        print(string)
+        cls._write(string, flush=True)
 
     @classmethod
     def info(cls, message):
+        if cls.level > cls.INFO:
+            return
         string = "{COLOR} INFO :  {MSG}{RESET}".format(COLOR=cls.GREEN, MSG=str(message), RESET=cls.RESET)
-        print(string)
+        cls._write(string)
 
     @classmethod
     def error(cls, message):
         string = "{COLOR} ERROR :  {MSG}{RESET}".format(COLOR=cls.RED, MSG=str(message), RESET=cls.RESET)
-        print(string)
+        cls._write(string, flush=True)
 
     @classmethod
     def echo(cls, message, prefix=">>>"):
         string = "{PRE} {MSG}{RESET}".format(PRE=prefix, MSG=str(message), RESET=cls.RESET)
-        print(string)
+        cls._write(string)
+
+
+atexit.register(io.flush)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the transparent compression of the serialized files.
+
+Any serializer can write its file through a compression codec. The output is cut in chunks of
+config.COMPRESSION_CHUNK_SIZE bytes which are compressed one by one, and a directory of the chunks is written
+at the end of the file. So the file can still be read from any position by decompressing only one chunk,
+and the offset indexes (scripts/offset_index.py) keep working with the uncompressed offsets.
+
+    Layout :
+        header      "SCMP", version, codec name
+        chunks      compressed chunks, one after another
+        directory   (chunks + 1) pairs of little-endian uint64, compressed and uncompressed offset of every chunk
+        footer      directory offset, number of chunks, "SCMP"
+
+The codec name is added to the file name, "serialized_data.json" -> "serialized_data.json.zlib". The files are
+always chunked containers, not plain gzip/bz2 streams.
+
+    Example :
+        encoder.JsonSerializer(data=user_data).encode(compression="zlib")
+        encoder.JsonSerializer.decode("output_files/serialized_data.json.zlib")
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import bz2
+import zlib
+import struct
+from bisect import bisect_right
+from collections import OrderedDict
+
+import config
+from scripts.common import open_atomic
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+MAGIC = "SCMP"
+VERSION = 1
+HEADER = struct.Struct("<4sH10s")
+FOOTER = struct.Struct("<QQ4sxxxx")
+DIRECTORY_ENTRY = struct.Struct("<QQ")
+
+
+class Codec(object):
+    """
+    Compression codec of the chunks
+
+    @:param `compress`     `callable`   : compress(data, level) -> compressed data. level None is the codec default
+    @:param `decompress`   `callable`   : decompress(data) -> data
+    """
+
+    def __init__(self, name, compress, decompress):
+        super(Codec, self).__init__()
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+    @property
+    def extension(self):
+        return "." + self.name
+
+
+# Creating registry to store all the compression codecs
+codecs = OrderedDict()
+
+
+def register_codec(codec):
+    """
+    Method for register a compression Codec. Its name is used in the file names and in the file headers.
+    """
+    if len(codec.name) > HEADER.size - 6:
+        raise ValueError("Codec name %r is too long" % codec.name)
+    codecs[codec.name] = codec
+    return codec
+
+
+def _gzip_compress(data, level):
+    compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+register_codec(Codec("zlib", lambda data, level: zlib.compress(data, 6 if level is None else level), zlib.decompress))
+register_codec(Codec("gzip", _gzip_compress, lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS)))
+register_codec(Codec("bz2", lambda data, level: bz2.compress(data, 9 if level is None else level), bz2.decompress))
+if lzma is not None:
+    register_codec(Codec("lzma", lambda data, level: lzma.compress(data, preset=6 if level is None else level),
+                         lzma.decompress))
+
+
+def get_codec(name):
+    if name not in codecs:
+        raise ValueError("Unknown compression codec %r. Available codecs are %s" % (name, codecs.keys()))
+    return codecs[name]
+
+
+def get_compressed_path(filePath, codec_name):
+    """
+    File path with the extension of the codec. "serialized_data.json" -> "serialized_data.json.zlib"
+    """
+    if not codec_name:
+        return filePath
+    extension = get_codec(codec_name).extension
+    return filePath if filePath.endswith(extension) else filePath + extension
+
+
+def get_codec_name(filePath):
+    """
+    Name of the codec from the file extension, or None for an uncompressed file
+    """
+    for codec in codecs.itervalues():
+        if filePath.endswith(codec.extension):
+            return codec.name
+    return None
+
+
+def strip_compressed_extension(filePath):
+    """
+    File path without the extension of the codec, If any. "serialized_data.json.zlib" -> "serialized_data.json"
+    """
+    codec_name = get_codec_name(filePath)
+    return filePath[:-len(codecs[codec_name].extension)] if codec_name else filePath
+
+
+def is_compressed(filePath):
+    """
+    True If the file is a compressed container
+    """
+    if not os.path.isfile(filePath):
+        return False
+    with open(filePath, "rb") as readFile:
+        return readFile.read(len(MAGIC)) == MAGIC
+
+
+def open_output(filePath, mode, codec_name=None, level=None):
+    """
+    Open a file for writing, through a CompressedWriter If a codec is given. The file is written
+    atomically, see common.AtomicFile.
+    """
+    if not codec_name:
+        return open_atomic(filePath, mode)
+    return CompressedWriter(open_atomic(filePath, "wb"), get_codec(codec_name), level=level)
+
+
+def open_input(filePath, mode):
+    """
+    Open a file for reading. Compressed containers are opened through a CompressedReader.
+    """
+    if is_compressed(filePath):
+        return CompressedReader(open(filePath, "rb"))
+    return open(filePath, mode)
+
+
+def get_uncompressed_size(filePath):
+    """
+    Size in bytes of the content of a compressed container
+    """
+    with CompressedReader(open(filePath, "rb")) as reader:
+        return reader.size
+
+
+class CompressedWriter(object):
+    """
+    File like object which compresses everything written in it, chunk by chunk, in the given binary stream.
+    tell() is the position in the uncompressed content.
+    """
+
+    def __init__(self, stream, codec, level=None, chunk_size=None):
+        super(CompressedWriter, self).__init__()
+        self._stream = stream
+        self.codec = codec
+        self.level = config.COMPRESSION_LEVEL if level is None else level
+        self.chunk_size = chunk_size or config.COMPRESSION_CHUNK_SIZE
+
+        self._pending = list()
+        self._pending_size = 0
+        self._position = 0
+        self._directory = list()
+        self._compressed_position = HEADER.size
+        self.closed = False
+        self._stream.write(HEADER.pack(MAGIC, VERSION, codec.name))
+
+    def write(self, data):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self._position += len(data)
+        if self._pending_size >= self.chunk_size:
+            self._write_chunks(final=False)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def _write_chunks(self, final):
+        data = "".join(self._pending)
+        start = 0
+        while len(data) - start >= self.chunk_size or (final and start < len(data)):
+            chunk = data[start:start + self.chunk_size]
+            compressed = self.codec.compress(chunk, self.level)
+            self._directory.append((self._compressed_position, self._position - len(data) + start))
+            self._stream.write(compressed)
+            self._compressed_position += len(compressed)
+            start += len(chunk)
+
+        rest = data[start:]
+        self._pending = [rest] if rest else list()
+        self._pending_size = len(rest)
+
+    def close(self):
+        if self.closed:
+            return
+        self._write_chunks(final=True)
+        self._directory.append((self._compressed_position, self._position))
+        for entry in self._directory:
+            self._stream.write(DIRECTORY_ENTRY.pack(*entry))
+        self._stream.write(FOOTER.pack(self._compressed_position, len(self._directory) - 1, MAGIC))
+        self._stream.close()
+        self.closed = True
+
+    def discard(self):
+        """
+        Stop writing and drop the output, If the stream can be discarded (like a common.AtomicFile)
+        """
+        if self.closed:
+            return
+        self.closed = True
+        getattr(self._stream, "discard", self._stream.close)()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, tb):
+        if error_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CompressedReader(object):
+    """
+    Read only, seekable file like object over a compressed container. Only the chunk at the current
+    position is decompressed and kept in memory.
+    """
+
+    def __init__(self, stream):
+        super(CompressedReader, self).__init__()
+        self._stream = stream
+        magic, version, codec_name = HEADER.unpack(stream.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            stream.close()
+            raise ValueError("%s is not a compressed container" % getattr(stream, "name", stream))
+        self.codec = get_codec(codec_name.rstrip("\0"))
+
+        stream.seek(-FOOTER.size, os.SEEK_END)
+        directory_offset, chunks, _ = FOOTER.unpack(stream.read(FOOTER.size))
+        stream.seek(directory_offset)
+        directory = [DIRECTORY_ENTRY.unpack(stream.read(DIRECTORY_ENTRY.size)) for _ in xrange(chunks + 1)]
+        self._compressed_offsets = [entry[0] for entry in directory]
+        self._offsets = [entry[1] for entry in directory]
+        self.size = self._offsets[-1]
+
+        self._position = 0
+        self._chunk_index = None
+        self._chunk = ""
+        self._chunk_start = self._chunk_end = 0
+        self.closed = False
+
+    def _load_chunk(self, chunk_index):
+        if chunk_index != self._chunk_index:
+            start, end = self._compressed_offsets[chunk_index], self._compressed_offsets[chunk_index + 1]
+            self._stream.seek(start)
+            self._chunk = self.codec.decompress(self._stream.read(end - start))
+            self._chunk_index = chunk_index
+            self._chunk_start = self._offsets[chunk_index]
+            self._chunk_end = self._offsets[chunk_index + 1]
+        return self._chunk
+
+    def _current(self):
+        """
+        Decompressed chunk at the current position and the position inside it
+        """
+        chunk_index = bisect_right(self._offsets, self._position) - 1
+        chunk = self._load_chunk(chunk_index)
+        return chunk, self._position - self._offsets[chunk_index]
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        start = self._position - self._chunk_start
+        if start >= 0 and self._position + size <= self._chunk_end:
+            # most reads of the pickle and json readers are inside the current chunk
+            self._position += size
+            return self._chunk[start:start + size]
+
+        parts = list()
+        while size > 0 and self._position < self.size:
+            chunk, start = self._current()
+            part = chunk[start:start + size]
+            parts.append(part)
+            self._position += len(part)
+            size -= len(part)
+        return "".join(parts)
+
+    def readline(self, size=-1):
+        start = self._position - self._chunk_start
+        if start >= 0 and self._position < self._chunk_end and (size is None or size < 0):
+            end = self._chunk.find("\n", start) + 1
+            if end:
+                self._position += end - start
+                return self._chunk[start:end]
+
+        parts = list()
+        length = 0
+        while self._position < self.size and (size is None or size < 0 or length < size):
+            chunk, start = self._current()
+            end = chunk.find("\n", start)
+            end = len(chunk) if end < 0 else end + 1
+            if size is not None and size >= 0:
+                end = min(end, start + size - length)
+            part = chunk[start:end]
+            parts.append(part)
+            length += len(part)
+            self._position += len(part)
+            if part.endswith("\n"):
+                break
+        return "".join(parts)
+
+    def __iter__(self):
+        return iter(self.readline, "")
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._position = min(max(offset, 0), self.size)
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._stream.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -9,12 +9,17 @@ Module for displaying the output for Serialized data
 __author__ = 'Arjun Prasad Namdeo'
 
 import os
+import shutil
+import tempfile
 import config
 
-from collections import OrderedDict
-from scripts.common import io, validate_file_path
+from StringIO import StringIO
+from itertools import chain, islice
+from scripts import background
+from scripts.common import io, validate_file_path, open_atomic, LazyRegistry
+from scripts.metrics import trace
 
-output_registry = dict()
+output_registry = LazyRegistry()
 
 def get_supported_output_formats():
     """
@@ -50,25 +55,163 @@ class Exporter(object):
     Abstracted class for Export process. This should be used as base class for all the exporters
 
     HtmlExporter() and TextExporter() are good inherited examples.
+
+    The data can be any iterable of records (a list or a lazy parser.DataContainer). The output is
+    rendered in three parts, render_header(), render_row() for every record and render_footer().
+    Rows are rendered with a row template compiled once per set of headings, and written in the
+    file in chunks of ROWS_PER_CHUNK rows. So export time grows linearly with the number of rows
+    and only one chunk is held in memory.
     """
 
     EXPORT_TYPE = None
+    EXPORT_FILE_EXT = None
     EXPORT_FILE_NAME = None
 
+    ROWS_PER_CHUNK = 1000
+
     def __init__(self, data):
         self.data = data
+        self._row_templates = dict()
 
     def get_context(self):
         return self.data
 
-    def convert_data2string(self):
-        raise NotImplemented
+    def render_header(self, headings, total):
+        raise NotImplementedError
+
+    def compile_row_template(self, headings):
+        """
+        Return the "%" format string of one row, with a "%s" for every value. Needs to be implemented
+        in inherited classes
+        """
+        raise NotImplementedError
+
+    def render_footer(self):
+        raise NotImplementedError
+
+    def render_row(self, record):
+        """
+        Render one record with the compiled row template of its headings
+        """
+        headings = tuple(record.keys())
+        row_template = self._row_templates.get(headings)
+        if row_template is None:
+            row_template = self._row_templates[headings] = self.compile_row_template(headings)
+        return row_template % tuple(record.itervalues())
+
+    def convert_data2string(self, data=None):
+        """
+        Method to convert the user_data into the formatted string of this exporter
+        """
+        output = StringIO()
+        self.write(output, data=data)
+        return output.getvalue()
+
+    def write(self, stream, data=None):
+        """
+        Render the user_data and write it in the given open file stream, one chunk of rows at a time.
+
+        The header needs the total number of records. If the data has no length (like a lazy
+        DataContainer), the rows are spooled in a temporary file first and then copied after the header.
+
+        :return  `int`   Number of rows written
+        """
+        information = data or self.get_context()
+        records = iter(information)
+        first_record = next(records, None)
+        if first_record is None:
+            headings = list()
+        else:
+            headings = list(first_record.keys())
+            records = chain([first_record], records)
+
+        if hasattr(information, "__len__"):
+            stream.write(self.render_header(headings=headings, total=len(information)))
+            total = self._write_rows(stream, records)
+        else:
+            spool = tempfile.TemporaryFile(bufsize=config.WRITE_BUFFER_SIZE)
+            try:
+                total = self._write_rows(spool, records)
+                stream.write(self.render_header(headings=headings, total=total))
+                spool.seek(0)
+                shutil.copyfileobj(spool, stream, config.WRITE_BUFFER_SIZE)
+            finally:
+                spool.close()
+
+        stream.write(self.render_footer())
+        return total
+
+    def write_fragment(self, stream, data=None):
+        """
+        Write only the rendered rows of the user_data, without header and footer.
+        Fragments can be put together later with write_fragments().
+
+        :return  `int`   Number of rows written.
+        """
+        return self._write_rows(stream, iter(data or self.get_context()))
+
+    def write_fragments(self, stream, headings, total, fragmentPaths):
+        """
+        Write the header, the content of the row fragment files in order and the footer.
+        The output is the same as write() over all the rows of the fragments.
+        """
+        stream.write(self.render_header(headings=headings, total=total))
+        for fragmentPath in fragmentPaths:
+            with open(fragmentPath, "rb") as fragment:
+                shutil.copyfileobj(fragment, stream, config.WRITE_BUFFER_SIZE)
+        stream.write(self.render_footer())
+
+    def _write_rows(self, stream, records):
+        """
+        write all the rendered rows in the stream, ROWS_PER_CHUNK rows per write call.
+
+        :return  `int`   Number of rows written.
+        """
+        total = 0
+        render_row = self.render_row
+        while True:
+            chunk = [render_row(each_record) for each_record in islice(records, self.ROWS_PER_CHUNK)]
+            if not chunk:
+                break
+            stream.write("".join(chunk))
+            total += len(chunk)
+        return total
+
+    def export(self, filePath=None, data=None):
+        """
+        Method for the main export process.
+
+        :param  `filePath`  `str`   Output file path. Default is export_path
+        :param  `data`      `str`   Already rendered string to write instead of the user_data
+
+        :return  `str`   File path of the exported file.
+        """
+        export_file_path = filePath or self.export_path
+
+        if not validate_file_path(file_path=export_file_path, file_extension=self.EXPORT_FILE_EXT):
+            return None
+
+        with trace("export", format=self.__class__.__name__) as span:
+            with open_atomic(export_file_path, "w") as outputWriter:
+                if data:
+                    outputWriter.write(data)
+                else:
+                    span.rows = self.write(outputWriter)
+            span.bytes_written = os.path.getsize(export_file_path)
+
+        io.info("Display output has been created in %s Format. Output Saved here :  %s " % (self.EXPORT_TYPE,
+                                                                                            export_file_path))
+        return export_file_path
 
-    def export(self):
+    def export_async(self, filePath=None, data=None, executor=None):
         """
-        Method for the main export process. Needs to be implemented in inherited classes
+        Run export() in the background and return at once.
+
+        :param  `executor`  `BackgroundExecutor`   Default is the shared executor of scripts/background.py
+
+        :return  `BackgroundTask`   task.get() returns the file path of the exported file.
         """
-        raise NotImplemented
+        return background.submit_method(self, "export", (filePath, data), dict(), executor=executor)
 
     @property
     def export_path(self):
@@ -85,33 +228,18 @@ class HtmlExporter(Exporter):
     HTML Exporter will generate a output display page in HTML Format where all the user data can be shown
 
     This class has export() method which will generate the physical file at user directory
+
+    With a page size, the rows are written in pages and the html file is the index of the pages,
+    see scripts/html_pages.py
     """
     # Register this class
     __metaclass__ = RegisterMetaClass
 
     EXPORT_TYPE = "HTML"
-    EXPORT_FILE_NAME = "{0}.html".format(config.OUTPUT_FILE_NAME)
-
-    def convert_data2string(self, data=None):
-        """
-        Method to convert the user_data into HTML Exporter formatted string
-        """
-        information = data or self.get_context()
+    EXPORT_FILE_EXT = ".html"
+    EXPORT_FILE_NAME = "{0}{1}".format(config.OUTPUT_FILE_NAME, EXPORT_FILE_EXT)
 
-        _head_string = ""
-        _data_string = ""
-        _header_updated = False
-        for each_info in information:
-            _data_string += "\t\t<tr>\n\t\t\t"
-            for heading, data in OrderedDict(each_info).iteritems():
-                _data_string += "<td align='center'> %s </td>\n\t\t\t" % data
-                if _header_updated:
-                    continue
-                _head_string += "<th> %s </th>\n\t\t" % heading
-            _header_updated = True
-            _data_string += "\n\t\t</tr>\n"
-
-        html_string = """
+    HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -130,26 +258,42 @@ class HtmlExporter(Exporter):
 </body>
 </html>
 """
-        return html_string.format(HEAD=_head_string, DATA=_data_string, NUM=len(information))
+
+    def __init__(self, data, page_size=None, viewer=None):
+        """
+        @:param `page_size`   `int`    : Rows per page. Default is config.HTML_PAGE_SIZE, None writes one html file
+        @:param `viewer`      `bool`   : With the pages, also write the virtual scrolling viewer.
+                                         Default is config.HTML_VIEWER
+        """
+        super(HtmlExporter, self).__init__(data)
+        self.page_size = config.HTML_PAGE_SIZE if page_size is None else page_size
+        self.viewer = config.HTML_VIEWER if viewer is None else viewer
 
     def export(self, filePath=None, data=None):
         """
-        main export method
+        Write the html file, or the pages and their index page If there is a page size. See Exporter.export()
         """
-        export_file_path = filePath or self.export_path
+        if not self.page_size or data:
+            return super(HtmlExporter, self).export(filePath=filePath, data=data)
 
-        if not validate_file_path(file_path=export_file_path, file_extension=".html"):
+        export_file_path = filePath or self.export_path
+        if not validate_file_path(file_path=export_file_path, file_extension=self.EXPORT_FILE_EXT):
             return None
+        # the pages are only needed for big datasets, the module is imported on first use
+        from scripts import html_pages
+        return html_pages.export_pages(self, export_file_path)
 
-        html_string = data or self.convert_data2string()
-
-        with open(export_file_path, "w") as htmlWriter:
-            htmlWriter.write(html_string)
+    def render_header(self, headings, total):
+        _head_string = "".join("<th> %s </th>\n\t\t" % heading for heading in headings)
+        header_template = self.HTML_TEMPLATE.split("{DATA}")[0]
+        return header_template.format(HEAD=_head_string, NUM=total)
 
-        io.info("Display output has been created in %s Format. Output Saved here :  %s " % (self.EXPORT_TYPE,
-                                                                                            export_file_path))
-        return export_file_path
+    def compile_row_template(self, headings):
+        cells = "<td align='center'> %s </td>\n\t\t\t" * len(headings)
+        return "\t\t<tr>\n\t\t\t" + cells + "\n\t\t</tr>\n"
 
+    def render_footer(self):
+        return self.HTML_TEMPLATE.split("{DATA}")[1]
 
 
 class TextExporter(Exporter):
@@ -163,43 +307,21 @@ class TextExporter(Exporter):
     __metaclass__ = RegisterMetaClass
 
     EXPORT_TYPE = "TEXT"
-    EXPORT_FILE_NAME = "{0}.txt".format(config.OUTPUT_FILE_NAME)
-
-    def convert_data2string(self, data=None):
-        """
-        Method to convert the user_data into Text Exporter formatted string
-        """
-        information = data or self.get_context()
+    EXPORT_FILE_EXT = ".txt"
+    EXPORT_FILE_NAME = "{0}{1}".format(config.OUTPUT_FILE_NAME, EXPORT_FILE_EXT)
 
+    def render_header(self, headings, total):
         text_string = ""
         text_string += "**********  Output in TEXT Format  ************* \n\n"
-        text_string += "Total inputs received :  %s \n" % len(information)
+        text_string += "Total inputs received :  %s \n" % total
         text_string += "------------------------------------------------\n"
-
-        for each_info in information:
-            for heading, data in OrderedDict(each_info).iteritems():
-                text_string += "\t{0}\t\t=\t{1} \n".format(heading, data)
-            text_string += "\n"
-            text_string += "------------------------------------------------\n"
         return text_string
 
-    def export(self, filePath=None, data=None):
-        """
-        main export method
-        """
-
-        export_file_path = filePath or self.export_path
-
-        if not validate_file_path(file_path=export_file_path, file_extension=".txt"):
-            return None
-
-        text_string = data or self.convert_data2string()
-
-        with open(export_file_path, "w") as textWriter:
-            textWriter.write(text_string)
-
-        io.info("Display output has been created in %s Format. Output Saved here :  %s " % (self.EXPORT_TYPE,
-                                                                                            export_file_path))
-        return export_file_path
-
+    def compile_row_template(self, headings):
+        lines = ["\t{0}\t\t=\t%s \n".format(str(heading).replace("%", "%%")) for heading in headings]
+        lines.append("\n")
+        lines.append("------------------------------------------------\n")
+        return "".join(lines)
 
+    def render_footer(self):
+        return ""
@@ -10,15 +10,62 @@ __author__ = 'Arjun Prasad Namdeo'
 
 # import python in-built module(s)
 import os
+import re
 import json
-import pickle
+import importlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from bisect import bisect_right
+from itertools import imap
+from StringIO import StringIO
+from cStringIO import StringIO as BytesIO
+from json.encoder import encode_basestring_ascii
 
 # import self-package module(s)
 import config
-from scripts.common import io, validate_file_path
+from scripts import background, metrics, schema
+from scripts.common import io, validate_file_path, ensure_parent_directory, LazyRegistry, get_file_stamp
+from scripts.cache import resolve_cache
+from scripts.compression import get_compressed_path, open_input, open_output, strip_compressed_extension
+from scripts.metrics import trace
+from scripts.manifest import is_manifest, read_manifest
+from scripts.offset_index import OffsetIndex, OffsetIndexWriter, get_index_path, remove_index, resolve_record_ids
+from scripts.secondary_index import SecondaryIndexBuilder, remove_secondary_indexes
+from scripts.records import Record, pairs_to_record, to_record
+
+# Faster json backends, in order of preference, used when config.JSON_BACKEND is None. They are only used for
+# decoding whole files, the files are always written by the standard json module
+JSON_BACKENDS = ["orjson", "ujson", "simplejson"]
+_json_backends = dict()
+
+
+def get_json_backend(name=None):
+    """
+    Json module used for decoding whole files. The standard json module unless a faster backend is set in
+    config.JSON_BACKEND
 
-# Creating registry to store all the serialization format classes
-registry = dict()
+    @:param `name`   `str`   : Backend name, like "ujson" or "json". Default is config.JSON_BACKEND. A None
+                               config.JSON_BACKEND picks the first installed one of JSON_BACKENDS, or json
+    """
+    name = config.JSON_BACKEND if name is None else name
+    if name not in _json_backends:
+        backend = json
+        for backend_name in [name] if name else JSON_BACKENDS:
+            try:
+                backend = importlib.import_module(backend_name)
+                break
+            except ImportError:
+                if name:
+                    raise
+        _json_backends[name] = backend
+    return _json_backends[name]
+
+
+# Creating registry to store all the serialization format classes. Formats of other modules are
+# declared at the end of this module and imported on first use
+registry = LazyRegistry()
 
 def get_supported_serializer_formats():
     """
@@ -39,6 +86,23 @@ def register_class(target_class):
     return target_class
 
 
+def find_serializer(filePath):
+    """
+    Registered serializer class which has written the file, from the manifest or from the file extension.
+    Compressed files are found by the extension under the codec extension.
+    """
+    if is_manifest(filePath):
+        return registry[read_manifest(filePath)["format"]]
+
+    uncompressedPath = strip_compressed_extension(filePath)
+    for class_name in sorted(registry):
+        serializer_class = registry[class_name]
+        if serializer_class.TEMP_FILE_EXT and uncompressedPath.endswith(serializer_class.TEMP_FILE_EXT):
+            return serializer_class
+    raise ValueError("No registered serializer writes %s files, give the format of %s" % (
+        os.path.splitext(uncompressedPath)[1], filePath))
+
+
 class RegisterMetaClass(type):
     """
     Base meta-class to store class registry information
@@ -59,32 +123,349 @@ class Serializer(object):
     You can use this class as base class and define your own Serializer
 
         Extension example : JsonSerializer() and PickleSerializer()
+
+    The data can be any iterable of records (a list or a lazy parser.DataContainer).
+    encode() opens the target file and hands it over to write(), which should write the
+    records one by one as they come. decode() opens the file and hands it over to read().
+    So most of the inherited classes only need to implement write() and read().
     """
 
+    FORMAT_NAME = None
     TEMP_FILE_NAME = None
     TEMP_FILE_EXT = None
 
+    WRITE_MODE = "w"
+    READ_MODE = "r"
+
+    # Set this False If the decoded data is not worth caching (memory mapped, already cheap to decode)
+    CACHEABLE = True
+
+    # Set this True If every record is written on its own and can be read back with read_record()
+    INDEXABLE = False
+
+    # Set this True If decode() returns a dataset with a `columns` view, so queries can filter the columns
+    COLUMNAR = False
+
     def __init__(self, data):
         super(Serializer, self).__init__()
         self.dataToWrite = data
+        # True while encode() writes an offset index, every record has to be readable on its own
+        self.indexed = False
 
     @property
     def temporary_filePath(self):
         """
         temporary file path for saving the serialized data
         """
-        filePath = os.path.join(config.OUTPUT_DIRECTORY, self.TEMP_FILE_NAME)
-        return filePath
+        return self.resolve_filePath()
+
+    @classmethod
+    def resolve_filePath(cls, filePath=None):
+        """
+        Return the given file path or the temporary file path of this serializer
+        """
+        file_path = filePath or os.path.join(config.OUTPUT_DIRECTORY, cls.TEMP_FILE_NAME)
+        return file_path.replace("\\", "/")
+
+    def encode(self, filePath=None, index=None, secondary_indexes=None, compression=None):
+        """
+        Method for encode/serialize the user data. This will save the serialized file in user directory.
+
+        The location will get printed in the user's console/terminal
+
+        @:param `index`               `bool`   : Write an offset index next to the file.
+                                                 Default is config.WRITE_OFFSET_INDEX
+        @:param `secondary_indexes`   `dict`   : {field: "hash" or "sorted"} indexes for scripts/query.py.
+                                                 Default is config.SECONDARY_INDEXES
+        @:param `compression`         `str`    : Compression codec, see scripts/compression.py. The codec name is
+                                                 added to the file name. Default is config.COMPRESSION
+
+        :return  `str`   File path of serialized file.
+        """
+        compression = config.COMPRESSION if compression is None else compression
+        file_to_serialization = get_compressed_path(self.resolve_filePath(filePath), compression)
+
+        if not self.validate_extension(file_to_serialization):
+            return None
+
+        index = config.WRITE_OFFSET_INDEX if index is None else index
+        secondary_indexes = config.SECONDARY_INDEXES if secondary_indexes is None else secondary_indexes
+
+        records = self.dataToWrite
+        index_builder = None
+        if secondary_indexes:
+            index_builder = SecondaryIndexBuilder(secondary_indexes)
+            records = index_builder.track(records)
+            # secondary indexes find the records through the offset index
+            index = True
+
+        with trace("encode", format=self.__class__.__name__) as span:
+            ensure_parent_directory(file_to_serialization)
+            # the file is written in a temporary file and renamed in place when complete
+            index_writer = None
+            if index and self.INDEXABLE:
+                index_writer = OffsetIndexWriter(get_index_path(file_to_serialization))
+            self.indexed = index_writer is not None
+            try:
+                with open_output(file_to_serialization, self.WRITE_MODE, compression) as writeFile:
+                    if index_writer is not None:
+                        records = index_writer.track(writeFile, records)
+                    self.write(writeFile, span.count(records))
+                    end_offset = writeFile.tell()
+
+                # indexes keep the size and modification time of the file on disk, to find out when they are
+                # out of date
+                data_size, data_mtime = get_file_stamp(file_to_serialization)
+                span.bytes_written = data_size
+                if index_writer is not None:
+                    index_writer.finish(end_offset, data_size, data_mtime)
+            finally:
+                if index_writer is not None:
+                    index_writer.close()
+                self.indexed = False
+
+            if index_writer is None:
+                remove_index(file_to_serialization)
+            remove_secondary_indexes(file_to_serialization)
+            if index_builder is not None:
+                index_builder.write(file_to_serialization, data_size, data_mtime)
+
+            # the column types of the data, so the readers do not have to guess them from the values
+            data_schema = getattr(self.dataToWrite, "schema", None)
+            if isinstance(data_schema, schema.Schema):
+                schema.write_schema(file_to_serialization, data_schema, data_size, data_mtime)
+            else:
+                schema.remove_schema(file_to_serialization)
+
+        io.info("")
+        io.info("Serialization Done in %s Format. Serialized data saved here :  %s \n" % (self.FORMAT_NAME,
+                                                                                      file_to_serialization))
+        return file_to_serialization
+
+    def encode_string(self):
+        """
+        Serialize the user data in memory, without writing any file. Used by scripts/server.py
+        for returning the serialized bytes.
+
+        :return  `str`   Serialized data
+        """
+        output = StringIO()
+        with trace("encode", format=self.__class__.__name__) as span:
+            self.write(output, span.count(self.dataToWrite))
+            data = output.getvalue()
+            span.bytes_written = len(data)
+        return data
+
+    def encode_async(self, filePath=None, executor=None, **kwargs):
+        """
+        Run encode() in the background and return at once. Takes the same arguments as encode().
+
+        @:param `executor`   `BackgroundExecutor`   : Default is the shared executor of scripts/background.py
+
+        :return  `BackgroundTask`   task.get() returns the file path of serialized file.
+        """
+        return background.submit_method(self, "encode", (filePath,), kwargs, executor=executor)
 
-    def encode(self):
+    @classmethod
+    def decode_async(cls, filePath=None, executor=None, **kwargs):
+        """
+        Run decode() in the background and return at once. Takes the same arguments as decode().
+
+        :return  `BackgroundTask`   task.get() returns the de-serialized records.
+        """
+        return background.submit_method(cls, "decode", (filePath,), kwargs, executor=executor)
+
+    @classmethod
+    def validate_extension(cls, filePath, check_existence=False):
+        """
+        Check the file extension of this serializer. Compressed files have the codec name after it.
+        """
+        if not validate_file_path(file_path=strip_compressed_extension(filePath), file_extension=cls.TEMP_FILE_EXT):
+            return False
+        return validate_file_path(file_path=filePath, check_existence=check_existence)
+
+    @classmethod
+    def decode(cls, filePath=None, cache=None, records=None):
+        """
+        Method for decode/de-serialize the user data. You can pass an external file here,
+        or the manifest of a sharded output.
+
+        @:param `cache`     `DecodeCache`  : Reuse the data decoded before, as long as the file has not changed.
+                                             True uses the default cache of scripts/cache.py
+        @:param `records`   `slice/list`   : Decode only these records. With an offset index next to the file
+                                             only the requested records are read.
+
+        :return  `list`   De-serialized records.
+        """
+        file_to_serialization = cls.resolve_filePath(filePath)
+
+        if is_manifest(file_to_serialization):
+            if not validate_file_path(file_path=file_to_serialization, check_existence=True):
+                return None
+            return cls.decode_manifest(file_to_serialization, cache=cache, records=records)
+
+        if not cls.validate_extension(file_to_serialization, check_existence=True):
+            return None
+
+        with trace("decode", format=cls.__name__) as span:
+            if records is not None:
+                data = cls.decode_records(file_to_serialization, records)
+            else:
+                decode_cache = resolve_cache(cache) if cls.CACHEABLE else None
+                if decode_cache is not None:
+                    data = decode_cache.get(cls.__name__, file_to_serialization,
+                                            lambda: cls.read_file(file_to_serialization))
+                else:
+                    data = cls.read_file(file_to_serialization)
+            span.rows = len(data)
+        return data
+
+    @classmethod
+    def read_schema(cls, filePath=None):
+        """
+        Schema of the serialized data, written next to the file when the data had one (see scripts/schema.py).
+        The decoded values already have the types of the schema.
+
+        :return  `Schema`   None If the data was written without schema
+        """
+        return schema.read_schema(cls.resolve_filePath(filePath))
+
+    @classmethod
+    def iter_decode(cls, filePath=None, as_records=False):
+        """
+        Generator version of decode(). Records are read one at a time where the format allows it,
+        so the whole file never has to be kept in memory.
+
+        @:param `as_records`   `bool`   : Yield records.Record objects, with the fields in the order of the file
+        """
+        file_to_serialization = cls.resolve_filePath(filePath)
+
+        if is_manifest(file_to_serialization):
+            for part in cls.read_manifest(file_to_serialization)["parts"]:
+                for each_record in cls.iter_decode(filePath=part["path"], as_records=as_records):
+                    yield each_record
+            return
+
+        if not cls.validate_extension(file_to_serialization, check_existence=True):
+            return
+
+        with trace("iter_decode", format=cls.__name__) as span:
+            span.bytes_read = os.path.getsize(file_to_serialization)
+            with open_input(file_to_serialization, cls.READ_MODE) as readFile:
+                records = cls.iter_read_records(readFile) if as_records else cls.iter_read(readFile)
+                for each_record in span.count(records):
+                    yield each_record
+
+    @classmethod
+    def read_file(cls, filePath):
+        """
+        Open the file and read the records from it
+        """
+        with open_input(filePath, cls.READ_MODE) as readFile:
+            data = cls.read(readFile)
+        metrics.increment("bytes_read", os.path.getsize(filePath), operation="decode", format=cls.__name__)
+        return data
+
+    @classmethod
+    def decode_records(cls, filePath, records):
         """
-        Method for encode/serialize the user data. Needs to be implemented in inherited classes
+        Decode only the requested records of the file, in the requested order. Records are read
+        one by one through the offset index If there is an up to date one, otherwise the whole file is decoded.
+        """
+        index_path = get_index_path(filePath)
+        if cls.INDEXABLE and os.path.isfile(index_path):
+            with OffsetIndex(index_path) as index:
+                if index.is_current(filePath):
+                    record_ids = resolve_record_ids(records, len(index))
+                    with open_input(filePath, cls.READ_MODE) as readFile:
+                        return [cls.read_record(index.read_record_bytes(readFile, record_id))
+                                for record_id in record_ids]
+            io.warn("Offset index %s is out of date. Decoding the whole file." % index_path)
+
+        data = cls.read_file(filePath)
+        return [data[record_id] for record_id in resolve_record_ids(records, len(data))]
+
+    @classmethod
+    def read_manifest(cls, manifestPath):
+        """
+        Read the manifest of a sharded output and check that it has been written by this serializer
+        """
+        manifest = read_manifest(manifestPath)
+        if manifest["format"] != cls.__name__:
+            raise ValueError("Manifest %s has been written by %s, it can not be decoded with %s" % (
+                manifestPath, manifest["format"], cls.__name__))
+        return manifest
+
+    @classmethod
+    def decode_manifest(cls, manifestPath, cache=None, records=None):
+        """
+        Decode all the parts listed in the manifest, in order, into one list of records.
+        Every part is cached on its own.
+
+        With `records`, only the parts which hold the requested records are decoded.
+        """
+        parts = cls.read_manifest(manifestPath)["parts"]
+        if records is None:
+            data = list()
+            for part in parts:
+                data.extend(cls.decode(filePath=part["path"], cache=cache))
+            return data
+
+        part_starts = [0]
+        for part in parts:
+            part_starts.append(part_starts[-1] + part["rows"])
+        record_ids = resolve_record_ids(records, part_starts[-1])
+
+        # group the requested records by part, then put them back in the requested order
+        part_records = dict()
+        for record_id in record_ids:
+            part_index = bisect_right(part_starts, record_id) - 1
+            part_records.setdefault(part_index, list()).append(record_id - part_starts[part_index])
+
+        decoded = dict()
+        for part_index, part_ids in part_records.iteritems():
+            part_data = cls.decode(filePath=parts[part_index]["path"], records=part_ids)
+            decoded.update(((part_index, part_id), record) for part_id, record in zip(part_ids, part_data))
+
+        data = list()
+        for record_id in record_ids:
+            part_index = bisect_right(part_starts, record_id) - 1
+            data.append(decoded[(part_index, record_id - part_starts[part_index])])
+        return data
+
+    def write(self, stream, records):
+        """
+        Write the records in given open file stream. Needs to be implemented in inherited classes
         """
         raise NotImplementedError
 
-    def decode(self):
+    @classmethod
+    def read(cls, stream):
         """
-        Method for decode/de-serialize the user data. Needs to be implemented in inherited classes
+        Read the records from given open file stream. Needs to be implemented in inherited classes
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def iter_read(cls, stream):
+        """
+        Yield the records from given open file stream. Inherited classes can override this to stream
+        the records, by default the whole stream is read with read()
+        """
+        return iter(cls.read(stream))
+
+    @classmethod
+    def iter_read_records(cls, stream):
+        """
+        Yield the records of the given stream as records.Record objects. Formats which lose the order of the
+        fields, like json objects, should override this
+        """
+        return imap(to_record, cls.iter_read(stream))
+
+    @classmethod
+    def read_record(cls, data):
+        """
+        Decode one record from its raw bytes. Needs to be implemented in the INDEXABLE classes
         """
         raise NotImplementedError
 
@@ -100,53 +481,150 @@ class JsonSerializer(Serializer):
     __metaclass__ = RegisterMetaClass
 
     INDENT = 4
+    COMPACT_SEPARATORS = (",", ":")
+    INDEXABLE = True
+    FORMAT_NAME = "JSON"
     TEMP_FILE_EXT = ".json"
     TEMP_FILE_NAME = "{0}{1}".format(config.SERIALIZE_FILE_NAME, TEMP_FILE_EXT)
 
-    def __init__(self, data=None):
-        super(JsonSerializer, self).__init__(data)
+    _decoder = json.JSONDecoder()
+    # json objects decoded as records, with the keys in the order of the file
+    _record_decoder = json.JSONDecoder(object_pairs_hook=pairs_to_record)
+    _separators = re.compile(r"[ \t\r\n,]*")
 
-    def encode(self, filePath=None):
+    def __init__(self, data=None, compact=None):
         """
-        Method for encode/serialize the user data in Json format. This will save
-        a json file format in user directory.
-
-        The location will get printed in the user's console/terminal
+        @:param `compact`   `bool`   : Write the json without indentation and spaces.
+                                       Default is config.JSON_COMPACT
+        """
+        super(JsonSerializer, self).__init__(data)
+        self.compact = config.JSON_COMPACT if compact is None else compact
+        self.indent = None if self.compact else self.INDENT
+        self.item_separator, self.key_separator = self.COMPACT_SEPARATORS if self.compact else (", ", ": ")
 
-        :return  `str`   File path of serialized file.
+    def write(self, stream, records):
         """
+        Write the records as a json list, one record at a time.
 
-        file_to_serialization = filePath or self.temporary_filePath
-        file_to_serialization = file_to_serialization.replace("\\", "/")
+        The output is exactly the same as json.dump(list(records), stream, indent=INDENT)
+        (or with the compact separators) but the list is never built in memory.
+        """
+        new_line = "" if self.indent is None else "\n" + " " * self.indent
+        record_templates = dict()
+        json_encoder = json.JSONEncoder(indent=self.indent, separators=(self.item_separator, self.key_separator))
+        encode_value = self.encode_value
+        write = stream.write
+
+        write("[")
+        separator = new_line
+        for each_record in records:
+            if isinstance(each_record, Record):
+                # records with the same headers share one pre-rendered template
+                template = record_templates.get(each_record.fields)
+                if template is None:
+                    template = record_templates[each_record.fields] = self.record_template(each_record.fields)
+                write(separator + template % tuple(map(encode_value, each_record.itervalues())))
+            else:
+                write(separator + json_encoder.encode(each_record).replace("\n", new_line))
+            separator = self.item_separator + new_line
+
+        if separator != new_line and self.indent is not None:
+            write("\n")
+        write("]")
+
+    def record_template(self, fields):
+        """
+        Build the json text of a record, as an item of the top level list, with "%s" in place of the values.
+        """
+        if not fields:
+            return "{}"
 
-        if not validate_file_path(file_path=file_to_serialization, file_extension=self.TEMP_FILE_EXT):
-            return None
+        keys = ["%s%s%%s" % (encode_basestring_ascii(field).replace("%", "%%"), self.key_separator)
+                for field in fields]
+        if self.indent is None:
+            return "{" + self.item_separator.join(keys) + "}"
 
-        with open(file_to_serialization, "w") as writeFile:
-            json.dump(self.dataToWrite, writeFile, indent=self.INDENT)
+        item_line = "\n" + " " * (self.indent * 2)
+        closing_line = "\n" + " " * self.indent
+        return "{" + item_line + (self.item_separator + item_line).join(keys) + closing_line + "}"
 
-        io.info("")
-        io.info("Serialization Done in JSON Format. Serialized data saved here :  %s \n" % file_to_serialization)
-        return file_to_serialization
+    @staticmethod
+    def encode_value(value):
+        """
+        Json text of a single value
+        """
+        value_type = type(value)
+        if value_type is str or value_type is unicode:
+            return encode_basestring_ascii(value)
+        if value_type is int or value_type is long:
+            return str(value)
+        return json.dumps(value)
 
     @classmethod
-    def decode(cls, filePath=None):
+    def read(cls, stream):
+        """
+        Read the json list from the given stream, with the json backend of config.JSON_BACKEND.
         """
-        Method for decode/de-serialize the user data. You can pass and external json File here.
+        backend = get_json_backend()
+        if backend is json:
+            return json.load(stream)
+        return backend.loads(stream.read())
 
-        This method will read the file with json_reader
+    @classmethod
+    def iter_read(cls, stream, decoder=None):
+        """
+        Yield the records of the json list one at a time, parsing the stream in blocks of config.READ_BLOCK_SIZE
         """
+        decode = (decoder or cls._decoder).raw_decode
+        skip = cls._separators.match
+        buffer, position, end_of_stream, in_list = "", 0, False, False
+        while True:
+            position = skip(buffer, position).end()
+            if position < len(buffer):
+                if not in_list:
+                    if buffer[position] != "[":
+                        raise ValueError("%s stream is not a json list" % cls.__name__)
+                    in_list = True
+                    position += 1
+                    continue
+                if buffer[position] == "]":
+                    return
+                try:
+                    each_record, end = decode(buffer, position)
+                    # a value which ends with the buffer may continue in the next block
+                    complete = end < len(buffer) or end_of_stream
+                except ValueError:
+                    complete = False
+                if complete:
+                    position = end
+                    yield each_record
+                    continue
+
+            if end_of_stream:
+                if in_list or position < len(buffer):
+                    raise ValueError("%s stream ends in the middle of the json list" % cls.__name__)
+                return
+            block = stream.read(config.READ_BLOCK_SIZE)
+            end_of_stream = not block
+            buffer = buffer[position:] + block
+            position = 0
 
-        file_to_serialization = filePath or cls.temporary_filePath
-        file_to_serialization = file_to_serialization.replace("\\", "/")
+    @classmethod
+    def iter_read_records(cls, stream):
+        return cls.iter_read(stream, decoder=cls._record_decoder)
 
-        if not validate_file_path(file_path=file_to_serialization, file_extension=cls.TEMP_FILE_EXT,
-                                  check_existence=True):
-            return None
+    @classmethod
+    def read_record(cls, data):
+        """
+        Decode one record of the json list. The raw bytes start with the separator of the previous record.
+        """
+        return cls._decoder.raw_decode(data.lstrip(", \r\n\t"))[0]
 
-        with open(file_to_serialization, "r") as readFile:
-            data = json.load(readFile)
-        return data
+
+# Opcodes of a pickled list (see the pickle module), the records are appended in batches like pickle.dump() does
+PICKLE_PROTO, PICKLE_STOP, PICKLE_MARK = "\x80", ".", "("
+PICKLE_EMPTY_LIST, PICKLE_LIST, PICKLE_APPEND, PICKLE_APPENDS = "]", "l", "a", "e"
+PICKLE_BATCH_SIZE = 1000
 
 
 class PickleSerializer(Serializer):
@@ -154,55 +632,128 @@ class PickleSerializer(Serializer):
     Pickle Serializer class. This has methods for encode/decode the user inputs
 
     This is a inherited class of Serializer
+
+    The file is one pickled list of the records, like the files of the older versions, so pickle.load() of the
+    file gives the list of mappings. The list is written one record at a time, the records are never all kept
+    in memory.
+    With an offset index every record is written as its own pickle frame instead, one after another, so every
+    record can be read on its own. Both layouts are readable, as well as the files of the text protocol 0.
+
+    The file is written with config.PICKLE_PROTOCOL, the highest binary protocol by default.
+
+    Without an offset index the pickle memo is kept for config.PICKLE_MEMO_RECORDS records, so the field names
+    and the repeated values are written once per block of records and referenced afterwards.
     """
     # Register this class
     __metaclass__ = RegisterMetaClass
 
+    INDEXABLE = True
+    FORMAT_NAME = "PICKLE"
     TEMP_FILE_EXT = ".pickle"
     TEMP_FILE_NAME = "{0}{1}".format(config.SERIALIZE_FILE_NAME, TEMP_FILE_EXT)
 
-    def __init__(self, data):
+    WRITE_MODE = "wb"
+    READ_MODE = "rb"
+
+    def __init__(self, data, protocol=None):
         super(PickleSerializer, self).__init__(data)
+        self.protocol = protocol
 
-    def encode(self, filePath=None):
+    @staticmethod
+    def resolve_protocol(protocol=None):
         """
-        Method for encode/serialize the user data in Json format. This will save
-        a pickle file format in user directory.
-
-        The location will get printed in the user's console/terminal
-
-        :return  `str`   File path of serialized file.
+        Pickle protocol to write with. None (or a negative number) is the highest protocol of the interpreter
 
+        @:param `protocol`   `int`   : Protocol number. Default is config.PICKLE_PROTOCOL
         """
-
-        file_to_serialization = filePath or self.temporary_filePath
-        file_to_serialization = file_to_serialization.replace("\\", "/")
-
-        if not validate_file_path(file_path=file_to_serialization, file_extension=self.TEMP_FILE_EXT):
-            return None
-
-        with open(file_to_serialization, "wb") as writeFile:
-            pickle.dump(self.dataToWrite, writeFile)
-
-        io.info("")
-        io.info("Serialization Done in PICKLE Format. Serialized data saved here :  %s \n" % file_to_serialization)
-        return file_to_serialization
+        protocol = config.PICKLE_PROTOCOL if protocol is None else protocol
+        if protocol is None or protocol < 0:
+            return pickle.HIGHEST_PROTOCOL
+        if protocol > pickle.HIGHEST_PROTOCOL:
+            raise ValueError("Pickle protocol %s is not supported, the highest protocol is %s" % (
+                protocol, pickle.HIGHEST_PROTOCOL))
+        return protocol
+
+    def write(self, stream, records):
+        """
+        Write the records in the given stream, as one pickled list or as one pickle frame per record with an
+        offset index
+        """
+        protocol = self.resolve_protocol(self.protocol)
+        if self.indexed:
+            # every frame has to be readable on its own, through the offset index
+            pickler = pickle.Pickler(stream, protocol)
+            for each_record in records:
+                pickler.dump(each_record)
+                pickler.clear_memo()
+            return
+
+        # the opcodes of pickle.dump(list(records)), with the pickle of every record in between. The records are
+        # pickled one by one with the same pickler, so the memo references the values of the earlier records
+        buffer = BytesIO()
+        pickler = pickle.Pickler(buffer, protocol)
+        # a pickle starts with the protocol (2 and higher) and ends with STOP
+        start = 2 if protocol >= 2 else 0
+        if start:
+            stream.write(PICKLE_PROTO + chr(protocol))
+        stream.write(PICKLE_EMPTY_LIST if protocol else PICKLE_MARK + PICKLE_LIST)
+
+        memo_records = max(config.PICKLE_MEMO_RECORDS or 1, 1)
+        written = 0
+        for each_record in records:
+            # the binary protocols append the records in batches, protocol 0 one by one
+            if protocol and written % PICKLE_BATCH_SIZE == 0:
+                if written:
+                    stream.write(PICKLE_APPENDS)
+                stream.write(PICKLE_MARK)
+            pickler.dump(each_record)
+            stream.write(buffer.getvalue()[start:-1])
+            buffer.seek(0)
+            buffer.truncate()
+            if not protocol:
+                stream.write(PICKLE_APPEND)
+            written += 1
+            if written % memo_records == 0:
+                # the memo keeps a reference to every pickled object, it is not kept for the whole file
+                pickler.clear_memo()
+        if protocol and written:
+            stream.write(PICKLE_APPENDS)
+        stream.write(PICKLE_STOP)
 
     @classmethod
-    def decode(cls, filePath=None):
+    def read(cls, stream):
         """
-        Method for decode/de-serialize the user data
+        Read all the pickle frames from given stream and return the list of records
         """
+        return list(cls.iter_read(stream))
 
-        file_to_serialization = filePath or cls.temporary_filePath
-        file_to_serialization = file_to_serialization.replace("\\", "/")
-
-        if not validate_file_path(file_path=file_to_serialization, file_extension=cls.TEMP_FILE_EXT,
-                                  check_existence=True):
-            return None
+    @classmethod
+    def iter_read(cls, stream):
+        """
+        Yield the records of the pickled list, or of the pickle frames one at a time. The list of a file without
+        offset index is loaded at once.
+        """
+        load = pickle.Unpickler(stream).load
+        while True:
+            try:
+                frame = load()
+            except EOFError:
+                break
+
+            # files without offset index have all the records pickled as one list
+            if isinstance(frame, list):
+                for each_record in frame:
+                    yield each_record
+            else:
+                yield frame
 
-        with open(file_to_serialization, "rb") as readFile:
-            data = pickle.load(readFile)
-        return data
+    @classmethod
+    def read_record(cls, data):
+        """
+        Decode one pickle frame
+        """
+        return pickle.loads(data)
 
 
+# Serializers of the other modules, imported when they are used first
+registry.declare("ColumnarSerializer", "scripts.columnar")
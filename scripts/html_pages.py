@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the paginated HTML export of big datasets.
+
+One HTML table with every row freezes the browser beyond a few hundred thousand rows. With a page size, the
+HtmlExporter writes the rows in pages of `page_size` rows and an index page in place of the single file :
+
+    output_files/display_output.html                        index page : pages, and the pages of every Sequence
+    output_files/display_output_pages/page-00001.html       rows 1 - page_size
+    output_files/display_output_pages/page-00002.html       ...
+
+The pages are written one after another while the records are read, so every page takes the same time to write
+and to open, whatever the total size. Only two pages of records are held in memory.
+
+With the viewer, every page of rows is also written as a chunk of JSON rows, and viewer.html shows all the rows
+in one scrolling table which loads only the chunks in view. The chunks are small scripts (JSONP) instead of
+.json files, so the viewer also works when opened from the disk, where browsers block fetch().
+
+    Example :
+        HtmlExporter(data=user_data, page_size=1000, viewer=True).export()
+        python serialization_app.py --external_file shots.csv --html_pages 1000 --html_viewer
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import re
+import cgi
+import json
+from itertools import islice
+from collections import OrderedDict
+
+import config
+from scripts.common import io, is_temp_path, open_atomic
+from scripts.metrics import trace
+
+PAGES_SUFFIX = "_pages"
+PAGE_NAME = "page-{0:05d}.html"
+CHUNK_NAME = "chunk-{0:05d}.js"
+VIEWER_NAME = "viewer.html"
+_numbered_file = re.compile(r"(page|chunk)-([0-9]+)\.(html|js)$")
+
+PAGE_HEADER = """
+<!DOCTYPE html>
+<html>
+<head>
+<title>Serialized data in HTML display - Page {PAGE}</title>
+</head>
+<body>
+<p align="center">{NAVIGATION}</p>
+<table border=1, style="width:60%", align="center">
+<caption style="color:red"><B>Output in HTML Format - Entries {FIRST} to {LAST}</B></caption>
+    <tr>
+        {HEAD}
+    </tr>
+     <indent>
+"""
+
+PAGE_FOOTER = """
+     </indent>
+</table>
+<p align="center">{NAVIGATION}</p>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+<title>Serialized data in HTML display</title>
+</head>
+<body>
+<h3 align="center" style="color:red">Output in HTML Format - Total Entries : {NUM} in {PAGES} pages</h3>
+<p align="center">{VIEWER}</p>
+<p align="center">{PAGE_LINKS}</p>
+{GROUPS}
+</body>
+</html>
+"""
+
+GROUPS_TEMPLATE = """<table border=1, style="width:60%", align="center">
+    <tr>
+        <th> {FIELD} </th>
+		<th> Entries </th>
+		<th> Pages </th>
+    </tr>
+{ROWS}</table>
+"""
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<title>Serialized data viewer</title>
+<style>
+    #viewport {{ height: 90vh; overflow-y: auto; position: relative; }}
+    #rows {{ position: absolute; left: 0; right: 0; border-collapse: collapse; }}
+    #rows td, #rows th {{ height: {ROW_HEIGHT}px; padding: 0 8px; border: 1px solid #ccc; text-align: center; }}
+</style>
+</head>
+<body>
+<p align="center"><a href="../{INDEX}">Index</a> - Total Entries : {NUM}</p>
+<div id="viewport"><div id="spacer"></div><table id="rows"></table></div>
+<script>
+var TOTAL = {NUM}, CHUNK_SIZE = {CHUNK_SIZE}, ROW_HEIGHT = {ROW_HEIGHT}, MAX_HEIGHT = {MAX_HEIGHT};
+var HEADINGS = {HEADINGS};
+var chunks = {{}}, requested = {{}};
+var viewport = document.getElementById("viewport"), table = document.getElementById("rows");
+// browsers cap the height of an element, the spacer of a big dataset is capped and the scroll position is scaled
+var rowsHeight = (TOTAL + 1) * ROW_HEIGHT, spacerHeight = Math.min(rowsHeight, MAX_HEIGHT);
+document.getElementById("spacer").style.height = spacerHeight + "px";
+
+// called by the chunk scripts
+function loadChunk(number, rows) {{
+    chunks[number] = rows;
+    render();
+}}
+
+function request(number) {{
+    if (requested[number]) return;
+    requested[number] = true;
+    var name = String(number);
+    while (name.length < 5) name = "0" + name;
+    var script = document.createElement("script");
+    script.src = "chunk-" + name + ".js";
+    document.body.appendChild(script);
+}}
+
+function addRow(tag, values) {{
+    var row = table.insertRow(-1);
+    for (var index = 0; index < HEADINGS.length; index++) {{
+        var cell = document.createElement(tag);
+        cell.textContent = values ? values[index] : "";
+        row.appendChild(cell);
+    }}
+}}
+
+// position of the rows in view for the scroll position of the spacer
+function rowsTop() {{
+    var scrollRange = spacerHeight - viewport.clientHeight;
+    if (scrollRange <= 0) return 0;
+    return Math.round(viewport.scrollTop * (rowsHeight - viewport.clientHeight) / scrollRange);
+}}
+
+// only the rows in view are in the table
+function render() {{
+    var first = Math.min(Math.floor(rowsTop() / ROW_HEIGHT), TOTAL);
+    var last = Math.min(first + Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 1, TOTAL);
+    table.style.top = viewport.scrollTop + "px";
+    while (table.rows.length) table.deleteRow(0);
+    addRow("th", HEADINGS);
+    for (var row = first; row < last; row++) {{
+        var number = Math.floor(row / CHUNK_SIZE) + 1;
+        if (!chunks[number]) request(number);
+        addRow("td", chunks[number] ? chunks[number][row % CHUNK_SIZE] : null);
+    }}
+}}
+
+viewport.onscroll = render;
+window.onresize = render;
+render();
+</script>
+</body>
+</html>
+"""
+
+# Height in pixels of a row of the viewer, the rows in view are found from the scroll position
+VIEWER_ROW_HEIGHT = 24
+# Height in pixels of the scrolling area of the viewer. Browsers cap the height of an element (about 17.9 million
+# pixels in Firefox, 745000 rows), above it the scroll position is scaled to the rows
+VIEWER_MAX_HEIGHT = 8000000
+
+
+def get_pages_directory(filePath):
+    """
+    Directory of the pages of a paginated html file. "display_output.html" -> "display_output_pages"
+    """
+    return os.path.splitext(filePath)[0] + PAGES_SUFFIX
+
+
+def _navigation(index_name, page_number, has_next):
+    links = ['<a href="../%s">Index</a>' % index_name]
+    if page_number > 1:
+        links.insert(0, '<a href="%s">Previous</a>' % PAGE_NAME.format(page_number - 1))
+    if has_next:
+        links.append('<a href="%s">Next</a>' % PAGE_NAME.format(page_number + 1))
+    return " | ".join(links)
+
+
+def remove_unused_pages(directory, pages, viewer):
+    """
+    Remove the pages and chunks of an older export with more pages, and the viewer and its chunks of an older
+    export with the viewer
+    """
+    for name in os.listdir(directory):
+        if is_temp_path(name):
+            # being written by another export
+            continue
+        match = _numbered_file.match(name)
+        if match and (int(match.group(2)) > pages or (match.group(1) == "chunk" and not viewer)):
+            os.remove(os.path.join(directory, name))
+        elif name == VIEWER_NAME and not viewer:
+            os.remove(os.path.join(directory, name))
+
+
+class PageWriter(object):
+    """
+    Write the records of an HtmlExporter in pages of `page_size` rows, with the index page and the viewer
+
+    @:param `index_field`   `str`   : The index page lists the pages of every value of this field.
+                                      Default is config.HTML_INDEX_FIELD
+    """
+
+    def __init__(self, exporter, filePath, page_size, viewer=False, index_field=None):
+        super(PageWriter, self).__init__()
+        self.exporter = exporter
+        self.filePath = filePath
+        self.directory = get_pages_directory(filePath)
+        self.page_size = page_size
+        self.viewer = viewer
+        self.index_field = config.HTML_INDEX_FIELD if index_field is None else index_field
+        self.headings = list()
+        # value of the index field -> [number of rows, first page, last page]
+        self.groups = OrderedDict()
+        self.bytes_written = 0
+
+    def write(self, records):
+        """
+        Write all the pages, then the index page
+
+        :return  `tuple`   (number of rows, number of pages)
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        records = iter(records)
+        page = list(islice(records, self.page_size))
+        if page:
+            self.headings = list(page[0].keys())
+        total, page_number = 0, 0
+        while page:
+            # the next page is read first, to know If this page links to a next one
+            next_page = list(islice(records, self.page_size))
+            page_number += 1
+            self.write_page(page_number, page, total, has_next=bool(next_page))
+            total += len(page)
+            page = next_page
+
+        if self.viewer:
+            self.write_viewer(total)
+        remove_unused_pages(self.directory, page_number, self.viewer)
+        self.write_index(total, page_number)
+        return total, page_number
+
+    def _write_file(self, filePath, text):
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
+        with open_atomic(filePath, "w") as writeFile:
+            writeFile.write(text)
+        self.bytes_written += len(text)
+
+    def write_page(self, page_number, records, first_row, has_next):
+        exporter = self.exporter
+        navigation = _navigation(os.path.basename(self.filePath), page_number, has_next)
+        head = "".join("<th> %s </th>\n\t\t" % heading for heading in self.headings)
+        text = PAGE_HEADER.format(PAGE=page_number, NAVIGATION=navigation, HEAD=head, FIRST=first_row + 1,
+                                  LAST=first_row + len(records))
+        text += "".join(map(exporter.render_row, records))
+        text += PAGE_FOOTER.format(NAVIGATION=navigation)
+        self._write_file(os.path.join(self.directory, PAGE_NAME.format(page_number)), text)
+
+        if self.index_field in self.headings:
+            groups = self.groups
+            for each_record in records:
+                value = each_record[self.index_field]
+                group = groups.get(value)
+                if group is None:
+                    groups[value] = [1, page_number, page_number]
+                else:
+                    group[0] += 1
+                    group[2] = page_number
+
+        if self.viewer:
+            rows = json.dumps([each_record.values() for each_record in records], default=unicode)
+            self._write_file(os.path.join(self.directory, CHUNK_NAME.format(page_number)),
+                             "loadChunk(%s, %s);\n" % (page_number, rows))
+
+    def write_viewer(self, total):
+        self._write_file(os.path.join(self.directory, VIEWER_NAME), VIEWER_TEMPLATE.format(
+            INDEX=os.path.basename(self.filePath), NUM=total, CHUNK_SIZE=self.page_size,
+            ROW_HEIGHT=VIEWER_ROW_HEIGHT, MAX_HEIGHT=VIEWER_MAX_HEIGHT,
+            HEADINGS=json.dumps(self.headings, default=unicode)))
+
+    def write_index(self, total, pages):
+        directory_name = os.path.basename(self.directory)
+        page_links = " ".join('<a href="%s/%s">%s</a>' % (directory_name, PAGE_NAME.format(number), number)
+                              for number in xrange(1, pages + 1))
+        viewer = ""
+        if self.viewer:
+            viewer = '<a href="%s/%s">Open all the entries in the viewer</a>' % (directory_name, VIEWER_NAME)
+
+        groups = ""
+        if self.groups:
+            rows = list()
+            for value, (count, first_page, last_page) in self.groups.iteritems():
+                pages_text = '<a href="%s/%s">%s</a>' % (directory_name, PAGE_NAME.format(first_page), first_page)
+                if last_page != first_page:
+                    pages_text += " - %s" % last_page
+                rows.append("\t<tr>\n\t\t<td align='center'> %s </td>\n\t\t<td align='center'> %s </td>\n"
+                            "\t\t<td align='center'> %s </td>\n\t</tr>\n" % (cgi.escape(unicode(value)), count,
+                                                                            pages_text))
+            groups = GROUPS_TEMPLATE.format(FIELD=cgi.escape(self.index_field), ROWS="".join(rows))
+
+        text = INDEX_TEMPLATE.format(NUM=total, PAGES=pages, VIEWER=viewer, PAGE_LINKS=page_links, GROUPS=groups)
+        self._write_file(self.filePath, text)
+
+
+def export_pages(exporter, filePath, data=None):
+    """
+    Paginated export of an HtmlExporter, see PageWriter
+
+    :return  `str`   File path of the index page
+    """
+    writer = PageWriter(exporter, filePath, exporter.page_size, viewer=exporter.viewer)
+    with trace("export", format=exporter.__class__.__name__) as span:
+        span.rows, pages = writer.write(data or exporter.get_context())
+        span.bytes_written = writer.bytes_written
+
+    io.info("Display output has been created in %s Format, %s pages. Index page saved here :  %s " % (
+        exporter.EXPORT_TYPE, pages, filePath))
+    return filePath
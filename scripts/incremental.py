@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the incremental serialization of a CSV file which changes a little between two runs.
+
+The rows of the CSV file are split in content defined chunks. A chunk ends after a row whose crc32 matches
+CHUNK_MASK, so adding or removing rows only moves the boundaries around the change and all the other chunks
+keep the same content. Every chunk is identified by the md5 of its rows (and of the headers).
+
+    *   Every serializer writes one part file per chunk, named by the chunk hash, and a manifest of the parts.
+    *   Every exporter keeps the rendered rows of every chunk in a fragment file. The display output is put
+        together from the header, the fragments and the footer.
+    *   The chunk hashes of the last run are kept in a state file next to the outputs. On the next run only
+        the new chunks are serialized and rendered, the part and fragment files of the others are reused.
+
+    Example :
+        results = encode_incremental(filePath="shots.csv", jobs=4)
+        data = encoder.JsonSerializer.decode(filePath="output_files/serialized_data.json.manifest")
+
+When the CSV file has not been touched since the last run (same size and modification time) nothing is read.
+The CSV values should not contain line breaks.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import glob
+import json
+import time
+import zlib
+import hashlib
+import traceback
+import multiprocessing
+
+import config
+from scripts import encoder, display_output, metrics, parser, runner, schema
+from scripts.common import get_file_stamp, io, is_temp_path, open_atomic
+from scripts.compression import get_compressed_path
+from scripts.manifest import get_manifest_path, write_manifest
+from scripts.sharding import encode_shard, read_headers, run_tasks
+
+STATE_FILE_NAME = "incremental_state.json"
+STATE_VERSION = 1
+CHUNK_DIRECTORY = "chunks"
+
+# A chunk ends after a row whose crc32 has these bits at zero, so chunks have about 4096 rows on average
+CHUNK_MASK = 4096 - 1
+MIN_CHUNK_ROWS = 1024
+MAX_CHUNK_ROWS = 16384
+
+
+def find_chunks(filePath):
+    """
+    Split the rows of the CSV file in content defined chunks.
+
+    :return  `list`   dicts with the "start" and "end" byte offsets, "rows" and the "hash" of every chunk
+    """
+    chunks = list()
+    with open(filePath, "rb") as csv_read:
+        header_line = csv_read.readline()
+        header_hash = hashlib.md5(header_line)
+
+        start = offset = len(header_line)
+        rows = 0
+        chunk_hash = header_hash.copy()
+        for line in csv_read:
+            offset += len(line)
+            rows += 1
+            chunk_hash.update(line)
+            if rows >= MAX_CHUNK_ROWS or (rows >= MIN_CHUNK_ROWS and not zlib.crc32(line) & CHUNK_MASK):
+                chunks.append({"start": start, "end": offset, "rows": rows, "hash": chunk_hash.hexdigest()})
+                start, rows, chunk_hash = offset, 0, header_hash.copy()
+
+        if rows:
+            chunks.append({"start": start, "end": offset, "rows": rows, "hash": chunk_hash.hexdigest()})
+    return chunks
+
+
+def get_chunk_path(filePath, chunk_hash):
+    """
+    Path of the part or fragment file of one chunk.
+    "output_files/serialized_data.json" -> "output_files/chunks/serialized_data.chunk-<hash>.json"
+    """
+    root, extension = os.path.splitext(os.path.basename(filePath))
+    return os.path.join(os.path.dirname(filePath), CHUNK_DIRECTORY,
+                        "{0}.chunk-{1}{2}".format(root, chunk_hash, extension))
+
+
+def remove_unused_chunks(filePath, used_hashes):
+    """
+    Remove the chunk files of the output file, and their index files, which are not used anymore
+    """
+    root, extension = os.path.splitext(get_chunk_path(filePath, ""))
+    prefix = os.path.basename(root)
+    used_hashes = set(used_hashes)
+    for chunk_path in glob.glob(root + "*" + extension + "*"):
+        if is_temp_path(chunk_path):
+            # being written by another job
+            continue
+        chunk_hash = os.path.basename(chunk_path)[len(prefix):].split(".", 1)[0]
+        if chunk_hash not in used_hashes:
+            os.remove(chunk_path)
+
+
+def read_state(output_directory):
+    statePath = os.path.join(output_directory, STATE_FILE_NAME)
+    if not os.path.isfile(statePath):
+        return dict()
+    try:
+        with open(statePath, "r") as readFile:
+            state = json.load(readFile)
+    except ValueError:
+        io.warn("Ignoring broken incremental state %s" % statePath)
+        return dict()
+    return state if state.get("version") == STATE_VERSION else dict()
+
+
+def write_state(output_directory, state):
+    statePath = os.path.join(output_directory, STATE_FILE_NAME)
+    with open_atomic(statePath, "w") as writeFile:
+        json.dump(dict(state, version=STATE_VERSION), writeFile, indent=4, sort_keys=True)
+    return statePath
+
+
+def render_fragment(task):
+    """
+    Render the rows of one chunk in a fragment file. Used as pool task by encode_incremental()
+
+    :param  `task`   `tuple`   (exporter class name, chunk information, fragment file path)
+    """
+    name, information, fragment_path = task
+    result = {"name": name, "filePath": fragment_path, "rows": 0, "error": None}
+    start_time = time.time()
+    try:
+        exporter = display_output.output_registry[name](data=parser.DataContainer(information=information))
+        with open_atomic(fragment_path, "wb") as writeFile:
+            result["rows"] = exporter.write_fragment(writeFile)
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["duration"] = time.time() - start_time
+    # the metrics of a pool worker are sent back with the result, see runner.merge_worker_metrics()
+    result["metrics"] = metrics.default_metrics.dump(reset=True)
+    return result
+
+
+def _get_output_path(kind, name, output_directory):
+    if kind == runner.SERIALIZER:
+        return os.path.join(output_directory, encoder.registry[name].TEMP_FILE_NAME)
+    return os.path.join(output_directory, display_output.output_registry[name].EXPORT_FILE_NAME)
+
+
+def _get_chunk_path(kind, output_path, chunk_hash):
+    chunk_path = get_chunk_path(output_path, chunk_hash)
+    if kind == runner.SERIALIZER:
+        return get_compressed_path(chunk_path, config.COMPRESSION)
+    return chunk_path
+
+
+def _get_result_path(kind, output_path):
+    return get_manifest_path(output_path) if kind == runner.SERIALIZER else output_path
+
+
+def get_serializer_settings(data_schema=None):
+    """
+    Settings which change the serialized chunks. Chunks written with other settings can not be reused.
+
+    @:param `data_schema`   `Schema`   : Schema of the rows. The chunks are written again when it changes, even
+                                         when the schema file keeps the same name
+    """
+    return {"compression": config.COMPRESSION,
+            "pickle_protocol": encoder.PickleSerializer.resolve_protocol(),
+            "json_compact": config.JSON_COMPACT,
+            "columnar_dictionary_size": config.COLUMNAR_DICTIONARY_SIZE,
+            "schema_file": config.SCHEMA_FILE,
+            "schema_infer": config.SCHEMA_INFER,
+            "schema": data_schema.to_dict() if data_schema is not None else None}
+
+
+def encode_incremental(filePath, jobs=1, names=None, output_directory=None):
+    """
+    Serialize and export the CSV file with all the registered formats, re-writing only the chunks
+    which changed since the last run.
+
+    :param  `jobs`      `int`    Number of worker processes for the changed chunks. 0 is the number of cores
+    :param  `names`     `list`   Run only the formats with these class names. Default is all of them
+
+    :return  `list`   One result per format, same shape as runner.run_format(), with the number of
+                      "written" and "reused" chunks
+    """
+    output_directory = output_directory or config.OUTPUT_DIRECTORY
+    chunk_directory = os.path.join(output_directory, CHUNK_DIRECTORY)
+    if not os.path.isdir(chunk_directory):
+        os.makedirs(chunk_directory)
+
+    start_time = time.time()
+    status = os.stat(filePath)
+    source = {"path": os.path.abspath(filePath), "size": status.st_size, "mtime": status.st_mtime}
+    state = read_state(output_directory)
+    previous_formats = state.get("formats", dict())
+    data_schema = schema.get_data_schema({"filePath": filePath})
+    settings = get_serializer_settings(data_schema)
+    if state.get("settings") != settings:
+        # the serialized chunks of the last run have been written with another codec, encoding or schema
+        previous_formats = dict((name, hashes) for name, hashes in previous_formats.iteritems()
+                                if name not in encoder.registry)
+    tasks = runner.get_format_tasks(names=names)
+
+    if state.get("source") == source:
+        chunks = state["chunks"]
+    else:
+        chunks = find_chunks(filePath)
+        io.info("Found %s chunks in %s in %.3f sec" % (len(chunks), filePath, time.time() - start_time))
+    chunk_hashes = [chunk["hash"] for chunk in chunks]
+
+    headers, _ = read_headers(filePath)
+    chunk_tasks = list()
+    queued_paths = set()
+    for kind, name in tasks:
+        output_path = _get_output_path(kind, name, output_directory)
+        if (previous_formats.get(name) == chunk_hashes and
+                os.path.isfile(_get_result_path(kind, output_path))):
+            continue
+
+        # chunk files are trusted only If the last run finished writing them
+        known_hashes = set(previous_formats.get(name) or list())
+        for chunk in chunks:
+            chunk_path = _get_chunk_path(kind, output_path, chunk["hash"])
+            if chunk_path in queued_paths or (chunk["hash"] in known_hashes and os.path.isfile(chunk_path)):
+                continue
+            queued_paths.add(chunk_path)
+            information = {"filePath": filePath, "byteRange": (chunk["start"], chunk["end"]), "headers": headers}
+            task_function = encode_shard if kind == runner.SERIALIZER else render_fragment
+            chunk_tasks.append((task_function, (name, information, chunk_path)))
+
+    jobs = jobs or multiprocessing.cpu_count()
+    io.info("Re-writing %s chunks with %s worker processes" % (len(chunk_tasks), jobs))
+    chunk_results = runner.merge_worker_metrics(run_tasks(_run_chunk_task, chunk_tasks, jobs=jobs))
+
+    results = list()
+    formats = dict()
+    for kind, name in tasks:
+        output_path = _get_output_path(kind, name, output_directory)
+        written = [chunk for chunk in chunk_results if chunk["name"] == name]
+        result = {"kind": kind, "name": name, "filePath": _get_result_path(kind, output_path), "error": None,
+                  "duration": sum(chunk["duration"] for chunk in written),
+                  "written": len(written), "reused": len(chunks) - len(written)}
+        errors = [chunk["error"] for chunk in written if chunk["error"]]
+        if errors:
+            result.update(filePath=None, error="\n".join(errors))
+            results.append(result)
+            continue
+
+        if written or previous_formats.get(name) != chunk_hashes or not os.path.isfile(result["filePath"]):
+            chunk_paths = [_get_chunk_path(kind, output_path, chunk_hash) for chunk_hash in chunk_hashes]
+            if kind == runner.SERIALIZER:
+                write_manifest(result["filePath"], format_name=name,
+                               parts=[{"path": path, "rows": chunk["rows"]} for path, chunk in zip(chunk_paths,
+                                                                                                   chunks)],
+                               source=source["path"])
+                if data_schema is not None:
+                    schema.write_schema(result["filePath"], data_schema, *get_file_stamp(result["filePath"]))
+                else:
+                    schema.remove_schema(result["filePath"])
+            else:
+                exporter = display_output.output_registry[name](data=None)
+                with open_atomic(output_path, "w") as writeFile:
+                    exporter.write_fragments(writeFile, headings=headers if chunks else list(),
+                                             total=sum(chunk["rows"] for chunk in chunks), fragmentPaths=chunk_paths)
+            remove_unused_chunks(output_path, chunk_hashes)
+
+        formats[name] = chunk_hashes
+        results.append(result)
+
+    # formats which are not run this time keep their chunks of the last run
+    for name, hashes in previous_formats.iteritems():
+        formats.setdefault(name, hashes)
+    write_state(output_directory, {"source": source, "chunks": chunks, "formats": formats,
+                                   "settings": settings})
+    io.info("Incremental run of %s finished in %.3f sec, %s chunks re-written" % (
+        filePath, time.time() - start_time, len(chunk_tasks)))
+    return results
+
+
+def _run_chunk_task(task):
+    task_function, arguments = task
+    return task_function(arguments)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the manifest files of the outputs which are split in several part files.
+
+A manifest is a small JSON file written next to the part files. It keeps the name of the serializer
+class which wrote the parts and the list of the parts in order. Paths of the parts are relative to the
+manifest, so the output directory can be moved around.
+
+    {
+        "format": "JsonSerializer",
+        "rows": 1200,
+        "parts": [{"path": "serialized_data.part-00000.json", "rows": 600}, ...]
+    }
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import json
+
+from scripts.common import open_atomic
+
+MANIFEST_EXT = ".manifest"
+MANIFEST_VERSION = 1
+
+
+def is_manifest(filePath):
+    return bool(filePath) and str(filePath).endswith(MANIFEST_EXT)
+
+
+def get_manifest_path(filePath):
+    """
+    Manifest path of an output file path. "serialized_data.json" -> "serialized_data.json.manifest"
+    """
+    return filePath + MANIFEST_EXT
+
+
+def get_part_path(filePath, index):
+    """
+    Path of one part of an output file path. "serialized_data.json" -> "serialized_data.part-00003.json"
+    """
+    root, extension = os.path.splitext(filePath)
+    return "{0}.part-{1:05d}{2}".format(root, index, extension)
+
+
+def write_manifest(manifestPath, format_name, parts, **extra):
+    """
+    Write the manifest of the part files.
+
+    @:param `parts`   `list`   : dicts with "path" (absolute or relative to the manifest) and "rows" of every part
+    """
+    manifest_directory = os.path.dirname(os.path.abspath(manifestPath))
+    manifest = dict(extra)
+    manifest.update({
+        "version": MANIFEST_VERSION,
+        "format": format_name,
+        "rows": sum(part.get("rows") or 0 for part in parts),
+        "parts": [dict(part, path=os.path.relpath(os.path.abspath(part["path"]), manifest_directory))
+                  for part in parts],
+    })
+
+    with open_atomic(manifestPath, "w") as writeFile:
+        json.dump(manifest, writeFile, indent=4, sort_keys=True)
+    return manifestPath
+
+
+def read_manifest(manifestPath):
+    """
+    Read a manifest. Paths of the parts are returned as absolute paths.
+    """
+    with open(manifestPath, "r") as readFile:
+        manifest = json.load(readFile)
+
+    manifest_directory = os.path.dirname(os.path.abspath(manifestPath))
+    for part in manifest["parts"]:
+        part["path"] = os.path.join(manifest_directory, part["path"])
+    return manifest
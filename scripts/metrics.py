@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the metrics and the traces of the serializers, exporters and parser.
+
+Every encode(), decode(), export() and build_context() runs in a trace span, which records its duration,
+the number of rows and the bytes written or read :
+
+    *   serialization_operation_seconds     summary, by operation and format
+    *   serialization_operation_errors      counter, by operation and format
+    *   serialization_rows                  counter, by operation and format
+    *   serialization_bytes_written         counter, by operation and format
+    *   serialization_bytes_read            counter, by operation and format
+    *   serialization_cache_lookups         counter, by format and result (hit, disk_hit, miss)
+    *   serialization_parsed_rows           counter, rows read from the csv files
+
+The last config.METRICS_TRACE_SIZE spans are kept for get_spans(). The metrics can be saved as JSON or in the
+Prometheus text format.
+
+    Example :
+        with trace("encode", format="JsonSerializer") as span:
+            ...
+            span.rows = 1000
+        default_metrics.write("metrics.prom")
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import json
+import time
+import threading
+from collections import deque
+
+import config
+from scripts.common import io, open_atomic
+
+PREFIX = "serialization_"
+COUNTER = "counter"
+SUMMARY = "summary"
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.iteritems()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metrics(object):
+    """
+    Thread safe counters and summaries (count, sum, min, max) with labels
+    """
+
+    def __init__(self):
+        super(Metrics, self).__init__()
+        self._lock = threading.Lock()
+        self._values = dict()
+        self._types = dict()
+        self._spans = deque(maxlen=config.METRICS_TRACE_SIZE)
+
+    def increment(self, name, value=1, **labels):
+        """
+        Add the value to a counter
+        """
+        if not config.METRICS_ENABLED:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._types.setdefault(name, COUNTER)
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Add one observation to a summary
+        """
+        if not config.METRICS_ENABLED:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._types.setdefault(name, SUMMARY)
+            summary = self._values.get(key)
+            if summary is None:
+                self._values[key] = [1, value, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = min(summary[2], value)
+                summary[3] = max(summary[3], value)
+
+    def add_span(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def get_spans(self):
+        """
+        :return  `list`   The last config.METRICS_TRACE_SIZE spans as dictionaries, oldest first
+        """
+        with self._lock:
+            return [span.as_dict() for span in self._spans]
+
+    def get(self, name, **labels):
+        """
+        Value of a counter, or [count, sum, min, max] of a summary. None If nothing has been recorded
+        """
+        with self._lock:
+            value = self._values.get((name, _labels_key(labels)))
+            return list(value) if isinstance(value, list) else value
+
+    def dump(self, reset=False):
+        """
+        Picklable copy of the counters and summaries, for merge() in another process
+        """
+        with self._lock:
+            state = (dict((key, list(value) if isinstance(value, list) else value)
+                          for key, value in self._values.iteritems()), dict(self._types))
+            if reset:
+                self._values.clear()
+                self._types.clear()
+        return state
+
+    def merge(self, state):
+        """
+        Add the counters and summaries of dump() of another process, like a pool worker
+        """
+        values, types = state
+        with self._lock:
+            for key, value in values.iteritems():
+                self._types.setdefault(key[0], types[key[0]])
+                current = self._values.get(key)
+                if current is None:
+                    self._values[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(current, list):
+                    current[0] += value[0]
+                    current[1] += value[1]
+                    current[2] = min(current[2], value[2])
+                    current[3] = max(current[3], value[3])
+                else:
+                    self._values[key] = current + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._types.clear()
+            self._spans.clear()
+
+    def snapshot(self):
+        """
+        :return  `dict`   {name: {"type": counter or summary, "values": [{"labels": {...}, ...}]}}
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+            types = dict(self._types)
+
+        result = dict()
+        for (name, labels), value in items:
+            metric = result.setdefault(PREFIX + name, {"type": types[name], "values": list()})
+            entry = {"labels": dict(labels)}
+            if types[name] == SUMMARY:
+                entry.update(zip(["count", "sum", "min", "max"], value))
+            else:
+                entry["value"] = value
+            metric["values"].append(entry)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        lines = list()
+        for name, metric in sorted(self.snapshot().iteritems()):
+            lines.append("# TYPE %s %s" % (name, metric["type"]))
+            for entry in metric["values"]:
+                labels = ",".join('%s="%s"' % (key, _escape(value)) for key, value in sorted(entry["labels"].items()))
+                labels = "{%s}" % labels if labels else ""
+                if metric["type"] == SUMMARY:
+                    lines.append("%s_count%s %s" % (name, labels, entry["count"]))
+                    lines.append("%s_sum%s %r" % (name, labels, float(entry["sum"])))
+                else:
+                    lines.append("%s%s %s" % (name, labels, entry["value"]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, filePath):
+        """
+        Save the metrics in a file. ".prom" files are written in the Prometheus text format, others as JSON
+        """
+        text = self.to_prometheus() if filePath.endswith(".prom") else self.to_json()
+        with open_atomic(filePath, "w") as writeFile:
+            writeFile.write(text)
+        return filePath
+
+
+# Metrics of the whole process
+default_metrics = Metrics()
+
+
+class Span(object):
+    """
+    One traced operation. Set rows, bytes_written and bytes_read before the span ends.
+    """
+
+    def __init__(self, operation, labels, metrics):
+        super(Span, self).__init__()
+        self.operation = operation
+        self.labels = labels
+        self.rows = None
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.error = None
+        self.start = None
+        self.duration = None
+        self._metrics = metrics
+
+    def as_dict(self):
+        return {"operation": self.operation, "labels": dict(self.labels), "start": self.start,
+                "duration": self.duration, "rows": self.rows, "bytes_written": self.bytes_written,
+                "bytes_read": self.bytes_read, "error": self.error}
+
+    def count(self, records):
+        """
+        Yield the records and count them in the rows of the span
+        """
+        rows = 0
+        try:
+            for each_record in records:
+                rows += 1
+                yield each_record
+        finally:
+            self.rows = (self.rows or 0) + rows
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, error_type, error, tb):
+        self.duration = time.time() - self.start
+        if error_type is not None:
+            self.error = "%s: %s" % (error_type.__name__, error)
+
+        metrics = self._metrics
+        if config.METRICS_ENABLED:
+            labels = dict(self.labels, operation=self.operation)
+            metrics.observe("operation_seconds", self.duration, **labels)
+            if self.error:
+                metrics.increment("operation_errors", **labels)
+            if self.rows:
+                metrics.increment("rows", self.rows, **labels)
+            if self.bytes_written:
+                metrics.increment("bytes_written", self.bytes_written, **labels)
+            if self.bytes_read:
+                metrics.increment("bytes_read", self.bytes_read, **labels)
+            metrics.add_span(self)
+
+        if io.enabled(io.DEBUG):
+            io.debug("%s %s : %.3f sec, %s rows, %s bytes written, %s bytes read%s" % (
+                self.operation, " ".join("%s=%s" % item for item in sorted(self.labels.items())), self.duration,
+                self.rows, self.bytes_written, self.bytes_read, " (%s)" % self.error if self.error else ""))
+        # the log lines of an operation are printed when it ends, also in the pool workers
+        io.flush()
+        return False
+
+
+def trace(operation, metrics=None, **labels):
+    """
+    Context manager which records one operation in the metrics
+    """
+    return Span(operation, labels, metrics or default_metrics)
+
+
+def increment(name, value=1, **labels):
+    default_metrics.increment(name, value, **labels)
+
+
+def get_spans():
+    return default_metrics.get_spans()
+
+
+def write_metrics(filePath):
+    return default_metrics.write(filePath)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the offset index of the serialized files.
+
+An offset index is a small binary sidecar file ("serialized_data.json.idx") with the byte offset of every record
+in the serialized file. With the index, decode(filePath, records=...) seeks straight to the requested records and
+parses only them, instead of parsing the whole file.
+
+    Layout :
+        header      "SIDX", version, number of records, size and modification time of the serialized file
+        offsets     (records + 1) little-endian uint64, the start of every record and the end of the last one
+
+Offsets are positions in the uncompressed content, so the index works for compressed files as well
+(see scripts/compression.py).
+
+The size and the modification time of the serialized file are kept in the header, so an index left behind by an
+older file is not used. An index of an older version of the layout is out of date as well.
+
+    Example :
+        encoder.JsonSerializer(data=user_data).encode(filePath, index=True)
+        encoder.JsonSerializer.decode(filePath, records=[10, 5000])
+        encoder.PickleSerializer.decode(filePath, records=slice(100, 200))
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import struct
+
+from scripts.common import open_atomic, get_file_stamp
+
+INDEX_EXT = ".idx"
+MAGIC = "SIDX"
+VERSION = 2
+MAGIC_VERSION = struct.Struct("<4sH")
+HEADER = struct.Struct("<4sHxxQQq")
+OFFSET = struct.Struct("<Q")
+RANGE = struct.Struct("<2Q")
+
+
+def get_index_path(filePath):
+    """
+    Offset index path of a serialized file. "serialized_data.json" -> "serialized_data.json.idx"
+    """
+    return filePath + INDEX_EXT
+
+
+def remove_index(filePath):
+    """
+    Remove the offset index of a serialized file, If any
+    """
+    index_path = get_index_path(filePath)
+    if os.path.isfile(index_path):
+        os.remove(index_path)
+
+
+def resolve_record_ids(records, total):
+    """
+    List of record indexes from a slice or an iterable of indexes. Negative indexes count from the end.
+    """
+    if isinstance(records, slice):
+        return range(*records.indices(total))
+
+    record_ids = list()
+    for index in records:
+        index = int(index)
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("record index %s out of range, the file has %s records" % (index, total))
+        record_ids.append(index)
+    return record_ids
+
+
+class OffsetIndexWriter(object):
+    """
+    Write the offset index of a serialized file while the serializer writes the records.
+
+        with OffsetIndexWriter(indexPath) as index_writer:
+            with open(filePath, "w") as stream:
+                self.write(stream, index_writer.track(stream, records))
+                end_offset = stream.tell()
+            index_writer.finish(end_offset, *get_file_stamp(filePath))
+
+    The index is written in a temporary file and moved in place only when finish() has been called.
+    """
+
+    def __init__(self, indexPath):
+        super(OffsetIndexWriter, self).__init__()
+        self.indexPath = indexPath
+        self.records = 0
+        self._stream = open_atomic(indexPath, "wb")
+        self._stream.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self._finished = False
+
+    def track(self, stream, records):
+        """
+        Yield the records and keep the position of the stream when every record is requested.
+        The serializer should write every record before it requests the next one.
+        """
+        pack = OFFSET.pack
+        write = self._stream.write
+        for each_record in records:
+            write(pack(stream.tell()))
+            self.records += 1
+            yield each_record
+
+    def finish(self, end_offset, data_size, data_mtime):
+        """
+        Write the end offset of the last record and the header.
+
+        @:param `end_offset`   `int`   : Position of the stream after the last record
+        @:param `data_size`    `int`   : Size of the serialized file on disk. It can differ from the end offset
+                                         when the file is compressed
+        @:param `data_mtime`   `int`   : Modification time of the serialized file, see common.get_file_stamp()
+        """
+        self._stream.write(OFFSET.pack(end_offset))
+        self._stream.seek(0)
+        self._stream.write(HEADER.pack(MAGIC, VERSION, self.records, data_size, data_mtime))
+        self._finished = True
+
+    def close(self):
+        if self._finished:
+            self._stream.close()
+        else:
+            self._stream.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class OffsetIndex(object):
+    """
+    Read only view of an offset index. Every lookup reads 16 bytes of the index file.
+    """
+
+    def __init__(self, indexPath):
+        super(OffsetIndex, self).__init__()
+        self.indexPath = indexPath
+        self._stream = open(indexPath, "rb")
+        header = self._stream.read(HEADER.size)
+        magic, version = MAGIC_VERSION.unpack_from(header) if len(header) >= MAGIC_VERSION.size else (None, None)
+        if magic != MAGIC or version > VERSION:
+            self._stream.close()
+            raise ValueError("%s is not an offset index file" % indexPath)
+        if version < VERSION:
+            # older layout, the index is out of date
+            self.records, self.data_size, self.data_mtime = 0, None, None
+        else:
+            magic, version, self.records, self.data_size, self.data_mtime = HEADER.unpack(header)
+
+    def __len__(self):
+        return self.records
+
+    def is_current(self, filePath):
+        """
+        True If the index has been written for the current content of the serialized file
+        """
+        return (self.data_size, self.data_mtime) == get_file_stamp(filePath)
+
+    def get_range(self, index):
+        """
+        (start, end) byte offsets of one record in the serialized file
+        """
+        self._stream.seek(HEADER.size + OFFSET.size * index)
+        return RANGE.unpack(self._stream.read(RANGE.size))
+
+    def read_record_bytes(self, stream, index):
+        """
+        Raw bytes of one record, read from the open serialized file
+        """
+        start, end = self.get_range(index)
+        stream.seek(start)
+        return stream.read(end - start)
+
+    def close(self):
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -8,17 +8,23 @@ Module for parsing data from user
 
 __author__ = 'Arjun Prasad Namdeo'
 
-import argparse
+import os
 from collections import OrderedDict
 
 import config
-from scripts.common import io, readCsv, validate_file_path
+from scripts import metrics, schema
+from scripts.common import io, readCsv, readCsvLines, validate_file_path
+from scripts.compression import codecs
+from scripts.records import record_type, share_values, to_record
 
 
 def get_args():
     """
     this will parse the information from terminal and return a argparse.namespace object to the caller
     """
+    # argparse is slow to import, the library users of this module never parse the command line
+    import argparse
+
     # create argument parser
     parser = argparse.ArgumentParser(description='Retrieves user inputs for Shot definition')
 
@@ -35,6 +41,78 @@ def get_args():
     parser.add_argument('-frame', '--frames', type=int, help='Enter frame count', required=False, default=1)
     parser.add_argument('-artist', '--artist', type=str, help='Enter Artist Name', required=False, default="Unassigned")
 
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of workers for running all the output formats in parallel. Default is 1')
+    parser.add_argument('--executor', type=str, choices=['process', 'thread'], default='process',
+                        help='Run the parallel output formats in a pool of processes or threads')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Split the external CSV file in this many shards, parse and serialize them in '
+                             'parallel (see --jobs) and write per-shard files with a manifest.')
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        help='Re-write only the chunks of the outputs whose rows changed in the external CSV file '
+                             'since the last incremental run.')
+    parser.add_argument('--batch', type=str, nargs='+', metavar='PATH',
+                        help='Batch mode. Serialize and export every CSV file of these files, directories and glob '
+                             'patterns in one run, --jobs files at a time. Every file gets its own output directory.')
+    parser.add_argument('--batch_output', type=str, default=None,
+                        help='Output directory of the batch mode. Default is output_files/batch')
+    parser.add_argument('--transcode', type=str, default=None, metavar='PATH',
+                        help='Convert this serialized file (or manifest) into the format of --to, streaming the '
+                             'records. The output goes in --output_dir.')
+    parser.add_argument('--to', dest='to_format', type=str, default=None, metavar='FORMAT',
+                        help='Destination format of --transcode, a serializer or exporter like pickle, html or '
+                             'PickleSerializer')
+    parser.add_argument('--from', dest='from_format', type=str, default=None, metavar='FORMAT',
+                        help='Source format of --transcode. Default is found from the file extension')
+    parser.add_argument('--index', action='store_true', default=False,
+                        help='Write an offset index next to every serialized file, for decoding single records.')
+    parser.add_argument('--secondary_index', action='append', default=[], metavar='FIELD=KIND',
+                        help='Write a "hash" or "sorted" secondary index of a field next to every serialized file, '
+                             'for scripts/query.py. Like Assignee=hash or FrameNum=sorted. Can be repeated.')
+    parser.add_argument('--compression', type=str, default=None, choices=codecs.keys(),
+                        help='Compress the serialized files with this codec, in chunks which can still be '
+                             'read at random.')
+    parser.add_argument('--compact_json', action='store_true', default=False,
+                        help='Write the json file without indentation and spaces.')
+    parser.add_argument('--pickle_protocol', type=int, default=None,
+                        help='Pickle protocol of the pickle serializer. Default is the highest protocol, '
+                             '0 writes the old text format.')
+    parser.add_argument('--schema', type=str, default=None, metavar='PATH',
+                        help='Validate the rows of the external CSV file with this schema file and convert the '
+                             'values to their types. Invalid rows are reported and dropped, see scripts/schema.py')
+    parser.add_argument('--infer_schema', action='store_true', default=False,
+                        help='Infer the column types from the first rows of the external CSV file and convert the '
+                             'values, the schema is written next to the serialized files')
+    parser.add_argument('--html_pages', type=int, default=None, metavar='ROWS',
+                        help='Write the html display output in pages of this many rows, with an index page which '
+                             'links the pages of every Sequence.')
+    parser.add_argument('--html_viewer', action='store_true', default=False,
+                        help='With --html_pages, also write a viewer which scrolls through all the rows and loads '
+                             'only the pages in view.')
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='Directory of the output files. Default is %s' % config.OUTPUT_DIRECTORY)
+    parser.add_argument('--per_run', action='store_true', default=False,
+                        help='Write the outputs in a new directory <output_dir>/runs/<run id>, so parallel runs '
+                             'never share an output file.')
+    parser.add_argument('--buffer_size', type=int, default=None, metavar='BYTES',
+                        help='Buffer size for writing the output files. Default is %s' % config.WRITE_BUFFER_SIZE)
+    parser.add_argument('--fsync', type=str, default=None, choices=['file', 'full'],
+                        help='Flush every output file ("file"), and its directory ("full"), to the disk before '
+                             'the run is complete.')
+    parser.add_argument('--serve', action='store_true', default=False,
+                        help='Run the serialization server. It keeps all the formats loaded and serializes the '
+                             'records sent over localhost HTTP (see --port) or a Unix socket (see --socket).')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Port of the serialization server. Default is %s' % config.SERVER_PORT)
+    parser.add_argument('--socket', type=str, default=None, metavar='PATH',
+                        help='Listen on this Unix socket instead of a localhost port')
+    parser.add_argument('--log_level', type=str.upper, default=None, choices=sorted(io.LEVELS),
+                        help='Print only the messages of this level and above. DEBUG also prints the duration, '
+                             'rows and bytes of every encode, decode and export.')
+    parser.add_argument('--metrics_output', type=str, default=None, metavar='PATH',
+                        help='Save the metrics of the run in this file. Prometheus text format for a .prom '
+                             'file, JSON otherwise.')
+
     return parser.parse_args()
 
 
@@ -81,11 +159,11 @@ class UserInputs(object):
             information["artist"] = inputs.artist
 
         external_file = None
-        if inputs.useTemplateData:
-            external_file = config.TEMPLATE_DATABASE
+        if inputs.external_file:
+            external_file = inputs.external_file
 
-        elif inputs.external_file:
-            external_file = inputs.externalFilePath
+        elif inputs.useTemplateData:
+            external_file = config.TEMPLATE_DATABASE
 
         if external_file:
             if validate_file_path(file_path=external_file, file_extension=".csv",
@@ -99,11 +177,18 @@ class UserInputs(object):
     def build_context(self, information=None):
         """
         collect all the information from the user and external files and keep them in one place
+
+        The returned DataContainer is lazy, rows are read from the source only when a serializer
+        or exporter iterates over it. So memory usage does not grow with the size of the input file.
         """
-        information = information or self._information or self.validate()
-        if not information:
-            return None
-        build_data = self.build_data_container(data=information)
+        with metrics.trace("build_context") as span:
+            information = information or self._information or self.validate()
+            if not information:
+                span.error = "No input information"
+                return None
+            build_data = DataContainer(information=information)
+            if information.get("filePath"):
+                span.bytes_read = os.path.getsize(information["filePath"])
         return build_data
 
     def validate_int(self, value):
@@ -116,22 +201,96 @@ class UserInputs(object):
     def build_data_container(cls, data):
         """
         Generate a data structure context which can be read by any serializer class
+
+        All the records are kept in memory, the repeated values of the rows share the same string objects.
+        See records.share_values() and config.SHARED_VALUES_MAX
         """
-        data_container = list()
-        file_to_read = data.get('filePath', None)
+        records = cls.iter_data_container(data=data)
+        if config.SHARED_VALUES_MAX:
+            records = share_values(records, config.SHARED_VALUES_SAMPLE_ROWS, config.SHARED_VALUES_MAX)
+        return list(records)
 
-        if file_to_read:
-            # Using external file to fetch input
-            read_information = list(readCsv(filePath=file_to_read))
-            if not read_information:
-                return data_container
+    @classmethod
+    def build_csv_records(cls, text):
+        """
+        Records of a CSV text with the headers in the first line, like the body of a request to scripts/server.py
+        """
+        rows = readCsvLines(text.splitlines())
+        headers = next(rows, None)
+        if not headers:
+            return list()
+        shot_record = record_type(headers)
+        return [shot_record(row) for row in rows if row]
 
-            headers = read_information.pop(0)
-            for data in read_information:
-                local_dict = OrderedDict(zip(headers, data))
-                data_container.append(local_dict)
+    @classmethod
+    def iter_data_container(cls, data):
+        """
+        Generator version of build_data_container(). Yields one records.Record at a time so the
+        whole input file never has to be kept in memory.
+        """
+        file_to_read = data.get('filePath', None)
+        if not file_to_read:
+            yield to_record(data)
+            return
+
+        if data.get('byteRange'):
+            # Using one shard of an external file, the headers come from the first line of the file
+            read_information = readCsv(filePath=file_to_read, byteRange=data['byteRange'])
+            headers = data['headers']
+            # row numbers of a shard start at its byte range
+            source, first_row_number = "%s bytes %s-%s" % ((file_to_read,) + tuple(data['byteRange'])), 1
         else:
-            data_container.append(OrderedDict(data))
+            # Using external file to fetch input
+            read_information = readCsv(filePath=file_to_read)
+            headers = next(read_information, None)
+            if not headers:
+                return
+            source, first_row_number = file_to_read, 2
+
+        data_schema = schema.get_data_schema(data)
+        if data_schema is not None:
+            # rows are validated and converted to the types of the schema, in batches
+            for batch in schema.iter_validated(read_information, headers, data_schema,
+                                               first_row_number=first_row_number, source=source):
+                for each_record in batch:
+                    yield each_record
+            return
+
+        # all the rows share the same headers through one RecordType
+        shot_record = record_type(headers)
+        rows = 0
+        try:
+            for data in read_information:
+                rows += 1
+                yield shot_record(data)
+        finally:
+            metrics.increment("parsed_rows", rows)
+
+
+class DataContainer(object):
+    """
+    Lazy data context which can be read by any serializer/exporter class.
+
+    It does not hold any row in memory. Every iteration reads the rows again from the source,
+    so the same container can be handed over to several serializers one after another.
+
+        Example :
+            user_data = DataContainer(information={"filePath": config.TEMPLATE_DATABASE})
+            encoder.JsonSerializer(data=user_data).encode()
+            display_output.HtmlExporter(data=user_data).export()
+    """
+
+    def __init__(self, information):
+        super(DataContainer, self).__init__()
+        self.information = information
+
+    @property
+    def schema(self):
+        """
+        Schema of the rows, None If the values are read as text. The serializers write it next to their outputs.
+        """
+        return schema.get_data_schema(self.information)
 
-        return data_container
+    def __iter__(self):
+        return UserInputs.iter_data_container(data=self.information)
 
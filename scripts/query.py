@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for querying the serialized shot data with simple predicates.
+
+A query is a list of predicates which all have to match, like "all shots in sq010 assigned to Kathy with
+FrameNum > 80". Records are never all decoded in memory :
+
+    *   If the file has secondary indexes on the queried fields (see scripts/secondary_index.py), only the
+        record numbers found in the indexes are read, through the offset index.
+    *   Columnar files are filtered column by column and only the matching records are built.
+    *   Otherwise the records are streamed one at a time with iter_decode() and filtered on the way.
+
+    Example :
+        for each_record in query("output_files/serialized_data.json",
+                                 where=[("Sequence", "==", "sq010"), ("Assignee", "==", "Kathy"),
+                                        ("FrameNum", ">", 80)]):
+            print each_record
+
+Numbers in the predicates are compared as numbers, everything else is compared as text.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import operator
+from numbers import Number
+
+from scripts import encoder
+from scripts.common import io
+from scripts.manifest import is_manifest
+from scripts.secondary_index import HASH, SORTED, INT_KEYS, HashIndex, find_secondary_indexes, open_secondary_index
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": None,
+}
+
+RANGE_OPERATORS = ["<", "<=", ">", ">="]
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def _text(value):
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode("utf-8")
+    return unicode(value)
+
+
+class Predicate(object):
+    """
+    One condition on a field of the records.
+
+    @:param `field`      `str`   : Field name, like "FrameNum"
+    @:param `operator`   `str`   : One of "==", "!=", "<", "<=", ">", ">=" and "in"
+    @:param `value`              : Value to compare with. A list of values for "in"
+    """
+
+    def __init__(self, field, operator, value):
+        super(Predicate, self).__init__()
+        if operator not in OPERATORS:
+            raise ValueError("Unknown operator %r. Use one of %s" % (operator, sorted(OPERATORS)))
+        self.field = field
+        self.operator = operator
+        self.value = list(value) if operator == "in" else value
+
+    def __repr__(self):
+        return "Predicate(%r, %r, %r)" % (self.field, self.operator, self.value)
+
+    @property
+    def values(self):
+        return self.value if self.operator == "in" else [self.value]
+
+    @property
+    def is_numeric(self):
+        return all(_is_number(value) for value in self.values)
+
+    def match(self, record):
+        return self.match_value(record.get(self.field))
+
+    def match_value(self, value):
+        """
+        True If the value of the field matches this predicate
+        """
+        if value is None:
+            return False
+        if self.operator == "in":
+            return any(self._compare(operator.eq, value, item) for item in self.value)
+        return self._compare(OPERATORS[self.operator], value, self.value)
+
+    @staticmethod
+    def _compare(function, value, target):
+        if _is_number(target):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return function is operator.ne
+            return function(value, target)
+        return function(_text(value), _text(target))
+
+
+def build_predicates(where):
+    """
+    List of Predicates from Predicates, (field, operator, value) tuples or a {field: value} dict of equalities
+    """
+    if isinstance(where, dict):
+        return [Predicate(field, "==", value) for field, value in sorted(where.iteritems())]
+    return [each if isinstance(each, Predicate) else Predicate(*each) for each in where]
+
+
+def _index_rows(index, predicate):
+    """
+    Record numbers which may match the predicate, from one secondary index.
+    None If the index can not answer this predicate.
+    """
+    if isinstance(index, HashIndex):
+        # hash indexes are built on the text of the values, numbers can be written in several ways
+        if predicate.operator not in ("==", "in") or predicate.is_numeric:
+            return None
+        rows = set()
+        for value in predicate.values:
+            rows.update(index.lookup(value))
+        return rows
+
+    if predicate.operator == "!=":
+        return None
+    if predicate.is_numeric != (index.key_type == INT_KEYS):
+        # text keys are not sorted as numbers, numbers can not be looked up as text
+        if index.key_type != INT_KEYS or predicate.operator in RANGE_OPERATORS:
+            return None
+
+    if predicate.operator in ("==", "in"):
+        rows = set()
+        for value in predicate.values:
+            rows.update(index.lookup(value))
+        return rows
+
+    key = index.convert(predicate.value)
+    if predicate.operator in ("<", "<="):
+        return set(index.range(high=key, include_high=predicate.operator == "<="))
+    return set(index.range(low=key, include_low=predicate.operator == ">="))
+
+
+def plan_query(filePath, predicates):
+    """
+    Use the secondary indexes of the file to find the records which may match the predicates.
+
+    :return  `list`   Sorted record numbers to read, or None If no index can be used and all records
+                      have to be scanned
+    """
+    indexes = find_secondary_indexes(filePath)
+    candidates = None
+    for predicate in predicates:
+        for kind in [HASH, SORTED]:
+            index_path = indexes.get(predicate.field, dict()).get(kind)
+            if not index_path:
+                continue
+            with open_secondary_index(index_path) as index:
+                if not index.is_current(filePath):
+                    io.warn("Secondary index %s is out of date, it is not used." % index_path)
+                    continue
+                rows = _index_rows(index, predicate)
+            if rows is not None:
+                candidates = rows if candidates is None else candidates & rows
+                break
+
+        if candidates is not None and not candidates:
+            break
+    return None if candidates is None else sorted(candidates)
+
+
+def _scan_columns(dataset, predicates):
+    """
+    Record numbers which match all the predicates, looking only at the columns of the queried fields
+    """
+    rows = None
+    for predicate in predicates:
+        if predicate.field not in dataset.columns:
+            return list()
+        column = dataset.columns[predicate.field]
+        match = predicate.match_value
+        dictionary = getattr(column, "dictionary", None)
+        if dictionary is not None:
+            # dictionary encoded column : every distinct value is matched once, the rows by their codes
+            matched = frozenset(code for code, value in enumerate(dictionary) if match(value))
+            if rows is None:
+                rows = [row for row, code in enumerate(column.codes()) if code in matched]
+            else:
+                codes = column.codes()
+                rows = [row for row in rows if codes[row] in matched]
+        elif rows is None:
+            rows = [row for row, value in enumerate(column) if match(value)]
+        else:
+            rows = [row for row in rows if match(column[row])]
+        if not rows:
+            break
+    return range(len(dataset)) if rows is None else rows
+
+
+def query(filePath, where, serializer_class=None):
+    """
+    Generator of the records of the serialized file (or manifest) which match all the predicates.
+
+    @:param `where`   `list/dict`   : Predicates, (field, operator, value) tuples or a {field: value} dict
+    """
+    predicates = build_predicates(where)
+    serializer_class = serializer_class or encoder.find_serializer(filePath)
+
+    if is_manifest(filePath):
+        for part in serializer_class.read_manifest(filePath)["parts"]:
+            for each_record in query(part["path"], predicates, serializer_class=serializer_class):
+                yield each_record
+        return
+
+    if not os.path.isfile(filePath):
+        raise IOError("File %s does not exist" % filePath)
+
+    record_ids = plan_query(filePath, predicates)
+    if record_ids is not None:
+        records = serializer_class.decode(filePath, records=record_ids) if record_ids else list()
+    elif serializer_class.COLUMNAR:
+        with serializer_class.decode(filePath) as dataset:
+            records = [dataset[row] for row in _scan_columns(dataset, predicates)]
+    else:
+        records = serializer_class.iter_decode(filePath)
+
+    for each_record in records:
+        # the indexes return candidates, every record is checked against all the predicates
+        if all(predicate.match(each_record) for predicate in predicates):
+            yield each_record
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the compact record model used by the parser, serializers and exporters.
+
+Every CSV row used to be an OrderedDict, which stores its own copy of the header keys, a hash table
+and a linked list for every single row. A Record only keeps a tuple of values and a reference to a
+RecordType which is shared by all the rows with the same headers.
+
+    Example :
+        shot_type = record_type(["Sequence", "ShotName", "FrameNum", "Assignee"])
+        shot = shot_type(["sq010", "sh0100", "112", "Unassigned"])
+        shot["ShotName"]   # "sh0100"
+
+Records behave like a read-only ordered dictionary and compare equal to dictionaries with the same items.
+They are pickled as OrderedDict, the serializers turn the decoded mappings back into records.
+
+The CSV reader makes a new string for every value of every row. share_values() makes the rows share one string
+object for each value of the columns with few distinct values (Sequence, Assignee), for the records which are all
+kept in memory.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+from itertools import chain, islice
+from collections import Mapping, OrderedDict
+
+# Cache of the record types, so every row with the same headers shares the same RecordType object
+_record_types = dict()
+
+
+def record_type(fields):
+    """
+    Get the shared RecordType for the given headers
+
+    :return  `RecordType`   Same object for the same headers.
+    """
+    fields = tuple(fields)
+    try:
+        return _record_types[fields]
+    except KeyError:
+        return _record_types.setdefault(fields, RecordType(fields))
+
+
+def make_record(fields, values):
+    """
+    Build a Record from headers and values. This is also used for un-pickling the records.
+    """
+    return record_type(fields)(values)
+
+
+def pairs_to_record(pairs):
+    """
+    Build a Record from a list of (field, value) pairs, like the json objects decoded with object_pairs_hook
+    """
+    if not pairs:
+        return record_type(())(())
+    fields, values = zip(*pairs)
+    return Record(record_type(fields), values)
+
+
+def share_values(records, sample_size=1000, max_values=256):
+    """
+    Yield the records with their repeated text values replaced by one shared string object.
+
+    The columns with at most `max_values` distinct values in the first `sample_size` records are shared. The
+    values which are not in the sample (and the values of the other columns) are kept as they are.
+
+    @:param `records`   `iterable`   : Records of the parser
+    """
+    records = iter(records)
+    sample = list(islice(records, sample_size))
+    distinct = dict()
+    for each_record in sample:
+        for position, value in enumerate(each_record._values):
+            distinct.setdefault(position, set()).add(value)
+
+    # one memo for all the columns, only str values so an int 1 or a unicode value is never swapped for another
+    # value which compares equal
+    memo = dict()
+    for values in distinct.itervalues():
+        if len(values) <= max_values:
+            memo.update((value, value) for value in values if type(value) is str)
+
+    if not memo:
+        for each_record in chain(sample, records):
+            yield each_record
+        return
+
+    shared = memo.get
+    for each_record in chain(sample, records):
+        values = each_record._values
+        yield Record(each_record._type, tuple(map(shared, values, values)))
+
+
+def to_record(data):
+    """
+    Convert any mapping (dict, OrderedDict or Record) into a Record
+    """
+    if isinstance(data, Record):
+        return data
+    return make_record(data.keys(), data.values())
+
+
+class RecordType(object):
+    """
+    Shared description of the records with the same headers.
+    """
+
+    __slots__ = ("fields", "index")
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.index = dict((field, position) for position, field in enumerate(self.fields))
+
+    def __call__(self, values):
+        values = tuple(values)
+        if len(values) != len(self.fields):
+            # same as OrderedDict(zip(headers, values)), extra headers or values are dropped
+            size = min(len(values), len(self.fields))
+            return record_type(self.fields[:size])(values[:size])
+        return Record(self, values)
+
+    def __repr__(self):
+        return "RecordType({0!r})".format(self.fields)
+
+
+class Record(object):
+    """
+    Compact, read-only and ordered mapping of one row.
+    """
+
+    __slots__ = ("_type", "_values")
+
+    def __init__(self, recordType, values):
+        self._type = recordType
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._type.index[key]]
+
+    def get(self, key, default=None):
+        position = self._type.index.get(key)
+        if position is None:
+            return default
+        return self._values[position]
+
+    def __contains__(self, key):
+        return key in self._type.index
+
+    def __iter__(self):
+        return iter(self._type.fields)
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        return list(self._type.fields)
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return zip(self._type.fields, self._values)
+
+    def iterkeys(self):
+        return iter(self._type.fields)
+
+    def itervalues(self):
+        return iter(self._values)
+
+    def iteritems(self):
+        return iter(zip(self._type.fields, self._values))
+
+    @property
+    def fields(self):
+        return self._type.fields
+
+    def _asdict(self):
+        return OrderedDict(zip(self._type.fields, self._values))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._type.fields == other._type.fields and self._values == other._values
+        if isinstance(other, Mapping):
+            return len(self) == len(other) and dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # pickled as a plain OrderedDict, so the pickles can be loaded without this package
+        return OrderedDict, (zip(self._type.fields, self._values),)
+
+    def __repr__(self):
+        return "Record({0})".format(", ".join("{0}={1!r}".format(*item) for item in self.items()))
+
+
+Mapping.register(Record)
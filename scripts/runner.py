@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for running all the registered serializers and exporters over the same user data.
+
+The formats can run one after another, or all together in a pool of processes or threads.
+In the parallel mode the wall-clock time of a full run is close to the time of the slowest format
+instead of the sum of all of them.
+
+    Example :
+        results = run_all_formats(user_data, jobs=4, executor=PROCESS)
+        report_results(results)
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import time
+import traceback
+
+from scripts import encoder, display_output, metrics
+from scripts.common import io
+
+SERIALIZER = "serializer"
+EXPORTER = "exporter"
+
+PROCESS = "process"
+THREAD = "thread"
+EXECUTORS = [PROCESS, THREAD]
+
+# Data context of a pool worker process. The pool initializer sets it once per worker,
+# so the context is not pickled again for every task.
+_worker_context = dict()
+
+
+def get_format_tasks(names=None):
+    """
+    All the registered serializers and exporters as a list of (kind, name) tasks.
+
+    :param  `names`   `list`   Run only the formats with these class names. Default is all of them
+    """
+    tasks = [(SERIALIZER, name) for name in sorted(encoder.registry)]
+    tasks += [(EXPORTER, name) for name in sorted(display_output.output_registry)]
+    if names:
+        tasks = [task for task in tasks if task[1] in names]
+    return tasks
+
+
+def run_format(kind, name, user_data, output_directory=None):
+    """
+    Run one registered serializer or exporter over the user data. Errors are not raised, they are
+    returned in the result so one broken format does not stop the others.
+
+    :return  `dict`   kind, name, filePath, duration and error (traceback string or None)
+    """
+    result = {"kind": kind, "name": name, "filePath": None, "duration": 0.0, "error": None}
+    start_time = time.time()
+    try:
+        if kind == SERIALIZER:
+            serializer_class = encoder.registry[name]
+            filePath = None
+            if output_directory:
+                filePath = os.path.join(output_directory, serializer_class.TEMP_FILE_NAME)
+            result["filePath"] = serializer_class(data=user_data).encode(filePath=filePath)
+        else:
+            exporter_class = display_output.output_registry[name]
+            filePath = None
+            if output_directory:
+                filePath = os.path.join(output_directory, exporter_class.EXPORT_FILE_NAME)
+            result["filePath"] = exporter_class(data=user_data).export(filePath=filePath)
+
+        if not result["filePath"]:
+            result["error"] = "No output was written by %s" % name
+    except Exception:
+        result["error"] = traceback.format_exc()
+
+    result["duration"] = time.time() - start_time
+    return result
+
+
+def _init_worker(user_data, output_directory):
+    _worker_context["user_data"] = user_data
+    _worker_context["output_directory"] = output_directory
+
+
+def _run_worker_task(task):
+    kind, name = task
+    result = run_format(kind, name, _worker_context["user_data"], _worker_context["output_directory"])
+    # the metrics of the worker are sent back with the result, see merge_worker_metrics()
+    result["metrics"] = metrics.default_metrics.dump(reset=True)
+    return result
+
+
+def merge_worker_metrics(results):
+    """
+    Add the metrics of the pool workers, sent with the results, to the metrics of this process
+    """
+    for result in results:
+        state = result.pop("metrics", None)
+        if state:
+            metrics.default_metrics.merge(state)
+    return results
+
+
+def run_all_formats(user_data, jobs=1, executor=PROCESS, names=None, output_directory=None):
+    """
+    Run all the registered serializers and exporters over the user data.
+
+    :param  `jobs`      `int`   Number of workers. 1 runs the formats one after another
+    :param  `executor`  `str`   "process" or "thread" pool for the parallel mode
+
+    :return  `list`   Result of every format, in the same order as get_format_tasks()
+    """
+    tasks = get_format_tasks(names=names)
+    if jobs <= 1 or len(tasks) <= 1:
+        return [run_format(kind, name, user_data, output_directory) for kind, name in tasks]
+
+    if executor not in EXECUTORS:
+        raise ValueError("Unknown executor %r. Use one of %s" % (executor, EXECUTORS))
+
+    # multiprocessing is slow to import, the runs with one job do not need it
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+
+    workers = min(jobs, len(tasks))
+    io.info("Running %s formats with %s %s workers" % (len(tasks), workers, executor))
+    if executor == THREAD:
+        # threads share the memory, nothing has to be handed over
+        pool = ThreadPool(processes=workers)
+        mapper = lambda task: run_format(task[0], task[1], user_data, output_directory)
+    else:
+        pool = multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                    initargs=(user_data, output_directory))
+        mapper = _run_worker_task
+
+    try:
+        return merge_worker_metrics(pool.map(mapper, tasks))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def report_results(results):
+    """
+    Print the outcome of all the formats in terminal.
+
+    :return  `bool`   True If all the formats finished without error
+    """
+    for result in results:
+        if result["error"]:
+            io.error("{0} {1} failed after {2:.3f} sec :\n{3}".format(result["kind"], result["name"],
+                                                                      result["duration"], result["error"]))
+        else:
+            io.echo("{0:<10} {1:<20} {2:>8.3f} sec   {3}".format(result["kind"], result["name"],
+                                                                 result["duration"], result["filePath"]))
+    return not any(result["error"] for result in results)
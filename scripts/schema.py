@@ -0,0 +1,717 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the schema of the CSV rows. A schema gives the columns with their type, range and required flag,
+the rows are validated and converted to the types (FrameNum "112" -> 112) while they are parsed.
+
+The schema is compiled once per set of headers in python functions. A batch of rows is checked column by column,
+every distinct value of a column once, with the builtins (map, all, min) instead of a python loop, and the records
+are then built in one pass over the rows.
+A batch with an invalid row is checked row by row, and a row which does not pass goes through the slow path,
+which finds every error of the row.
+Invalid rows are reported by row number (the header is row 1), all of them, and dropped from the outputs.
+
+The cost of the validation is in the columns with a different value on every row, every value of a pattern or
+a conversion is then checked once per row. With database/shot_schema.json on the synthetic shots
+(`python benchmark.py --schema`), the ShotName pattern alone adds about 25% to the parse time, the rest of the
+schema costs nothing measurable. This is more than the small fraction aimed at, and accepted : a pattern on such
+a column needs one regular expression match per row. Leave the pattern out of these columns when the parse time
+matters.
+
+    Schema file (JSON) :
+        {
+            "strict": false,
+            "fields": [
+                {"name": "Sequence", "type": "str", "required": true, "pattern": "sq[0-9]+$"},
+                {"name": "FrameNum", "type": "int", "required": true, "min": 1, "max": 100000},
+                {"name": "Assignee", "type": "str", "default": "Unassigned"}
+            ]
+        }
+
+    *   `type`                  : "str", "int", "float" or "bool". Default is "str"
+    *   `required`              : Empty values are errors. Otherwise they are replaced by `default` (or None)
+    *   `min`, `max`            : Range of the converted value
+    *   `choices`, `pattern`    : Allowed values, regular expression which the text value has to match
+    *   `lenient`               : Values which can not be converted are kept as text instead of being errors
+    *   `strict`                : Columns which are not in the schema are errors
+
+Without a schema file, the schema can be inferred from the first config.SCHEMA_INFER_ROWS rows of the file
+(infer_file_schema). Every column gets the narrowest type which fits all the sampled values. A value after the
+sample which does not fit the inferred type is an error of the row, reported and handled like the errors of a
+schema file (config.SCHEMA_ERRORS), so every output holds the types of the schema. The serializers write the
+schema of their data in a sidecar file next to the output, "serialized_data.json" -> "serialized_data.json.schema",
+so the readers know the column types without looking at the values.
+
+    Example :
+        python serialization_app.py --external_file shots.csv --schema database/shot_schema.json
+
+        report = validate_file("shots.csv", load_schema("database/shot_schema.json"))
+        print report.format()
+
+        python serialization_app.py --external_file shots.csv --infer_schema
+        read_schema("output_files/serialized_data.json").to_dict()
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import re
+import json
+from itertools import islice, izip
+
+import config
+from scripts import metrics
+from scripts.common import io, readCsv, open_atomic, get_file_stamp
+from scripts.records import Record, record_type
+
+STRING = "str"
+INTEGER = "int"
+FLOAT = "float"
+BOOLEAN = "bool"
+
+# Converters of the text values for every type. None keeps the text
+BOOLEAN_VALUES = {"true": True, "yes": True, "y": True, "1": True,
+                  "false": False, "no": False, "n": False, "0": False}
+CONVERTERS = {STRING: None, INTEGER: int, FLOAT: float, BOOLEAN: lambda text: BOOLEAN_VALUES[text.strip().lower()]}
+
+# Text of the values which are inferred as int, float and bool. Other texts, like "0012" or " 12", stay text
+# so the inferred values are written back exactly as they were read
+INFERRED_PATTERNS = [(INTEGER, re.compile(r"-?(0|[1-9][0-9]*)$")),
+                     (FLOAT, re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?$")),
+                     (BOOLEAN, re.compile(r"(true|false|True|False|TRUE|FALSE)$"))]
+
+SCHEMA_EXT = ".schema"
+
+SKIP = "skip"
+FAIL = "fail"
+ERROR_POLICIES = [SKIP, FAIL]
+
+_schemas = dict()
+_reported = set()
+
+
+class SchemaError(ValueError):
+    """
+    Error of a schema, or of headers which can not match the schema
+    """
+
+
+class _InvalidRow(Exception):
+    pass
+
+
+class Field(object):
+    """
+    One column of a schema
+
+    @:param `type`       `str`     : "str", "int", "float" or "bool"
+    @:param `required`   `bool`    : An empty value is an error
+    @:param `default`              : Value of an empty optional field. Also used when the column is missing
+    @:param `minimum`, `maximum`   : Range of the converted value
+    @:param `choices`    `list`    : Allowed converted values
+    @:param `pattern`    `str`     : Regular expression which the text value has to match
+    @:param `lenient`    `bool`    : Values which can not be converted are kept as text. The column then mixes
+                                     typed and text values, the columnar format can not write it
+    """
+
+    def __init__(self, name, type=STRING, required=False, default=None, minimum=None, maximum=None,
+                 choices=None, pattern=None, lenient=False):
+        super(Field, self).__init__()
+        if type not in CONVERTERS:
+            raise SchemaError("Unknown type %r of field %s. Use one of %s" % (type, name, sorted(CONVERTERS)))
+        if lenient and (minimum is not None or maximum is not None or choices is not None):
+            raise SchemaError("Lenient field %s can not have a range or choices" % name)
+        self.name = name
+        self.type = type
+        self.required = required
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = frozenset(choices) if choices is not None else None
+        self.pattern = re.compile(pattern) if pattern else None
+        self.lenient = lenient
+        self.convert = CONVERTERS[type]
+
+    def to_dict(self):
+        data = {"name": self.name, "type": self.type}
+        for key, value in [("required", self.required), ("default", self.default), ("min", self.minimum),
+                           ("max", self.maximum), ("lenient", self.lenient)]:
+            if value is not None and value is not False:
+                data[key] = value
+        if self.choices is not None:
+            data["choices"] = sorted(self.choices)
+        if self.pattern is not None:
+            data["pattern"] = self.pattern.pattern
+        return data
+
+    def check(self, text):
+        """
+        Convert and check one text value. Slow path of the compiled validator.
+
+        :return  `tuple`   (value, error message or None)
+        """
+        if not text:
+            if self.required:
+                return None, "required value is missing"
+            return self.default, None
+
+        if self.pattern is not None and not self.pattern.match(text):
+            return None, "%r does not match %s" % (text, self.pattern.pattern)
+        try:
+            value = self.convert(text) if self.convert else text
+        except (ValueError, KeyError):
+            if self.lenient:
+                return text, None
+            return None, "%r is not of type %s" % (text, self.type)
+        if self.minimum is not None and value < self.minimum:
+            return None, "%r is less than %s" % (value, self.minimum)
+        if self.maximum is not None and value > self.maximum:
+            return None, "%r is more than %s" % (value, self.maximum)
+        if self.choices is not None and value not in self.choices:
+            return None, "%r is not one of %s" % (value, sorted(self.choices))
+        return value, None
+
+
+class Schema(object):
+    """
+    Columns of the CSV rows. compile() builds the validator for one set of headers.
+
+    @:param `strict`   `bool`   : Columns which are not in the schema are errors. Otherwise they are kept as text
+    """
+
+    def __init__(self, fields, strict=False):
+        super(Schema, self).__init__()
+        self.fields = list(fields)
+        self.strict = strict
+        self._validators = dict()
+
+    @classmethod
+    def from_dict(cls, data):
+        fields = list()
+        for field in data.get("fields", list()):
+            field = dict(field)
+            for key, name in [("min", "minimum"), ("max", "maximum")]:
+                if key in field:
+                    field[name] = field.pop(key)
+            try:
+                fields.append(Field(**field))
+            except TypeError as error:
+                raise SchemaError("Invalid field %s : %s" % (field.get("name"), error))
+        return cls(fields, strict=data.get("strict", False))
+
+    def to_dict(self):
+        """
+        Schema in the format of the schema files
+        """
+        return {"strict": self.strict, "fields": [field.to_dict() for field in self.fields]}
+
+    def compile(self, headers):
+        """
+        :return  `RowValidator`   Validator of the rows with these headers. It is compiled once per headers
+        """
+        headers = tuple(headers)
+        validator = self._validators.get(headers)
+        if validator is None:
+            validator = self._validators[headers] = RowValidator(self, headers)
+        return validator
+
+
+def load_schema(filePath):
+    """
+    Read a schema file. The schema (and its compiled validators) is reused until the file changes.
+    """
+    key = (os.path.abspath(filePath), os.path.getmtime(filePath))
+    if key not in _schemas:
+        with open(filePath) as readFile:
+            try:
+                data = json.load(readFile)
+            except ValueError as error:
+                raise SchemaError("Invalid schema file %s : %s" % (filePath, error))
+        _schemas[key] = Schema.from_dict(data)
+    return _schemas[key]
+
+
+def infer_type(texts):
+    """
+    Narrowest type which fits all the texts : "int", "float", "bool" or "str". Empty texts fit every type.
+    """
+    texts = set(text for text in texts if text)
+    if not texts:
+        return STRING
+    for type, pattern in INFERRED_PATTERNS:
+        match = pattern.match
+        if all(match(text) for text in texts):
+            return type
+    return STRING
+
+
+def infer_schema(headers, rows):
+    """
+    Schema of the columns, inferred from the values of the sampled rows. Every field is optional, a value after
+    the sample which does not fit the type is an error of its row.
+    """
+    rows = [row for row in rows if len(row) == len(headers)]
+    columns = zip(*rows) if rows else [()] * len(headers)
+    fields = list()
+    for header, texts in zip(headers, columns):
+        type = infer_type(texts)
+        # empty values of the typed columns are None, the text columns keep them as they are
+        fields.append(Field(header, type=type, default="" if type == STRING else None))
+    return Schema(fields)
+
+
+def infer_file_schema(filePath, sample_rows=None):
+    """
+    Schema inferred from the first rows of a CSV file. It is inferred again only when the file changes.
+
+    @:param `sample_rows`   `int`   : Number of sampled rows. Default is config.SCHEMA_INFER_ROWS
+    """
+    sample_rows = config.SCHEMA_INFER_ROWS if sample_rows is None else sample_rows
+    status = os.stat(filePath)
+    key = (os.path.abspath(filePath), status.st_mtime, status.st_size, sample_rows)
+    if key not in _schemas:
+        rows = readCsv(filePath=filePath)
+        headers = next(rows, None) or list()
+        _schemas[key] = infer_schema(headers, islice(rows, sample_rows))
+    return _schemas[key]
+
+
+def get_data_schema(information):
+    """
+    Schema of the rows of a parser.DataContainer : the "schema" of the information (a Schema or a schema file),
+    config.SCHEMA_FILE, or the schema inferred from the file with config.SCHEMA_INFER. None reads the values as text.
+    """
+    data_schema = information.get("schema") or config.SCHEMA_FILE
+    if isinstance(data_schema, Schema):
+        return data_schema
+    if data_schema:
+        return load_schema(data_schema)
+    if config.SCHEMA_INFER and information.get("filePath"):
+        return infer_file_schema(information["filePath"])
+    return None
+
+
+def get_schema_path(filePath):
+    """
+    Schema sidecar of a serialized file. "serialized_data.json" -> "serialized_data.json.schema"
+    """
+    return filePath + SCHEMA_EXT
+
+
+def write_schema(filePath, schema, data_size, data_mtime):
+    """
+    Write the schema of the data next to a serialized file. The sidecar keeps the size and the modification time
+    of the file, to find out when it is out of date.
+    """
+    data = dict(schema.to_dict(), data_size=data_size, data_mtime=data_mtime)
+    with open_atomic(get_schema_path(filePath), "w") as writeFile:
+        json.dump(data, writeFile, indent=4, sort_keys=True)
+    return get_schema_path(filePath)
+
+
+def read_schema(filePath):
+    """
+    Schema of the data of a serialized file
+
+    :return  `Schema`   None If the file has no schema sidecar, or an out of date one
+    """
+    schemaPath = get_schema_path(filePath)
+    try:
+        with open(schemaPath) as readFile:
+            data = json.load(readFile)
+    except IOError:
+        return None
+    if not os.path.isfile(filePath) or (data.get("data_size"), data.get("data_mtime")) != get_file_stamp(filePath):
+        io.warn("Schema %s is out of date." % schemaPath)
+        return None
+    return Schema.from_dict(data)
+
+
+def remove_schema(filePath):
+    """
+    Remove the schema sidecar of a serialized file, when the new data has no schema
+    """
+    schemaPath = get_schema_path(filePath)
+    if os.path.isfile(schemaPath):
+        os.remove(schemaPath)
+
+
+class RowValidator(object):
+    """
+    Validator and converter of the rows with one set of headers, compiled from a Schema.
+
+    The output records have the headers of the CSV file, plus the optional schema fields with a default
+    which are not in the file.
+    """
+
+    def __init__(self, schema, headers):
+        super(RowValidator, self).__init__()
+        self.headers = headers
+        fields = dict((field.name, field) for field in schema.fields)
+
+        missing = [field.name for field in schema.fields if field.required and field.name not in headers]
+        if missing:
+            raise SchemaError("Required columns %s are missing in the headers %s" % (missing, list(headers)))
+        unknown = [header for header in headers if header not in fields]
+        if schema.strict and unknown:
+            raise SchemaError("Columns %s are not in the schema" % unknown)
+
+        # (position in the row or None, field or None) of every output column
+        self.columns = [(position, fields.get(header)) for position, header in enumerate(headers)]
+        self.columns += [(None, field) for field in schema.fields
+                         if field.name not in headers and field.default is not None]
+        self.record_type = record_type(list(headers) +
+                                       [field.name for position, field in self.columns if position is None])
+        self._validate_rows = self._compile_rows()
+        # (column, position, field, check_values) of the columns which have something to check. The unknown
+        # columns, and the text fields without checks which keep their empty values, are copied as they are
+        self._checked_columns = list()
+        for column, (position, field) in enumerate(self.columns):
+            if position is None or field is None:
+                continue
+            if (field.convert is None and field.pattern is None and field.choices is None and
+                    field.minimum is None and field.maximum is None and not field.required and field.default == ""):
+                continue
+            self._checked_columns.append((column, position, field, self._compile_values(column, field)))
+        self._build_functions = dict()
+
+    @staticmethod
+    def _check_lines(field, column, name):
+        """
+        Lines of python code which check and convert the variable `name` for the field. The code raises
+        _InvalidRow for an invalid value. Constants of the code are named after the column.
+
+        :return  `tuple`   (lines, namespace of the constants)
+        """
+        namespace = {"default%d" % column: field.default}
+        checks = list()
+        if field.pattern is not None:
+            namespace["match%d" % column] = field.pattern.match
+            checks += ["if not match%d(%s):" % (column, name), "    raise _InvalidRow"]
+        if field.convert is not None:
+            namespace["convert%d" % column] = field.convert
+            if field.lenient:
+                checks += ["try:", "    %s = convert%d(%s)" % (name, column, name),
+                           "except (ValueError, KeyError):", "    pass"]
+            else:
+                checks.append("%s = convert%d(%s)" % (name, column, name))
+        for bound, operator in [("minimum", "<"), ("maximum", ">")]:
+            if getattr(field, bound) is not None:
+                namespace["%s%d" % (bound, column)] = getattr(field, bound)
+                checks += ["if %s %s %s%d:" % (name, operator, bound, column), "    raise _InvalidRow"]
+        if field.choices is not None:
+            namespace["choices%d" % column] = field.choices
+            checks += ["if %s not in choices%d:" % (name, column), "    raise _InvalidRow"]
+
+        # the checks run on the non-empty values, empty values are missing or take the default
+        empty = "raise _InvalidRow" if field.required else "%s = default%d" % (name, column)
+        if not checks:
+            return ["if not %s:" % name, "    " + empty], namespace
+        return ["if %s:" % name] + ["    " + check for check in checks] + ["else:", "    " + empty], namespace
+
+    @staticmethod
+    def _build(lines, namespace, name):
+        namespace["_InvalidRow"] = _InvalidRow
+        exec compile("\n".join(lines), "<schema validator>", "exec") in namespace
+        return namespace[name]
+
+    def _compile_values(self, column, field):
+        """
+        Build the function which checks the distinct values of one column of a batch. The values are checked and
+        converted with the builtins, a lenient field converts them one by one.
+
+        :return  `function`   check_values(texts) -> {text: value} of the texts which change, the converted values
+                              and the default of the empty text. None If a value is invalid
+        """
+        if field.lenient:
+            return self._compile_lenient_values(column, field)
+
+        match = field.pattern.match if field.pattern is not None else None
+        convert, minimum, maximum, choices = field.convert, field.minimum, field.maximum, field.choices
+        # an empty text keeps its value in a text field with an empty default
+        empty = {"": field.default} if convert is not None or field.default != "" else {}
+
+        def check_values(texts):
+            checked = dict()
+            if "" in texts:
+                if field.required:
+                    return None
+                checked.update(empty)
+                texts = texts.difference([""])
+            try:
+                if match is not None and not all(map(match, texts)):
+                    return None
+                values = map(convert, texts) if convert is not None else texts
+            except (ValueError, KeyError):
+                return None
+            if values:
+                if minimum is not None and min(values) < minimum:
+                    return None
+                if maximum is not None and max(values) > maximum:
+                    return None
+                if choices is not None and not choices.issuperset(values):
+                    return None
+            if convert is not None:
+                checked.update(izip(texts, values))
+            return checked
+        return check_values
+
+    def _compile_lenient_values(self, column, field):
+        """
+        Build the function which checks the distinct values of one column of a lenient field, one value at a time
+        so the values which can not be converted are kept as text.
+
+        :return  `function`   check_values(texts) -> {text: converted value}, or None If a value is invalid
+        """
+        check_lines, namespace = self._check_lines(field, column, "value")
+        lines = ["def check_values(texts):",
+                 "    checked = {}",
+                 "    try:",
+                 "        for text in texts:",
+                 "            value = text"]
+        lines += ["            " + line for line in check_lines]
+        lines += ["            checked[text] = value",
+                  "    except Exception:",
+                  "        return None",
+                  "    return checked"]
+        return self._build(lines, namespace, "check_values")
+
+    def _compile_rows(self):
+        """
+        Build the function which validates and converts a batch of rows, row by row. Every check of the schema
+        becomes a line of python code, so the checks run without any function call per field. Used for the
+        batches with invalid rows, which are sent to check_row() for the report.
+        """
+        namespace = {"Record": Record, "record_type": self.record_type}
+        names = ["value%d" % column for column in xrange(len(self.columns))]
+        lines = ["def validate(rows, row_number, check_row):",
+                 "    records = []",
+                 "    append = records.append",
+                 "    for row_number, row in enumerate(rows, row_number + 1):",
+                 "        try:",
+                 # unpacking also checks the number of values
+                 "            %s, = row" % ", ".join(names[:len(self.headers)])]
+        for column, (position, field) in enumerate(self.columns):
+            if field is None:
+                continue
+            if position is None:
+                namespace["default%d" % column] = field.default
+                lines.append("            %s = default%d" % (names[column], column))
+                continue
+            check_lines, constants = self._check_lines(field, column, names[column])
+            namespace.update(constants)
+            lines += ["            " + line for line in check_lines]
+
+        lines += ["            append(Record(record_type, (%s,)))" % ", ".join(names),
+                  "        except Exception:",
+                  "            each_record = check_row(row, row_number)",
+                  "            if each_record is not None:",
+                  "                append(each_record)",
+                  "    return records"]
+        return self._build(lines, namespace, "validate")
+
+    def _get_build_function(self, mapped_columns):
+        """
+        Build the function which makes the records of a batch in one pass over the rows. The values of the
+        mapped columns are looked up in their {text: value} mapping, the others are used as they are.
+
+        :return  `function`   build(rows, mappings) -> list of Records
+        """
+        build = self._build_functions.get(mapped_columns)
+        if build is not None:
+            return build
+
+        namespace = {"Record": Record, "record_type": self.record_type}
+        names = ["value%d" % column for column in xrange(len(self.columns))]
+        values = list()
+        for column, (position, field) in enumerate(self.columns):
+            if position is None:
+                namespace["default%d" % column] = field.default
+                values.append("default%d" % column)
+            elif column in mapped_columns:
+                values.append("mapping%d[%s]" % (column, names[column]))
+            else:
+                values.append(names[column])
+        lines = ["def build(rows, mappings):",
+                 "    %s, = mappings" % ", ".join(["mapping%d" % column for column in mapped_columns] + ["_"]),
+                 "    return [Record(record_type, (%s,)) for %s, in rows]" % (", ".join(values),
+                                                                          ", ".join(names[:len(self.headers)]))]
+        build = self._build_functions[mapped_columns] = self._build(lines, namespace, "build")
+        return build
+
+    def _validate_columns(self, rows):
+        """
+        Fast path for a batch of rows. Every distinct value of a checked column is checked once, most columns repeat
+        the same few values. The number of values of the rows is checked while the records are built, a shorter
+        or longer row fails the unpacking of its values.
+
+        :return  `list`   Records, or None If a value or a row of the batch is invalid
+        """
+        columns = zip(*rows)
+        mapped_columns = list()
+        mappings = list()
+        for column, position, field, check_values in self._checked_columns:
+            if position >= len(columns):
+                # a row of the batch is too short
+                return None
+            texts = set(columns[position])
+            checked = check_values(texts)
+            if checked is None:
+                return None
+            if not checked:
+                # every value is kept as it is
+                continue
+            if field.convert is None:
+                # only the empty text takes the default, the other texts are kept as they are
+                checked = dict(izip(texts, texts), **checked)
+            mapped_columns.append(column)
+            mappings.append(checked)
+
+        try:
+            return self._get_build_function(tuple(mapped_columns))(rows, mappings + [None])
+        except ValueError:
+            return None
+
+    def check_row(self, row, row_number, report):
+        """
+        Slow path for a row which did not pass the compiled checks. All the errors of the row are reported.
+
+        :return  `Record`   The converted record, or None If the row is invalid
+        """
+        if not row:
+            # blank line
+            return None
+        errors = list()
+        if len(row) != len(self.headers):
+            errors.append((None, "expected %s values, got %s" % (len(self.headers), len(row))))
+
+        values = list()
+        for position, field in self.columns:
+            if position is None:
+                values.append(field.default)
+                continue
+            text = row[position] if position < len(row) else ""
+            if field is None:
+                values.append(text)
+                continue
+            value, error = field.check(text)
+            if error:
+                errors.append((field.name, error))
+            values.append(value)
+
+        if errors:
+            report.add(row_number, errors)
+            return None
+        return self.record_type(values)
+
+    def validate(self, rows, row_number, report):
+        """
+        Validate and convert a batch of rows
+
+        @:param `row_number`   `int`   : Row number before the first row of the batch
+
+        :return  `list`   Records of the valid rows
+        """
+        report.rows += len(rows)
+        records = self._validate_columns(rows)
+        if records is not None:
+            return records
+        return self._validate_rows(rows, row_number, lambda row, number: self.check_row(row, number, report))
+
+
+class ValidationReport(object):
+    """
+    Errors of the validated rows. Every invalid row is counted, the first config.SCHEMA_MAX_ERRORS errors
+    are kept with their row number.
+    """
+
+    def __init__(self, source=None, max_errors=None):
+        super(ValidationReport, self).__init__()
+        self.source = source
+        self.max_errors = config.SCHEMA_MAX_ERRORS if max_errors is None else max_errors
+        self.rows = 0
+        self.invalid_rows = 0
+        self.errors = list()
+
+    @property
+    def ok(self):
+        return not self.invalid_rows
+
+    def add(self, row_number, errors):
+        self.invalid_rows += 1
+        for field, message in errors:
+            if len(self.errors) < self.max_errors:
+                self.errors.append((row_number, field, message))
+
+    def format(self):
+        """
+        Readable text of the report, one line per error
+        """
+        lines = ["%s invalid rows out of %s in %s" % (self.invalid_rows, self.rows, self.source)]
+        for row_number, field, message in self.errors:
+            lines.append("    row %s%s : %s" % (row_number, " %s" % field if field else "", message))
+        if self.invalid_rows and len(self.errors) >= self.max_errors:
+            lines.append("    ... only the first %s errors are shown" % self.max_errors)
+        return "\n".join(lines)
+
+
+def iter_validated(rows, headers, schema, first_row_number=2, source=None, report=None):
+    """
+    Validate and convert the CSV rows in batches of config.SCHEMA_BATCH_ROWS rows, while they are read.
+    Yields one list of records per batch.
+
+    The report is printed when all the rows have been read (once per source). With config.SCHEMA_ERRORS
+    "fail", invalid rows raise a SchemaError at the end, so the atomic outputs written from them are dropped.
+
+    @:param `rows`               `iterable`   : Rows of text values, without the headers
+    @:param `first_row_number`   `int`        : Row number of the first row. 2 for the row after the headers
+
+    :return  `generator`   Lists of the records of the valid rows
+    """
+    if config.SCHEMA_ERRORS not in ERROR_POLICIES:
+        raise SchemaError("Unknown schema error policy %r. Use one of %s" % (config.SCHEMA_ERRORS, ERROR_POLICIES))
+    validator = schema.compile(headers)
+    report = report or ValidationReport(source=source)
+    rows = iter(rows)
+    row_number = first_row_number - 1
+    while True:
+        batch = list(islice(rows, config.SCHEMA_BATCH_ROWS))
+        if not batch:
+            break
+        yield validator.validate(batch, row_number, report)
+        row_number += len(batch)
+
+    metrics.increment("validated_rows", report.rows)
+    if report.ok:
+        return
+    metrics.increment("invalid_rows", report.invalid_rows)
+    if config.SCHEMA_ERRORS == FAIL:
+        raise SchemaError(report.format())
+    key = (source, report.rows, report.invalid_rows)
+    if key not in _reported:
+        # every serializer and exporter reads the rows again, the report is printed once
+        _reported.add(key)
+        io.warn(report.format())
+
+
+def validate_file(filePath, schema, max_errors=None):
+    """
+    Validate all the rows of a CSV file without writing any output
+
+    :return  `ValidationReport`
+    """
+    report = ValidationReport(source=filePath, max_errors=max_errors)
+    rows = readCsv(filePath=filePath)
+    headers = next(rows, None)
+    if headers:
+        validator = schema.compile(headers)
+        row_number = 1
+        while True:
+            batch = list(islice(rows, config.SCHEMA_BATCH_ROWS))
+            if not batch:
+                break
+            validator.validate(batch, row_number, report)
+            row_number += len(batch)
+    return report
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the secondary indexes of the serialized files.
+
+A secondary index maps the values of one field to the record numbers which hold them, so scripts/query.py
+can read only the matching records (through the offset index, or the columns of a columnar file).
+Indexes are built while the serializer writes the records and saved next to the serialized file.
+
+    *   HASH index   ("serialized_data.json.Assignee.hidx")  : equality lookups. Values are hashed in buckets of
+                                                                (hash, record) entries.
+    *   SORTED index ("serialized_data.json.FrameNum.sidx")  : equality and range lookups. Values are sorted,
+                                                                integer values are kept as int64.
+
+Values are indexed by their text, so 80, "80" and u"80" are the same key. Like the offset index, the size and the
+modification time of the serialized file are kept in the header and an index of an older file is not used.
+
+    Example :
+        encoder.JsonSerializer(data=user_data).encode(filePath, secondary_indexes={"Assignee": HASH,
+                                                                                    "FrameNum": SORTED})
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import glob
+import mmap
+import struct
+import hashlib
+from bisect import bisect_left, bisect_right
+
+from scripts.common import open_atomic, get_file_stamp
+
+HASH = "hash"
+SORTED = "sorted"
+INDEX_KINDS = [HASH, SORTED]
+INDEX_EXTS = {HASH: ".hidx", SORTED: ".sidx"}
+
+VERSION = 2
+MAGIC_VERSION = struct.Struct("<4sH")
+HASH_HEADER = struct.Struct("<4sHxxQQQq")
+SORTED_HEADER = struct.Struct("<4sHBxQQq")
+HASH_MAGIC = "SHIX"
+SORTED_MAGIC = "SSIX"
+
+INT_KEYS = 0
+TEXT_KEYS = 1
+
+UINT64 = struct.Struct("<Q")
+HASH_ENTRY = struct.Struct("<QQ")
+
+
+def get_secondary_index_path(filePath, field, kind):
+    """
+    Path of the secondary index of one field. "serialized_data.json" -> "serialized_data.json.FrameNum.sidx"
+    """
+    return "{0}.{1}{2}".format(filePath, field, INDEX_EXTS[kind])
+
+
+def remove_secondary_indexes(filePath):
+    """
+    Remove all the secondary indexes of a serialized file
+    """
+    for extension in INDEX_EXTS.itervalues():
+        for index_path in glob.glob(filePath + ".*" + extension):
+            os.remove(index_path)
+
+
+def find_secondary_indexes(filePath):
+    """
+    :return  `dict`   {field: {kind: index path}} of the secondary indexes next to the serialized file
+    """
+    indexes = dict()
+    for kind, extension in INDEX_EXTS.iteritems():
+        prefix = filePath + "."
+        for index_path in glob.glob(filePath + ".*" + extension):
+            field = index_path[len(prefix):-len(extension)]
+            indexes.setdefault(field, dict())[kind] = index_path
+    return indexes
+
+
+def index_key(value):
+    """
+    Text of a value as utf-8 bytes. All the values are indexed by their text.
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+def hash_key(key):
+    return UINT64.unpack_from(hashlib.md5(key).digest())[0]
+
+
+def _as_int(key):
+    try:
+        return int(key)
+    except (TypeError, ValueError):
+        return None
+
+
+def _padding(size):
+    return -size % 8
+
+
+class SecondaryIndexBuilder(object):
+    """
+    Collect the values of the indexed fields while the serializer writes the records,
+    and write the indexes when the file is complete.
+
+    @:param `indexes`   `dict`   : {field: HASH or SORTED}
+    """
+
+    def __init__(self, indexes):
+        super(SecondaryIndexBuilder, self).__init__()
+        for field, kind in indexes.iteritems():
+            if kind not in INDEX_KINDS:
+                raise ValueError("Unknown index kind %r for %s. Use one of %s" % (kind, field, INDEX_KINDS))
+        self.indexes = dict(indexes)
+        self._keys = dict((field, list()) for field in indexes)
+
+    def track(self, records):
+        """
+        Yield the records and keep the values of the indexed fields
+        """
+        keys = self._keys.items()
+        for each_record in records:
+            for field, values in keys:
+                values.append(index_key(each_record.get(field)))
+            yield each_record
+
+    def write(self, filePath, data_size, data_mtime):
+        """
+        Write all the indexes next to the serialized file, with the size and modification time of the file
+        """
+        paths = list()
+        for field, kind in sorted(self.indexes.iteritems()):
+            index_path = get_secondary_index_path(filePath, field, kind)
+            writer = write_hash_index if kind == HASH else write_sorted_index
+            writer(index_path, self._keys[field], data_size, data_mtime)
+            paths.append(index_path)
+        return paths
+
+
+def write_hash_index(indexPath, keys, data_size, data_mtime):
+    """
+    Write a hash index of the keys. Every key is stored as its 64 bit hash, so a lookup
+    returns candidates which have to be checked against the records.
+    """
+    buckets = 1
+    while buckets < len(keys):
+        buckets *= 2
+
+    key_hashes = [hash_key(key) for key in keys]
+    entries = sorted((key_hash % buckets, key_hash, row) for row, key_hash in enumerate(key_hashes))
+    bucket_starts = [0] * (buckets + 1)
+    for bucket, _, _ in entries:
+        bucket_starts[bucket + 1] += 1
+    for bucket in xrange(buckets):
+        bucket_starts[bucket + 1] += bucket_starts[bucket]
+
+    with open_atomic(indexPath, "wb") as writeFile:
+        writeFile.write(HASH_HEADER.pack(HASH_MAGIC, VERSION, buckets, len(entries), data_size, data_mtime))
+        writeFile.write(struct.pack("<%dQ" % len(bucket_starts), *bucket_starts))
+        for _, key_hash, row in entries:
+            writeFile.write(HASH_ENTRY.pack(key_hash, row))
+    return indexPath
+
+
+def write_sorted_index(indexPath, keys, data_size, data_mtime):
+    """
+    Write a sorted index of the keys. If all the keys are integers they are sorted as int64,
+    otherwise they are sorted as text.
+    """
+    int_keys = [_as_int(key) for key in keys]
+    if all(key is not None for key in int_keys):
+        key_type = INT_KEYS
+        entries = sorted((key, row) for row, key in enumerate(int_keys))
+    else:
+        key_type = TEXT_KEYS
+        entries = sorted((key, row) for row, key in enumerate(keys))
+
+    with open_atomic(indexPath, "wb") as writeFile:
+        writeFile.write(SORTED_HEADER.pack(SORTED_MAGIC, VERSION, key_type, len(entries), data_size, data_mtime))
+        if key_type == INT_KEYS:
+            for key, _ in entries:
+                writeFile.write(struct.pack("<q", key))
+        else:
+            offset = 0
+            for key, _ in entries:
+                writeFile.write(UINT64.pack(offset))
+                offset += len(key)
+            writeFile.write(UINT64.pack(offset))
+            for key, _ in entries:
+                writeFile.write(key)
+            writeFile.write("\0" * _padding(offset))
+        for _, row in entries:
+            writeFile.write(UINT64.pack(row))
+    return indexPath
+
+
+class _MappedIndex(object):
+
+    MAGIC = None
+    HEADER = None
+
+    def __init__(self, indexPath):
+        super(_MappedIndex, self).__init__()
+        self.indexPath = indexPath
+        with open(indexPath, "rb") as readFile:
+            self._mapping = mmap.mmap(readFile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = MAGIC_VERSION.unpack_from(self._mapping)
+        if magic != self.MAGIC or version > VERSION:
+            self.close()
+            raise ValueError("%s is not a %s file" % (indexPath, self.__class__.__name__))
+        # an index of an older layout is out of date, its header is not read
+        self.data_size = self.data_mtime = None
+        self._header = self.HEADER.unpack_from(self._mapping) if version == VERSION else None
+
+    def is_current(self, filePath):
+        """
+        True If the index has been written for the current content of the serialized file
+        """
+        return (self.data_size, self.data_mtime) == get_file_stamp(filePath)
+
+    def close(self):
+        self._mapping.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HashIndex(_MappedIndex):
+    """
+    Memory mapped hash index. lookup() reads only the bucket of the key.
+    """
+
+    MAGIC = HASH_MAGIC
+    HEADER = HASH_HEADER
+
+    def __init__(self, indexPath):
+        super(HashIndex, self).__init__(indexPath)
+        if self._header is None:
+            return
+        magic, version, self.buckets, self.entries, self.data_size, self.data_mtime = self._header
+        self._entries_offset = HASH_HEADER.size + UINT64.size * (self.buckets + 1)
+
+    def lookup(self, value):
+        """
+        :return  `list`   Record numbers which may hold the value. Hash collisions are possible.
+        """
+        key_hash = hash_key(index_key(value))
+        bucket = key_hash % self.buckets
+        start, end = struct.unpack_from("<2Q", self._mapping, HASH_HEADER.size + UINT64.size * bucket)
+        rows = list()
+        for position in xrange(start, end):
+            entry_hash, row = HASH_ENTRY.unpack_from(self._mapping, self._entries_offset + HASH_ENTRY.size * position)
+            if entry_hash == key_hash:
+                rows.append(row)
+        return rows
+
+
+class _SortedKeys(object):
+    """
+    Sequence view of the keys of a sorted index, for the bisect module
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return self._index.entries
+
+    def __getitem__(self, position):
+        return self._index.get_key(position)
+
+
+class SortedIndex(_MappedIndex):
+    """
+    Memory mapped sorted index. lookup() and range() do a binary search, so they read O(log n) keys.
+    """
+
+    MAGIC = SORTED_MAGIC
+    HEADER = SORTED_HEADER
+
+    def __init__(self, indexPath):
+        super(SortedIndex, self).__init__(indexPath)
+        if self._header is None:
+            return
+        magic, version, self.key_type, self.entries, self.data_size, self.data_mtime = self._header
+
+        self._keys_offset = SORTED_HEADER.size
+        if self.key_type == INT_KEYS:
+            self._rows_offset = self._keys_offset + 8 * self.entries
+        else:
+            self._blob_offset = self._keys_offset + UINT64.size * (self.entries + 1)
+            blob_size = UINT64.unpack_from(self._mapping, self._blob_offset - UINT64.size)[0]
+            self._rows_offset = self._blob_offset + blob_size + _padding(blob_size)
+
+    def get_key(self, position):
+        if self.key_type == INT_KEYS:
+            return struct.unpack_from("<q", self._mapping, self._keys_offset + 8 * position)[0]
+        start, end = struct.unpack_from("<2Q", self._mapping, self._keys_offset + UINT64.size * position)
+        return self._mapping[self._blob_offset + start:self._blob_offset + end]
+
+    def convert(self, value):
+        """
+        Key of a value for this index. None If the value can not be compared with the keys
+        """
+        key = index_key(value)
+        if self.key_type == TEXT_KEYS:
+            return key
+        if isinstance(value, float):
+            return value
+        return _as_int(key)
+
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        """
+        :return  `list`   Record numbers of the keys between low and high. None is an open end.
+        """
+        keys = _SortedKeys(self)
+        start, end = 0, self.entries
+        if low is not None:
+            start = (bisect_left if include_low else bisect_right)(keys, low)
+        if high is not None:
+            end = (bisect_right if include_high else bisect_left)(keys, high)
+        if start >= end:
+            return list()
+        return list(struct.unpack_from("<%dQ" % (end - start), self._mapping, self._rows_offset + 8 * start))
+
+    def lookup(self, value):
+        key = self.convert(value)
+        if key is None:
+            return list()
+        return self.range(low=key, high=key)
+
+
+def open_secondary_index(indexPath):
+    """
+    Open a HashIndex or SortedIndex from its file extension
+    """
+    if indexPath.endswith(INDEX_EXTS[HASH]):
+        return HashIndex(indexPath)
+    return SortedIndex(indexPath)
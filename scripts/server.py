@@ -0,0 +1,531 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the serialization server. It is a long running process which keeps all the registered serializers and
+exporters loaded, and serializes the records sent over localhost HTTP or a Unix socket.
+
+Running `python serialization_app.py` for every small request pays the interpreter startup and the imports every
+time. The server pays them once. The requests are put in a queue, and one batch thread takes all the requests
+waiting in the queue (up to config.SERVER_MAX_BATCH) and runs them together, with one serializer or exporter per
+format. So concurrent small requests are coalesced in batches instead of fighting over the GIL in the handler
+threads.
+
+    Requests :
+        GET  /health                    "ok"
+        GET  /formats                   {"serializers": [...], "exporters": [...]}
+        GET  /metrics                   Metrics of the server in the Prometheus text format
+        POST /encode/<Serializer>       Body is a CSV text (Content-Type text/csv) with the headers in the first
+                                        line, or a JSON list of records (Content-Type application/json). Other
+                                        content types are refused with 415
+        POST /export/<Exporter>         Same body as /encode
+
+    The response is the serialized data or the rendered output. With ?output=PATH the file is written instead
+    and the response is {"filePath": PATH}. Relative paths are in config.OUTPUT_DIRECTORY, and paths which end up
+    outside of config.OUTPUT_DIRECTORY are refused with 403, so a request can not overwrite any other file.
+
+    Example :
+        python serialization_app.py --serve --port 8765
+        curl --data-binary @shots.csv -H "Content-Type: text/csv" http://127.0.0.1:8765/encode/JsonSerializer
+
+        python serialization_app.py --serve --socket /tmp/serialization.sock
+        client = ServerClient(socket_path="/tmp/serialization.sock")
+        data = client.encode("PickleSerializer", records)
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import json
+import Queue
+import socket
+import urllib
+import httplib
+import urlparse
+import mimetypes
+import threading
+import traceback
+import SocketServer
+import BaseHTTPServer
+from collections import OrderedDict
+
+import config
+from scripts import encoder, display_output, metrics
+from scripts.background import BackgroundTask, BackgroundError
+from scripts.common import io
+from scripts.parser import UserInputs
+
+ENCODE = "encode"
+EXPORT = "export"
+JSON_TYPE = "application/json"
+CSV_TYPE = "text/csv"
+TEXT_TYPE = "text/plain"
+
+
+class ServerError(Exception):
+    """
+    Error of a request. It is sent back to the client with the HTTP status.
+    """
+
+    def __init__(self, status, message):
+        super(ServerError, self).__init__(message)
+        self.status = status
+
+
+def warm_up():
+    """
+    Import the modules of all the declared formats, so the first request does not pay for the imports
+    """
+    encoder.registry.load()
+    display_output.output_registry.load()
+
+
+def get_registry(kind):
+    return encoder.registry if kind == ENCODE else display_output.output_registry
+
+
+def get_content_type(target_class):
+    """
+    Content type of the output of a serializer or exporter, from its file name
+    """
+    file_name = getattr(target_class, "TEMP_FILE_NAME", None) or getattr(target_class, "EXPORT_FILE_NAME", None)
+    return mimetypes.guess_type(file_name or "")[0] or "application/octet-stream"
+
+
+def resolve_output_path(filePath):
+    """
+    Absolute path of the output file of a request. Relative paths are in config.OUTPUT_DIRECTORY, paths outside
+    of config.OUTPUT_DIRECTORY (absolute, "..", or through a symbolic link) are refused.
+    """
+    output_directory = os.path.realpath(config.OUTPUT_DIRECTORY)
+    resolved = os.path.realpath(os.path.join(output_directory, filePath))
+    if not resolved.startswith(output_directory + os.sep):
+        raise ServerError(403, "Output %s is outside of the output directory %s" % (filePath, output_directory))
+    return resolved
+
+
+def parse_records(body, content_type=JSON_TYPE):
+    """
+    Records of the body of a request, a CSV text or a JSON list of records (a single record is allowed).
+    Bodies of other content types are refused, a web page can not send json to the server as text/plain.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == CSV_TYPE:
+        return UserInputs.build_csv_records(body)
+    if media_type != JSON_TYPE:
+        raise ServerError(415, "Unsupported Content-Type %r. Use %s or %s" % (content_type, JSON_TYPE, CSV_TYPE))
+
+    try:
+        records = json.loads(body, object_pairs_hook=OrderedDict)
+    except ValueError as error:
+        raise ServerError(400, "Invalid json body : %s" % error)
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list) or not all(isinstance(each_record, dict) for each_record in records):
+        raise ServerError(400, "The json body should be a list of records")
+    return records
+
+
+class Request(object):
+    """
+    One encode or export request waiting in the RequestBatcher
+    """
+
+    def __init__(self, kind, name, records, filePath=None):
+        super(Request, self).__init__()
+        self.kind = kind
+        self.name = name
+        self.records = records
+        self.filePath = filePath
+        self.task = BackgroundTask()
+
+    def run(self, target):
+        """
+        Serialize or export the records with the given serializer/exporter object.
+
+        :return  `str`   The file path with an output file, otherwise the serialized data or rendered output
+        """
+        if self.kind == ENCODE:
+            target.dataToWrite = self.records
+            return target.encode(filePath=self.filePath) if self.filePath else target.encode_string()
+
+        target.data = self.records
+        return target.export(filePath=self.filePath) if self.filePath else target.convert_data2string()
+
+
+class RequestBatcher(object):
+    """
+    Queue of the requests of the server, run in batches by one thread.
+
+    @:param `window`      `float`   : Seconds to wait for more requests after the first one of a batch.
+                                      Default is config.SERVER_BATCH_WINDOW. 0 takes only the requests which are
+                                      already waiting, so a lone request is never delayed
+    @:param `max_batch`   `int`     : Maximum number of requests in one batch. Default is config.SERVER_MAX_BATCH
+    """
+
+    def __init__(self, window=None, max_batch=None):
+        super(RequestBatcher, self).__init__()
+        self.window = config.SERVER_BATCH_WINDOW if window is None else window
+        self.max_batch = max_batch or config.SERVER_MAX_BATCH
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="RequestBatcher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, kind, name, records, filePath=None):
+        """
+        :return  `BackgroundTask`   task.get() returns the result of Request.run()
+        """
+        request = Request(kind, name, records, filePath=filePath)
+        self._queue.put(request)
+        return request.task
+
+    def close(self):
+        """
+        Run the requests already in the queue and stop the batch thread
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self):
+        request = self._queue.get()
+        if request is None:
+            return None
+
+        batch = [request]
+        while len(batch) < self.max_batch:
+            try:
+                request = self._queue.get(timeout=self.window) if self.window > 0 else self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            if request is None:
+                # stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            metrics.default_metrics.observe("server_batch_size", len(batch))
+            groups = OrderedDict()
+            for request in batch:
+                groups.setdefault((request.kind, request.name), list()).append(request)
+            for (kind, name), requests in groups.iteritems():
+                self.run_group(kind, name, requests)
+            io.flush()
+
+    @staticmethod
+    def run_group(kind, name, requests):
+        """
+        Run the requests of one format with the same serializer or exporter object. Errors are sent back
+        to every request, one broken request does not stop the others.
+        """
+        try:
+            target = get_registry(kind)[name](data=None)
+        except Exception:
+            error = traceback.format_exc()
+            for request in requests:
+                request.task._finish((False, error))
+            return
+
+        for request in requests:
+            try:
+                outcome = (True, request.run(target))
+            except Exception:
+                outcome = (False, traceback.format_exc())
+            request.task._finish(outcome)
+
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    HTTP handler of the server. The connections are kept alive, so a client can send many requests
+    without connecting again.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "SerializationServer/1.0"
+
+    # the response is buffered and sent in one write
+    wbufsize = -1
+
+    def do_GET(self):
+        path = urlparse.urlparse(self.path).path
+        serialization_server = self.server.serialization_server
+        if path == "/health":
+            self.respond(200, "ok\n", TEXT_TYPE)
+        elif path == "/formats":
+            self.respond(200, json.dumps(serialization_server.get_formats()), JSON_TYPE)
+        elif path == "/metrics":
+            self.respond(200, metrics.default_metrics.to_prometheus(), TEXT_TYPE + "; version=0.0.4")
+        else:
+            self.respond(404, json.dumps({"error": "Unknown path %s" % path}), JSON_TYPE)
+
+    def do_POST(self):
+        url = urlparse.urlparse(self.path)
+        body = self.rfile.read(int(self.headers.getheader("Content-Length") or 0))
+        try:
+            data, content_type = self.server.serialization_server.handle(
+                url.path, urlparse.parse_qs(url.query), body, self.headers.getheader("Content-Type"))
+        except ServerError as error:
+            self.respond(error.status, json.dumps({"error": str(error)}), JSON_TYPE)
+            return
+        self.respond(200, data, content_type)
+
+    def respond(self, status, data, content_type):
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # the client address of a Unix socket is empty, it is not logged
+        io.debug("server : " + format % args)
+
+
+class _TcpRequestHandler(RequestHandler):
+    # the small responses are sent at once, not held back by the Nagle algorithm
+    disable_nagle_algorithm = True
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ThreadingUnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class SerializationServer(object):
+    """
+    Serialization server over localhost HTTP, or over a Unix socket If socket_path is given.
+
+    @:param `host`          `str`   : Default is config.SERVER_HOST
+    @:param `port`          `int`   : Default is config.SERVER_PORT. 0 picks a free port
+    @:param `socket_path`   `str`   : Listen on this Unix socket instead of a TCP port
+    @:param `window`, `max_batch`   : See RequestBatcher
+    """
+
+    def __init__(self, host=None, port=None, socket_path=None, window=None, max_batch=None):
+        super(SerializationServer, self).__init__()
+        warm_up()
+        self.socket_path = socket_path
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self._server = _ThreadingUnixServer(socket_path, RequestHandler)
+        else:
+            address = (host or config.SERVER_HOST, config.SERVER_PORT if port is None else port)
+            self._server = _ThreadingHTTPServer(address, _TcpRequestHandler)
+        self._server.serialization_server = self
+        self.batcher = RequestBatcher(window=window, max_batch=max_batch)
+        self._serving = threading.Event()
+        self.closed = False
+
+    @property
+    def address(self):
+        """
+        (host, port) of the HTTP server, or the path of the Unix socket
+        """
+        return self._server.server_address
+
+    @property
+    def url(self):
+        if self.socket_path:
+            return "unix:%s" % self.socket_path
+        return "http://%s:%s" % self.address
+
+    def get_formats(self):
+        return {"serializers": sorted(encoder.registry), "exporters": sorted(display_output.output_registry)}
+
+    def handle(self, path, query, body, content_type=JSON_TYPE):
+        """
+        Run one encode or export request.
+
+        @:param `query`   `dict`   : Parsed query string. {"output": [PATH]} writes the output in a file of
+                                     config.OUTPUT_DIRECTORY
+
+        :return  `tuple`   (response body, content type)
+        """
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in (ENCODE, EXPORT):
+            raise ServerError(404, "Unknown path %s. Use /encode/<Serializer> or /export/<Exporter>" % path)
+        kind, name = parts
+        registry = get_registry(kind)
+        if name not in registry:
+            raise ServerError(404, "Unknown format %s. Available formats are %s" % (name, sorted(registry)))
+
+        filePath = query.get("output", [None])[0]
+        if filePath:
+            filePath = resolve_output_path(filePath)
+
+        with metrics.trace("request", kind=kind, format=name) as span:
+            records = parse_records(body, content_type)
+            span.rows = len(records)
+            span.bytes_read = len(body)
+            task = self.batcher.submit(kind, name, records, filePath=filePath)
+            try:
+                # every request is finished by the batch thread, also on errors. A wait with a timeout
+                # polls in python 2 and adds about a millisecond to every request
+                result = task.get()
+            except BackgroundError as error:
+                raise ServerError(500, str(error))
+
+        if filePath:
+            if not result:
+                raise ServerError(400, "No output was written in %s" % filePath)
+            return json.dumps({"filePath": result}), JSON_TYPE
+        return result, get_content_type(registry[name])
+
+    def start(self):
+        """
+        Serve the requests in a background thread and return at once
+
+        :return  `threading.Thread`
+        """
+        thread = threading.Thread(target=self.serve_forever, name="SerializationServer")
+        thread.daemon = True
+        thread.start()
+        self._serving.wait()
+        return thread
+
+    def serve_forever(self):
+        io.info("Serialization server is listening on %s" % self.url)
+        io.flush()
+        self._serving.set()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._serving.clear()
+
+    def close(self):
+        """
+        Stop serving, finish the queued requests and remove the Unix socket
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._serving.is_set():
+            self._server.shutdown()
+        self._server.server_close()
+        self.batcher.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def serve(host=None, port=None, socket_path=None):
+    """
+    Run the serialization server until it is interrupted (Ctrl+C)
+    """
+    server = SerializationServer(host=host, port=port, socket_path=socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        io.info("Stopping the serialization server")
+    finally:
+        server.close()
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+    """
+    HTTP connection over a Unix socket
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        httplib.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServerClient(object):
+    """
+    Client of a SerializationServer. The connection is kept alive between the requests.
+    Not thread safe, every thread should have its own client.
+
+        Example :
+            with ServerClient(port=8765) as client:
+                data = client.encode("JsonSerializer", records)
+                filePath = client.export("HtmlExporter", records, filePath="shots.html")
+    """
+
+    def __init__(self, host=None, port=None, socket_path=None, timeout=None):
+        super(ServerClient, self).__init__()
+        timeout = config.SERVER_REQUEST_TIMEOUT if timeout is None else timeout
+        if socket_path:
+            self._connection = UnixHTTPConnection(socket_path, timeout=timeout)
+        else:
+            self._connection = httplib.HTTPConnection(host or config.SERVER_HOST,
+                                                      config.SERVER_PORT if port is None else port, timeout=timeout)
+
+    def request(self, path, body=None, content_type=JSON_TYPE):
+        """
+        GET the path, or POST the body to it
+
+        :return  `str`   Body of the response
+        """
+        headers = {"Content-Type": content_type} if body is not None else dict()
+        self._connection.request("GET" if body is None else "POST", path, body, headers)
+        response = self._connection.getresponse()
+        data = response.read()
+        if response.status != 200:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError, TypeError):
+                message = data
+            raise ServerError(response.status, message)
+        return data
+
+    def _post(self, kind, name, records, filePath=None):
+        path = "/%s/%s" % (kind, name)
+        if filePath:
+            path += "?" + urllib.urlencode({"output": filePath})
+        if isinstance(records, basestring):
+            data = self.request(path, records, content_type=CSV_TYPE)
+        else:
+            data = self.request(path, json.dumps(list(records), default=lambda record: record._asdict()))
+        return json.loads(data)["filePath"] if filePath else data
+
+    def encode(self, name, records, filePath=None):
+        """
+        Serialize the records (or a CSV text) with a registered serializer.
+
+        :return  `str`   Serialized data, or the file path on the server If filePath is given
+        """
+        return self._post(ENCODE, name, records, filePath=filePath)
+
+    def export(self, name, records, filePath=None):
+        """
+        Render the records (or a CSV text) with a registered exporter.
+
+        :return  `str`   Rendered output, or the file path on the server If filePath is given
+        """
+        return self._post(EXPORT, name, records, filePath=filePath)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
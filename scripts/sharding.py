@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for the sharded parsing and serialization of big CSV files.
+
+The CSV file is split in line aligned byte ranges (shards). Every shard is parsed and serialized on its own in
+a pool of processes, so the throughput grows with the number of cores. Every serializer writes one part file per
+shard and a manifest which lists the parts in order.
+
+    Example :
+        results = encode_sharded(filePath="shots.csv", shards=8, jobs=8)
+        data = encoder.JsonSerializer.decode(filePath="output_files/serialized_data.json.manifest")
+
+The CSV values should not contain line breaks, a shard boundary is always placed at the start of a line.
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+import csv
+import time
+import traceback
+import multiprocessing
+
+import config
+from scripts import encoder, metrics, parser, runner, schema
+from scripts.common import io, get_file_stamp
+from scripts.manifest import get_manifest_path, get_part_path, write_manifest
+
+
+def read_headers(filePath):
+    """
+    Headers and the size in bytes of the first line of the CSV file
+    """
+    with open(filePath, "rb") as csv_read:
+        header_line = csv_read.readline()
+    headers = next(csv.reader([header_line], delimiter=',', quotechar='|'), [])
+    return headers, len(header_line)
+
+
+def find_shard_ranges(filePath, shards):
+    """
+    Split the rows of the CSV file in `shards` byte ranges of about the same size.
+
+    :return  `list`   (start, end) byte offsets. A row belongs to the range in which its line starts.
+    """
+    _, data_start = read_headers(filePath)
+    file_size = os.path.getsize(filePath)
+    shards = max(int(shards), 1)
+
+    step = max((file_size - data_start) // shards, 1)
+    ranges = list()
+    for index in xrange(shards):
+        start = data_start + index * step
+        if start >= file_size:
+            break
+        end = file_size if index == shards - 1 else min(start + step, file_size)
+        ranges.append((start, end))
+    return ranges
+
+
+def _counted(records, counter):
+    for each_record in records:
+        counter[0] += 1
+        yield each_record
+
+
+def encode_shard(task):
+    """
+    Parse one shard and serialize it in one part file. Used as pool task by encode_sharded()
+
+    :param  `task`   `tuple`   (serializer class name, shard information, part file path)
+    """
+    name, information, part_path = task
+    result = {"name": name, "filePath": part_path, "rows": 0, "error": None}
+    start_time = time.time()
+    try:
+        counter = [0]
+        user_data = _counted(parser.DataContainer(information=information), counter)
+        result["filePath"] = encoder.registry[name](data=user_data).encode(filePath=part_path)
+        if not result["filePath"]:
+            result["error"] = "No output was written for shard %s" % part_path
+        result["rows"] = counter[0]
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["duration"] = time.time() - start_time
+    # the metrics of a pool worker are sent back with the result, see runner.merge_worker_metrics()
+    result["metrics"] = metrics.default_metrics.dump(reset=True)
+    return result
+
+
+def run_tasks(function, tasks, jobs=1):
+    """
+    Map the function over the tasks, in a pool of `jobs` processes If jobs is more than 1
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return map(function, tasks)
+
+    pool = multiprocessing.Pool(processes=min(jobs, len(tasks)))
+    try:
+        return pool.map(function, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def encode_sharded(filePath, shards, jobs=None, names=None, output_directory=None):
+    """
+    Serialize a big CSV file with all the registered serializers, one part file per shard, in parallel.
+
+    :param  `shards`    `int`    Number of shards
+    :param  `jobs`      `int`    Number of worker processes. Default is the number of cores
+    :param  `names`     `list`   Run only the serializers with these class names. Default is all of them
+
+    :return  `list`   One result per serializer with the manifest path, same shape as runner.run_format()
+    """
+    headers, _ = read_headers(filePath)
+    ranges = find_shard_ranges(filePath, shards)
+    data_schema = schema.get_data_schema({"filePath": filePath})
+    output_directory = output_directory or config.OUTPUT_DIRECTORY
+    names = [name for kind, name in runner.get_format_tasks(names=names) if kind == runner.SERIALIZER]
+
+    tasks = list()
+    for name in names:
+        output_path = os.path.join(output_directory, encoder.registry[name].TEMP_FILE_NAME)
+        for index, byte_range in enumerate(ranges):
+            information = {"filePath": filePath, "byteRange": byte_range, "headers": headers}
+            tasks.append((name, information, get_part_path(output_path, index)))
+
+    jobs = jobs or multiprocessing.cpu_count()
+    io.info("Serializing %s shards of %s with %s worker processes" % (len(ranges), filePath, jobs))
+    shard_results = runner.merge_worker_metrics(run_tasks(encode_shard, tasks, jobs=jobs))
+
+    results = list()
+    for name in names:
+        parts = [shard for shard in shard_results if shard["name"] == name]
+        # duration is the total time spent on all the shards of this serializer
+        result = {"kind": runner.SERIALIZER, "name": name, "filePath": None,
+                  "duration": sum(shard["duration"] for shard in parts), "error": None}
+        errors = [shard["error"] for shard in parts if shard["error"]]
+        if errors:
+            result["error"] = "\n".join(errors)
+        else:
+            output_path = os.path.join(output_directory, encoder.registry[name].TEMP_FILE_NAME)
+            result["filePath"] = write_manifest(get_manifest_path(output_path), format_name=name,
+                                                parts=[{"path": shard["filePath"], "rows": shard["rows"]}
+                                                       for shard in parts],
+                                                source=os.path.abspath(filePath))
+            if data_schema is not None:
+                schema.write_schema(result["filePath"], data_schema, *get_file_stamp(result["filePath"]))
+            else:
+                schema.remove_schema(result["filePath"])
+            io.info("Manifest of %s shards saved here :  %s " % (len(parts), result["filePath"]))
+        results.append(result)
+    return results
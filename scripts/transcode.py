@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Module for converting serialized files from one registered format to another.
+
+Decoding a whole file and encoding it again keeps all the records in memory at once. transcode() streams the
+records from iter_decode() of the source serializer straight into encode() of a serializer, or export() of an
+exporter, so only one record (and one block of the source file) is held at a time. Multi-GB files are converted
+with bounded memory.
+
+    *   The formats are class names of encoder.registry and display_output.output_registry ("PickleSerializer",
+        "HtmlExporter"), or their format names ("pickle", "html").
+    *   The source format is found from the file extension (or the manifest) when it is not given.
+    *   The schema sidecar of the source is written next to the destination, see scripts/schema.py
+
+    Example :
+        transcode("output_files/serialized_data.json", dst_format="PickleSerializer")
+        python serialization_app.py --transcode output_files/serialized_data.json --to html
+"""
+
+__author__ = 'Arjun Prasad Namdeo'
+
+import os
+
+import config
+from scripts import encoder, display_output, runner
+from scripts.common import io
+from scripts.manifest import is_manifest, read_manifest
+from scripts.offset_index import OffsetIndex, get_index_path
+
+
+def get_format(name):
+    """
+    Registered serializer or exporter class of a format name
+
+    :return  `tuple`   (runner.SERIALIZER or runner.EXPORTER kind, class)
+    """
+    if name in encoder.registry:
+        return runner.SERIALIZER, encoder.registry[name]
+    if name in display_output.output_registry:
+        return runner.EXPORTER, display_output.output_registry[name]
+
+    for kind, registry, attribute in [(runner.SERIALIZER, encoder.registry, "FORMAT_NAME"),
+                                      (runner.EXPORTER, display_output.output_registry, "EXPORT_TYPE")]:
+        for class_name in sorted(registry):
+            if str(getattr(registry[class_name], attribute)).lower() == name.lower():
+                return kind, registry[class_name]
+    raise ValueError("Unknown format %r. Use one of %s" % (
+        name, sorted(encoder.registry.keys()) + sorted(display_output.output_registry.keys())))
+
+
+def count_records(serializer_class, filePath):
+    """
+    Number of records of a serialized file, If it is known without reading the records (manifest or offset index)
+
+    :return  `int`   None If the records have to be read for counting them
+    """
+    if is_manifest(filePath):
+        return read_manifest(filePath)["rows"]
+
+    index_path = get_index_path(filePath)
+    if serializer_class.INDEXABLE and os.path.isfile(index_path):
+        with OffsetIndex(index_path) as index:
+            if index.is_current(filePath):
+                return len(index)
+    return None
+
+
+class DecodedData(object):
+    """
+    Lazy records of a serialized file. Every iteration decodes the file again, one record at a time.
+    """
+
+    def __init__(self, serializer_class, filePath):
+        super(DecodedData, self).__init__()
+        self.serializer_class = serializer_class
+        self.filePath = filePath
+        self.schema = serializer_class.read_schema(filePath)
+
+    def __iter__(self):
+        return self.serializer_class.iter_decode(filePath=self.filePath, as_records=True)
+
+
+class SizedDecodedData(DecodedData):
+    """
+    DecodedData with a known number of records. The exporters write their header at once instead of
+    spooling the rows first.
+    """
+
+    def __init__(self, serializer_class, filePath, total):
+        super(SizedDecodedData, self).__init__(serializer_class, filePath)
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+
+def open_decoded(filePath, src_format=None):
+    """
+    Lazy records of a serialized file, see DecodedData
+    """
+    if src_format:
+        kind, serializer_class = get_format(src_format)
+        if kind != runner.SERIALIZER:
+            raise ValueError("%s can not be decoded, it is a display output format" % src_format)
+    else:
+        serializer_class = encoder.find_serializer(filePath)
+
+    total = count_records(serializer_class, filePath)
+    if total is None:
+        return DecodedData(serializer_class, filePath)
+    return SizedDecodedData(serializer_class, filePath, total)
+
+
+def transcode(src, src_format=None, dst_format=None, dstPath=None, compression=None):
+    """
+    Convert a serialized file into another format, streaming the records from the source into the destination.
+
+    @:param `src`           `str`   : Serialized file or manifest
+    @:param `src_format`    `str`   : Format of the source. Default is found from the file extension
+    @:param `dst_format`    `str`   : Serializer or exporter of the destination
+    @:param `dstPath`       `str`   : Output file path. Default is the file name of the format in
+                                      config.OUTPUT_DIRECTORY
+    @:param `compression`   `str`   : Compression codec of a serialized destination. Default is config.COMPRESSION
+
+    :return  `str`   File path of the destination file.
+    """
+    if not dst_format:
+        raise ValueError("The destination format of %s is missing" % src)
+    source = open_decoded(src, src_format=src_format)
+    kind, target_class = get_format(dst_format)
+    io.info("Transcoding %s from %s to %s" % (src, source.serializer_class.__name__, target_class.__name__))
+
+    if kind == runner.SERIALIZER:
+        dstPath = dstPath or os.path.join(config.OUTPUT_DIRECTORY, target_class.TEMP_FILE_NAME)
+        return target_class(data=source).encode(filePath=dstPath, compression=compression)
+    dstPath = dstPath or os.path.join(config.OUTPUT_DIRECTORY, target_class.EXPORT_FILE_NAME)
+    return target_class(data=source).export(filePath=dstPath)
@@ -28,6 +28,14 @@ Usage :
         python serialization_app.py    # This will use default_template_database and generate output
         or
         python serialization_app.py -seq 010 -shot 200 -frame 78   # This will use user input and show in browser
+        or
+        python serialization_app.py --external_file shots.csv --shards 8 --jobs 8   # Sharded parallel run
+        or
+        python serialization_app.py --external_file shots.csv --incremental   # Re-write only the changed rows
+        or
+        python serialization_app.py --batch nightly/ extra/*.csv --jobs 4   # Many CSV files in one run
+        or
+        python serialization_app.py --serve --port 8765   # Serialization server, see scripts/server.py
 
 #######################################################################################################################
 """
@@ -36,12 +44,12 @@ __author__ = 'Arjun Prasad Namdeo'
 
 
 import config
-from scripts import common, encoder, display_output, parser
-
-map(reload, [config, common, encoder, display_output, parser])
-
+from scripts import common, encoder, display_output, parser, runner
 from scripts.common import io
 
+# Nothing else is imported here. The formats of other modules are imported by the registries on first use
+# (see common.LazyRegistry), and the batch, sharded and incremental modes import their modules when they run.
+
 
 def get_supported_serializer_formats():
     """
@@ -85,53 +93,193 @@ class SerializerApp(object):
             *   It will generate user_data_context. user_data_context is basically a DataStructure which
                 can be read by different serializer classes.
 
-            *   It will serialize the user_data in JSON and PICKLE file format. Those files will get saved in the
-                user directory. It will also show the file path in terminal. You can find the path file from terminal.
+            *   It will serialize the user_data in all the registered formats (JSON, PICKLE, COLUMNAR). Those files
+                will get saved in the user directory. It will also show the file path in terminal.
+
+            *   It will generate display output in all the registered formats (HTML and TEXT).
+                File paths will be showed in terminal.
+
+            *   With --jobs N, all the serializers and exporters run in parallel in a pool of N workers.
+
+            *   With --shards N, an external CSV file is split in N shards which are parsed and serialized in
+                parallel. Serialized files are written per shard, with a manifest which can be decoded directly.
+
+            *   With --index, an offset index is written next to every serialized file. Single records can be
+                decoded with decode(filePath, records=[...]) without parsing the whole file.
+                With --secondary_index FIELD=hash|sorted, query.query() reads only the matching records.
+
+            *   With --compression CODEC, the serialized files are compressed in chunks (zlib, gzip, bz2, lzma).
+
+            *   With --schema PATH, the rows of the external CSV file are validated and converted to the types of
+                the schema. Invalid rows are reported by row number and left out of the outputs.
+                With --infer_schema, the types are inferred from the first rows of the file instead. The schema is
+                written next to the serialized files.
+
+            *   With --html_pages ROWS, the html display output is written in pages with an index page, so big
+                outputs open at once in the browser. --html_viewer adds a viewer which scrolls through all the rows.
+
+            *   With --compact_json, the json file is written without indentation and spaces.
+
+            *   With --pickle_protocol N, the pickle file is written with protocol N instead of the highest one.
+
+            *   With --batch PATH [PATH ...], every CSV file of the given files, directories and glob patterns
+                is processed in one run, --jobs files at a time, with one output directory per file.
 
-            *   It will generate display output in HTML and TEXT File format. File paths will be showed in terminal.
+            *   With --transcode PATH --to FORMAT, a serialized file is converted into another serializer or
+                display output format. The records are streamed from the file, see scripts/transcode.py.
+
+            *   With --incremental, only the chunks of the external CSV file which changed since the last
+                incremental run are serialized and rendered again.
+
+            *   Every output file is written in a temporary file and renamed in place when complete, so readers
+                never see a half-written file. With --per_run, the outputs go in a new directory per run.
+                With --buffer_size and --fsync, the write buffer and the flush policy of the outputs are set.
+
+            *   With --serve, the application runs as a server which keeps all the formats loaded and serializes
+                the records sent over localhost HTTP (--port) or a Unix socket (--socket), see scripts/server.py.
+
+            *   With --log_level DEBUG, the duration, rows and bytes of every operation are printed.
+                With --metrics_output PATH, the metrics of the run are saved (JSON, or Prometheus for .prom).
 
         """
         # parse user inputs and validate them
         user_inputs = parser.UserInputs()
-
+        user_args = user_inputs.getInput()
+        if getattr(user_args, "log_level", None):
+            io.set_level(user_args.log_level)
+        self.configure_outputs(user_args)
+
+        if getattr(user_args, "serve", False):
+            from scripts import server
+            # Long running server, the formats stay loaded between the requests
+            server.serve(port=user_args.port, socket_path=user_args.socket)
+            success = True
+        else:
+            success = self.process(user_inputs, user_args)
+
+        metrics_output = getattr(user_args, "metrics_output", None)
+        if metrics_output:
+            from scripts import metrics
+            io.info("Metrics saved in %s" % metrics.write_metrics(metrics_output))
+        io.flush()
+        return success
+
+    @staticmethod
+    def configure_outputs(user_args):
+        """
+        Set the output directory, buffer size and fsync policy of the output files from the user inputs
+        """
+        if getattr(user_args, "output_dir", None):
+            config.OUTPUT_DIRECTORY = user_args.output_dir
+        if getattr(user_args, "per_run", False) or config.OUTPUT_PER_RUN:
+            # every run gets its own directory, parallel runs never write the same file
+            config.OUTPUT_DIRECTORY = common.get_run_directory()
+            io.info("Output files of this run are saved in %s" % config.OUTPUT_DIRECTORY)
+        if getattr(user_args, "buffer_size", None):
+            config.WRITE_BUFFER_SIZE = user_args.buffer_size
+        if getattr(user_args, "fsync", None):
+            config.OUTPUT_FSYNC = user_args.fsync
+
+    def process(self, user_inputs, user_args):
+        """
+        Serialize and export the validated user inputs, see run()
+        """
         # validate the user input
-        if not user_inputs.validate():
+        if not user_inputs.validate(inputs=user_args):
             io.error("Validation Failed. Please check your inputs.!")
             return False
         io.info("Validation Done. All okay. Proceeding ahead. ")
 
         # Build the data_context as per user input. This data can be read by different serializer classes.
-        # You can pass this data_context to any serializer class.
+        # You can pass this data_context to any serializer class. It is lazy, every serializer/exporter
+        # streams the rows from the source while writing, so nothing is held in memory.
         user_data = user_inputs.build_context()
 
-        # Do the JSON serializations with user data context
-        json_serializer = encoder.JsonSerializer(data=user_data)
-        json_serialized_file = json_serializer.encode()
-
-        ''' Un-comment below line, If you want to decode the serialized json file. '''
-        # json_serializer.decode(filePath=json_serialized_file)
-
-        # Do the PICKLE serializations with user data context
-        pickle_serializer = encoder.PickleSerializer(data=user_data)
-        pickle_serialized_file = pickle_serializer.encode()
-
-        ''' Un-comment below line, If you want to decode the serialized pickle file. '''
-        # pickle_serializer.decode(filePath=pickle_serialized_file)
-
-        ''' Generate Display Output for user '''
-        # generate the HTML Display output for user with current context data
-        html_exporter = display_output.HtmlExporter(data=user_data)
-        html_file = html_exporter.export()
-
-        # open the html file in default browser
-        #common.view_file(file_path=html_file)
-
-        # generate the TEXT Display output for user with current context data
-        text_exporter = display_output.TextExporter(data=user_data)
-        text_file = text_exporter.export()
-
-        # open the text file in default browser
-        #common.view_file(file_path=text_file)
+        # Serialize and export the user data context in all the registered formats. With --jobs more than 1,
+        # all of them run together in a pool of processes (or threads with --executor thread).
+        jobs = getattr(user_args, "jobs", 1)
+        executor = getattr(user_args, "executor", runner.PROCESS)
+        shards = getattr(user_args, "shards", 0)
+        source_file = user_data.information.get("filePath")
+
+        if getattr(user_args, "index", False):
+            # every serializer writes an offset index next to its file, see scripts/offset_index.py
+            config.WRITE_OFFSET_INDEX = True
+
+        secondary_indexes = getattr(user_args, "secondary_index", None)
+        if secondary_indexes:
+            # {field: kind} secondary indexes for the queries, see scripts/query.py
+            config.SECONDARY_INDEXES = dict(each.split("=", 1) for each in secondary_indexes)
+
+        if getattr(user_args, "compression", None):
+            # serialized files are written through the codec, see scripts/compression.py
+            config.COMPRESSION = user_args.compression
+
+        if getattr(user_args, "schema", None):
+            # rows of the external file are validated and typed, see scripts/schema.py
+            config.SCHEMA_FILE = user_args.schema
+        if getattr(user_args, "infer_schema", False):
+            config.SCHEMA_INFER = True
+
+        if getattr(user_args, "html_pages", None):
+            # big html outputs are split in pages with an index page, see scripts/html_pages.py
+            config.HTML_PAGE_SIZE = user_args.html_pages
+            config.HTML_VIEWER = getattr(user_args, "html_viewer", False)
+
+        if getattr(user_args, "compact_json", False):
+            config.JSON_COMPACT = True
+
+        if getattr(user_args, "pickle_protocol", None) is not None:
+            config.PICKLE_PROTOCOL = user_args.pickle_protocol
+
+        transcode_source = getattr(user_args, "transcode", None)
+        if transcode_source:
+            from scripts import transcode
+            # Convert a serialized file, the records go from the decoder to the new format one at a time
+            if not transcode.transcode(transcode_source, src_format=user_args.from_format,
+                                       dst_format=user_args.to_format):
+                io.error("Transcoding of %s failed. Please check the messages above.!" % transcode_source)
+                return False
+            io.info("Transcoding complete...!!!")
+            return True
+
+        batch_inputs = getattr(user_args, "batch", None)
+        if batch_inputs:
+            from scripts import batch
+            # Many CSV files in one run, every file gets its own output directory
+            summaries = batch.run_batch(batch.collect_inputs(batch_inputs), jobs=jobs,
+                                        output_directory=getattr(user_args, "batch_output", None))
+            if not batch.report_batch(summaries):
+                io.error("Batch complete with errors. Please check the messages above.!")
+                return False
+            io.info("Batch complete...!!!")
+            return True
+
+        if getattr(user_args, "incremental", False) and source_file:
+            from scripts import incremental
+            # Every serializer writes one part file per chunk and a manifest, the display outputs
+            # are put together from the rendered chunks. Unchanged chunks are reused.
+            results = incremental.encode_incremental(filePath=source_file, jobs=jobs)
+        elif shards and source_file:
+            from scripts import sharding
+            # Big CSV file. Every serializer writes one part file per shard and a manifest,
+            # the display outputs are still written as one file.
+            results = sharding.encode_sharded(filePath=source_file, shards=shards, jobs=jobs)
+            results += runner.run_all_formats(user_data, jobs=jobs, executor=executor,
+                                              names=display_output.output_registry.keys())
+        else:
+            results = runner.run_all_formats(user_data, jobs=jobs, executor=executor)
+
+        ''' Un-comment below lines, If you want to decode the serialized files or open the display outputs. '''
+        # for result in results:
+        #     if result["kind"] == runner.SERIALIZER:
+        #         encoder.registry[result["name"]].decode(filePath=result["filePath"])
+        #     else:
+        #         common.view_file(file_path=result["filePath"])
+
+        if not runner.report_results(results):
+            io.error("Process complete with errors. Please check the messages above.!")
+            return False
 
         io.info("Process complete...!!!")
         return True
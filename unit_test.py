@@ -8,12 +8,90 @@ Unit test module for Serialization Application
 
 __author__ = 'Arjun Prasad Namdeo'
 
+import os
+import json
+import pickle
+import shutil
+import tempfile
+import threading
 import unittest
+from StringIO import StringIO
+from collections import OrderedDict
 
-from scripts import parser, encoder, display_output, common
+import config
+import benchmark
+from scripts import (parser, encoder, columnar, display_output, common, records, runner, sharding, cache, incremental,
+                     offset_index, query, secondary_index, compression, background, batch, metrics, server, schema,
+                     transcode, html_pages)
 
 
-class TestSerializer(unittest.TestCase):
+class SerializerTestCase(unittest.TestCase):
+    """
+    Base class of the tests. Every test has its own temporary directory, which is also the output directory so the
+    outputs of the tests never end up in output_files, and the records of the template database.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.patch(config, "OUTPUT_DIRECTORY", self.temp_dir)
+        self.expected = parser.UserInputs.build_data_container(data={"filePath": config.TEMPLATE_DATABASE})
+
+    def patch(self, target, name, value):
+        """
+        Set an attribute, like a setting of config, until the end of the test
+        """
+        self.addCleanup(setattr, target, name, getattr(target, name))
+        setattr(target, name, value)
+
+    def temp_path(self, *names):
+        """
+        Path in the temporary directory of the test
+        """
+        return os.path.join(self.temp_dir, *names)
+
+
+class TestRecords(SerializerTestCase):
+    """
+    Records and the streaming of the input rows
+    """
+
+    def test_records(self):
+        shot_info = OrderedDict([('Sequence', 'sq010'), ('ShotName', 'sh0100'), ('FrameNum', 112)])
+        shot_record = records.to_record(shot_info)
+
+        self.assertEqual(shot_record, shot_info)
+        self.assertEqual(shot_record.keys(), shot_info.keys())
+        self.assertEqual(shot_record, pickle.loads(pickle.dumps(shot_record)))
+        # records are pickled as OrderedDict, so the pickles do not need this package to be loaded
+        self.assertNotIn("scripts", pickle.dumps(shot_record))
+        self.assertIs(type(pickle.loads(pickle.dumps(shot_record, pickle.HIGHEST_PROTOCOL))), OrderedDict)
+
+        # rows of the same csv share one RecordType
+        other_record = records.record_type(shot_info.keys())(['sq020', 'sh0200', 52])
+        self.assertIs(shot_record._type, other_record._type)
+
+        # records render the same json text as the OrderedDict
+        json_output = StringIO()
+        encoder.JsonSerializer().write(json_output, [shot_record, shot_record])
+        expected = json.dumps([shot_info, shot_info], indent=encoder.JsonSerializer.INDENT)
+        self.assertEqual(json_output.getvalue(), expected)
+
+    def test_streaming_pipeline(self):
+        lazy_data = parser.DataContainer(information={"filePath": config.TEMPLATE_DATABASE})
+
+        for serializer_class in [encoder.JsonSerializer, encoder.PickleSerializer]:
+            filePath = self.temp_path("stream" + serializer_class.TEMP_FILE_EXT)
+            serializer_class(data=lazy_data).encode(filePath=filePath)
+            self.assertEqual(self.expected, serializer_class.decode(filePath=filePath))
+
+        # lazy data should render exactly the same output as the in-memory list
+        for exporter_class in [display_output.HtmlExporter, display_output.TextExporter]:
+            self.assertEqual(exporter_class(data=self.expected).convert_data2string(),
+                             exporter_class(data=lazy_data).convert_data2string())
+
+
+class TestSerializer(SerializerTestCase):
     """
     Unit Test class for serializer
     """
@@ -58,6 +136,809 @@ class TestSerializer(unittest.TestCase):
         # open the text file in default browser
         common.view_file(file_path=text_file)
 
+    def test_compression(self):
+        csvPath = benchmark.write_synthetic_csv(self.temp_path("shots.csv"), rows=3000)
+        expected = parser.UserInputs.build_data_container(data={"filePath": csvPath})
+
+        # the container can be read from any position, and line by line
+        content = "".join("line %d\n" % number for number in xrange(2000))
+        with compression.open_output(self.temp_path("lines.txt"), "w", "zlib") as writeFile:
+            writeFile.chunk_size = 1000
+            writeFile.write(content)
+        with compression.open_input(self.temp_path("lines.txt"), "r") as readFile:
+            self.assertEqual(readFile.read(), content)
+            readFile.seek(12345)
+            self.assertEqual(readFile.read(100), content[12345:12445])
+            readFile.seek(0)
+            self.assertEqual(list(readFile), content.splitlines(True))
+
+        for codec_name in compression.codecs:
+            for serializer_class in [encoder.JsonSerializer, encoder.PickleSerializer, columnar.ColumnarSerializer]:
+                plainPath = serializer_class(data=expected).encode(
+                    self.temp_path("data" + serializer_class.TEMP_FILE_EXT))
+                filePath = serializer_class(data=expected).encode(plainPath, index=True, compression=codec_name)
+                self.assertEqual(filePath, plainPath + "." + codec_name)
+                self.assertTrue(compression.is_compressed(filePath))
+                self.assertLess(os.path.getsize(filePath), os.path.getsize(plainPath))
+
+                self.assertEqual(list(serializer_class.decode(filePath)), expected)
+                self.assertEqual(list(serializer_class.iter_decode(filePath)), expected)
+                self.assertEqual(serializer_class.decode(filePath, records=[2500, 7]), [expected[2500], expected[7]])
+                self.assertEqual(list(query.query(filePath, {"ShotName": "sh0000042"})), [expected[42]])
+
+    def test_pickle_protocol(self):
+        expected = self.expected
+        self.assertEqual(encoder.PickleSerializer.resolve_protocol(), pickle.HIGHEST_PROTOCOL)
+        self.assertRaises(ValueError, encoder.PickleSerializer.resolve_protocol, pickle.HIGHEST_PROTOCOL + 1)
+
+        sizes = dict()
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            filePath = encoder.PickleSerializer(data=expected, protocol=protocol).encode(
+                self.temp_path("data%s.pickle" % protocol), index=True)
+            sizes[protocol] = os.path.getsize(filePath)
+            self.assertEqual(encoder.PickleSerializer.decode(filePath), expected)
+            self.assertEqual(encoder.PickleSerializer.decode(filePath, records=[5, 0]), [expected[5], expected[0]])
+        self.assertLess(sizes[pickle.HIGHEST_PROTOCOL], sizes[0])
+
+        # without offset index the file is one pickled list of the records, like the files of the older versions
+        self.patch(config, "PICKLE_MEMO_RECORDS", 4)
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            for data in [expected, expected[:1], []]:
+                filePath = encoder.PickleSerializer(data=iter(data), protocol=protocol).encode(
+                    self.temp_path("list%s.pickle" % protocol))
+                with open(filePath, "rb") as readFile:
+                    self.assertEqual(pickle.load(readFile), data)
+                self.assertEqual(encoder.PickleSerializer.decode(filePath), data)
+
+        # the records are pickled as OrderedDict and decoded back into records, in the order of the fields
+        filePath = encoder.PickleSerializer(data=expected).encode(self.temp_path("records.pickle"))
+        decoded = list(encoder.PickleSerializer.iter_decode(filePath=filePath, as_records=True))
+        self.assertTrue(all(isinstance(each_record, records.Record) for each_record in decoded))
+        self.assertEqual([each_record.keys() for each_record in decoded], [each.keys() for each in expected])
+
+        # files of the older versions, pickled with the default text protocol
+        filePath = self.temp_path("legacy.pickle")
+        with open(filePath, "wb") as writeFile:
+            benchmark.write_legacy_pickle(writeFile, expected)
+        self.assertEqual(encoder.PickleSerializer.decode(filePath), expected)
+
+        # columnar datasets are pickled as the bytes of the file
+        columnarPath = columnar.ColumnarSerializer(data=expected).encode(self.temp_path("data.col"))
+        with columnar.ColumnarSerializer.decode(columnarPath) as dataset:
+            self.assertEqual(list(pickle.loads(pickle.dumps(dataset, pickle.HIGHEST_PROTOCOL))), expected)
+
+    def test_compact_json(self):
+        shot_info = OrderedDict([('Sequence', 'sq010'), ('ShotName', u'sh0100\u00e9'), ('FrameNum', 112),
+                                 ('Done', False)])
+        json_output = StringIO()
+        encoder.JsonSerializer(compact=True).write(json_output, [records.to_record(shot_info), shot_info])
+        self.assertEqual(json_output.getvalue(), json.dumps([shot_info, shot_info], separators=(",", ":")))
+
+        expected = self.expected
+        prettyPath = encoder.JsonSerializer(data=expected).encode(self.temp_path("pretty.json"))
+        filePath = encoder.JsonSerializer(data=expected, compact=True).encode(self.temp_path("compact.json"),
+                                                                              index=True)
+        self.assertLess(os.path.getsize(filePath), os.path.getsize(prettyPath))
+
+        self.assertEqual(encoder.JsonSerializer.decode(filePath), expected)
+        self.assertEqual(list(encoder.JsonSerializer.iter_decode(filePath)), expected)
+        self.assertEqual(encoder.JsonSerializer.decode(filePath, records=[-1, 3]), [expected[-1], expected[3]])
+
+        # the standard json module is the default backend, the faster ones have to be chosen
+        self.assertEqual(config.JSON_BACKEND, "json")
+        self.assertIs(encoder.get_json_backend(), json)
+        self.assertIs(encoder.get_json_backend("json"), json)
+        self.assertRaises(ImportError, encoder.get_json_backend, "no_such_json_backend")
+
+    def test_atomic_output(self):
+        filePath = self.temp_path("data.json")
+        with common.open_atomic(filePath, "w") as writeFile:
+            writeFile.write("old")
+        with common.open_atomic(filePath, "w") as writeFile:
+            writeFile.write("new")
+            # readers still see the complete old file
+            with open(filePath) as readFile:
+                self.assertEqual(readFile.read(), "old")
+        with open(filePath) as readFile:
+            self.assertEqual(readFile.read(), "new")
+
+        # failed writes keep the old file
+        with self.assertRaises(ValueError):
+            with common.open_atomic(filePath, "w") as writeFile:
+                writeFile.write("broken")
+                raise ValueError("broken")
+        with open(filePath) as readFile:
+            self.assertEqual(readFile.read(), "new")
+        zlibPath = encoder.JsonSerializer(data=[{"Shot": "sh010"}]).encode(filePath, compression="zlib")
+        with self.assertRaises(TypeError):
+            encoder.JsonSerializer(data=[{"Shot": "sh020"}, {"Shot": object()}]).encode(filePath, compression="zlib")
+        self.assertEqual(encoder.JsonSerializer.decode(zlibPath), [{"Shot": "sh010"}])
+        self.assertRaises(ValueError, common.AtomicFile, filePath, "w", fsync="always")
+
+        # parallel jobs writing the same path never mix their content
+        datasets = [[{"Shot": "sh%03d" % job, "Row": row} for row in range(200)] for job in range(8)]
+        common_path = self.temp_path("shared", "serialized_data.json")
+        self.patch(config, "OUTPUT_FSYNC", "full")
+        tasks = [encoder.JsonSerializer(data=data).encode_async(common_path) for data in datasets]
+        self.assertEqual([task.get() for task in tasks], [common_path] * len(datasets))
+        self.assertIn(encoder.JsonSerializer.decode(common_path), datasets)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(common_path)) if common.is_temp_path(name)],
+                         [])
+
+        # per-run output directories
+        self.assertNotEqual(common.get_run_directory(self.temp_dir), common.get_run_directory(self.temp_dir))
+        self.assertTrue(common.get_run_directory(self.temp_dir, "nightly").endswith(os.path.join("runs", "nightly")))
+
+    def test_transcode(self):
+        user_data = parser.DataContainer(information={"filePath": config.TEMPLATE_DATABASE})
+        jsonPath = encoder.JsonSerializer(data=user_data).encode(self.temp_path("shots.json"))
+
+        # the records are streamed into the new format, the output is the same as encoding the source data
+        picklePath = transcode.transcode(jsonPath, dst_format="pickle", dstPath=self.temp_path("shots.pickle"))
+        self.assertEqual(encoder.PickleSerializer.decode(picklePath), list(user_data))
+        copyPath = transcode.transcode(picklePath, dst_format="JsonSerializer", dstPath=self.temp_path("copy.json"))
+        with open(jsonPath) as source, open(copyPath) as copy:
+            self.assertEqual(source.read(), copy.read())
+        htmlPath = transcode.transcode(jsonPath, dst_format="html", dstPath=self.temp_path("shots.html"))
+        with open(htmlPath) as readFile:
+            self.assertEqual(readFile.read(), display_output.HtmlExporter(data=user_data).convert_data2string())
+
+        # the number of records is known from the manifests and the offset indexes
+        encoder.JsonSerializer(data=user_data).encode(jsonPath, index=True)
+        self.assertEqual(len(transcode.open_decoded(jsonPath)), len(list(user_data)))
+        self.assertFalse(hasattr(transcode.open_decoded(picklePath), "__len__"))
+
+        # the serializer of a file is found from the manifest or from the extension, under the codec extension
+        self.assertIs(encoder.find_serializer(self.temp_path("shots.json.zlib")), encoder.JsonSerializer)
+        self.assertIs(encoder.find_serializer(self.temp_path("shots.col")), columnar.ColumnarSerializer)
+        self.assertRaises(ValueError, transcode.transcode, htmlPath, dst_format="pickle")
+        self.assertRaises(ValueError, transcode.transcode, jsonPath, src_format="html", dst_format="pickle")
+        self.assertRaises(ValueError, transcode.transcode, jsonPath, dst_format="yaml")
+
+
+class TestColumnar(SerializerTestCase):
+    """
+    Columnar serializer, its typed and dictionary encoded columns
+    """
+
+    def test_columnar_serializer(self):
+        shot_record = records.record_type(['Sequence', 'FrameNum', 'Assignee'])
+        user_data = [shot_record(['sq010', frame, artist]) for frame, artist in [(112, 'Bob'), (56, u'K\xe4thy')]]
+
+        filePath = columnar.ColumnarSerializer(data=iter(user_data)).encode(filePath=self.temp_path("shots.col"))
+        with columnar.ColumnarSerializer.decode(filePath=filePath) as dataset:
+            self.assertEqual(len(dataset), 2)
+            self.assertEqual(list(dataset), user_data)
+            self.assertEqual(dataset[-1], user_data[-1])
+            self.assertEqual(dataset[0:2], user_data[0:2])
+            self.assertEqual(dataset[-1:], user_data[-1:])
+            self.assertEqual(dataset[::-1], user_data[::-1])
+            self.assertIsInstance(dataset.columns['FrameNum'], columnar.IntColumn)
+            self.assertEqual(list(dataset.columns['FrameNum'].toarray()), [112, 56])
+            self.assertEqual(dataset.columns['Assignee'][1], u'K\xe4thy')
+
+        # floats, booleans and None values are decoded with their type
+        typed_record = records.record_type(['FrameNum', 'Ratio', 'Done', 'Assignee'])
+        typed_data = [typed_record([112, 0.5, True, None]), typed_record([None, None, False, 'Bob'])]
+        filePath = columnar.ColumnarSerializer(data=typed_data).encode(self.temp_path("typed.col"))
+        with columnar.ColumnarSerializer.decode(filePath=filePath) as dataset:
+            self.assertEqual(list(dataset), typed_data)
+            self.assertEqual([type(value) for value in dataset[0].values()], [int, float, bool, type(None)])
+            self.assertIsInstance(dataset.columns['Ratio'], columnar.NullableColumn)
+            self.assertIsInstance(dataset.columns['Ratio'].column, columnar.FloatColumn)
+            self.assertIsInstance(dataset.columns['Done'], columnar.BoolColumn)
+
+        # values which have no column type are not written as text
+        mixed_data = [typed_record([112, 0.5, True, 'Bob']), typed_record(['112', 0.5, True, 'Bob'])]
+        self.assertRaises(ValueError, columnar.ColumnarSerializer(data=mixed_data).encode, self.temp_path("mixed.col"))
+
+    def test_dictionary_encoding(self):
+        shot_record = records.record_type(['Sequence', 'ShotName', 'Assignee'])
+        user_data = [shot_record(['sq%03d' % (number % 3), 'sh%04d' % number, [u'K\xe4thy', 'Bob'][number % 2]])
+                     for number in range(20)]
+
+        filePath = columnar.ColumnarSerializer(data=user_data).encode(filePath=self.temp_path("shots.col"))
+        with columnar.ColumnarSerializer.decode(filePath=filePath) as dataset:
+            self.assertEqual(list(dataset), user_data)
+            self.assertIsInstance(dataset.columns['Sequence'], columnar.DictColumn)
+            self.assertEqual(dataset.columns['Assignee'].dictionary, [u'K\xe4thy', u'Bob'])
+            self.assertEqual(list(dataset.columns['Assignee'].codes()[:4]), [0, 1, 0, 1])
+            # the unique values are not worth a dictionary
+            self.assertIsInstance(dataset.columns['ShotName'], columnar.StringColumn)
+        self.assertEqual(list(query.query(filePath, {"Sequence": "sq001", "Assignee": "Bob"})),
+                         [each for each in user_data if each["Sequence"] == "sq001" and each["Assignee"] == "Bob"])
+
+        self.patch(config, "COLUMNAR_DICTIONARY_SIZE", 0)
+        plainPath = columnar.ColumnarSerializer(data=user_data).encode(self.temp_path("plain.col"))
+        with columnar.ColumnarSerializer.decode(filePath=plainPath) as dataset:
+            self.assertIsInstance(dataset.columns['Sequence'], columnar.StringColumn)
+            self.assertEqual(list(dataset), user_data)
+        self.assertLess(os.path.getsize(filePath), os.path.getsize(plainPath))
+
+        # the pickle memo is shared by the records, unless they are read one by one with the offset index
+        picklePath = encoder.PickleSerializer(data=user_data).encode(self.temp_path("shots.pickle"))
+        self.assertEqual(encoder.PickleSerializer.decode(picklePath), user_data)
+        indexedPath = encoder.PickleSerializer(data=user_data).encode(self.temp_path("indexed.pickle"), index=True)
+        self.assertEqual(encoder.PickleSerializer.decode(indexedPath, records=[19, 2]), [user_data[19], user_data[2]])
+        self.assertLess(os.path.getsize(picklePath), os.path.getsize(indexedPath))
+
+        # the parsed rows share the strings of the repeated values
+        self.assertEqual(self.expected, list(parser.DataContainer(information={"filePath": config.TEMPLATE_DATABASE})))
+        self.assertIs(self.expected[0]["Sequence"], self.expected[1]["Sequence"])
+
+
+class TestExporters(SerializerTestCase):
+    """
+    Text and HTML exports
+    """
+
+    def test_exporter_rows(self):
+        shot_record = records.record_type(['Sequence', 'ShotName'])(['sq010', 'sh0100'])
+
+        html_row = display_output.HtmlExporter(data=None).render_row(shot_record)
+        self.assertEqual(html_row, "\t\t<tr>\n\t\t\t<td align='center'> sq010 </td>\n\t\t\t"
+                                   "<td align='center'> sh0100 </td>\n\t\t\t\n\t\t</tr>\n")
+
+        text_row = display_output.TextExporter(data=None).render_row(shot_record)
+        self.assertEqual(text_row, "\tSequence\t\t=\tsq010 \n\tShotName\t\t=\tsh0100 \n\n"
+                                   "------------------------------------------------\n")
+
+        # output should not depend on the chunk size
+        user_data = [shot_record] * 7
+        for exporter_class in [display_output.HtmlExporter, display_output.TextExporter]:
+            exporter = exporter_class(data=user_data)
+            expected = exporter.convert_data2string()
+            exporter.ROWS_PER_CHUNK = 2
+            self.assertEqual(exporter.convert_data2string(), expected)
+            self.assertEqual(expected.count(exporter.render_row(shot_record)), 7)
+
+    def test_html_pages(self):
+        user_data = list(parser.DataContainer(information={"filePath": config.TEMPLATE_DATABASE}))
+        filePath = self.temp_path("display_output.html")
+        exporter = display_output.HtmlExporter(data=user_data, page_size=4, viewer=True)
+        self.assertEqual(exporter.export(filePath), filePath)
+
+        pages_directory = self.temp_path("display_output_pages")
+        pages = [os.path.join(pages_directory, "page-%05d.html" % number) for number in (1, 2, 3)]
+        self.assertEqual(sorted(os.listdir(pages_directory)),
+                         ["chunk-00001.js", "chunk-00002.js", "chunk-00003.js", "page-00001.html",
+                          "page-00002.html", "page-00003.html", "viewer.html"])
+        # every page has the rows of the single html file, with the links to the other pages
+        single_page = display_output.HtmlExporter(data=user_data).convert_data2string()
+        with open(pages[1]) as readFile:
+            page = readFile.read()
+        self.assertIn("".join(map(exporter.render_row, user_data[4:8])), single_page)
+        self.assertIn("".join(map(exporter.render_row, user_data[4:8])), page)
+        self.assertIn('href="page-00001.html">Previous', page)
+        self.assertIn('href="page-00003.html">Next', page)
+        with open(filePath) as readFile:
+            index_page = readFile.read()
+        self.assertIn("Total Entries : %s in 3 pages" % len(user_data), index_page)
+        self.assertIn("<th> Sequence </th>", index_page)
+        with open(os.path.join(pages_directory, "chunk-00003.js")) as readFile:
+            self.assertEqual(readFile.read(), "loadChunk(3, %s);\n" % json.dumps(
+                [each_record.values() for each_record in user_data[8:]]))
+        # the scrolling area of the viewer is capped, browsers cap the height of an element
+        with open(os.path.join(pages_directory, "viewer.html")) as readFile:
+            viewer = readFile.read()
+        self.assertIn("var TOTAL = %s, CHUNK_SIZE = 4, ROW_HEIGHT = 24, MAX_HEIGHT = %s;" % (
+            len(user_data), html_pages.VIEWER_MAX_HEIGHT), viewer)
+        self.assertIn("spacerHeight = Math.min(rowsHeight, MAX_HEIGHT)", viewer)
+
+        # a smaller export removes the pages and the viewer of the older one
+        display_output.HtmlExporter(data=user_data, page_size=len(user_data)).export(filePath)
+        self.assertEqual(os.listdir(pages_directory), ["page-00001.html"])
+
+
+class TestIndexes(SerializerTestCase):
+    """
+    Offset indexes, secondary indexes and the queries which use them
+    """
+
+    def test_offset_index(self):
+        expected = self.expected
+        for serializer_class in [encoder.JsonSerializer, encoder.PickleSerializer, columnar.ColumnarSerializer]:
+            filePath = self.temp_path("data" + serializer_class.TEMP_FILE_EXT)
+            serializer_class(data=parser.DataContainer({"filePath": config.TEMPLATE_DATABASE})).encode(
+                filePath, index=True)
+            self.assertEqual(os.path.isfile(offset_index.get_index_path(filePath)), serializer_class.INDEXABLE)
+
+            self.assertEqual(serializer_class.decode(filePath, records=[3, 0, -1]),
+                             [expected[3], expected[0], expected[-1]])
+            self.assertEqual(serializer_class.decode(filePath, records=slice(2, 6)), expected[2:6])
+            self.assertRaises(IndexError, serializer_class.decode, filePath, records=[len(expected)])
+
+        # an index of an older file is not used, also when the new file has the same size
+        filePath = self.temp_path("data.json")
+        with offset_index.OffsetIndex(offset_index.get_index_path(filePath)) as index:
+            self.assertTrue(index.is_current(filePath))
+            os.utime(filePath, (0, 0))
+            self.assertFalse(index.is_current(filePath))
+        with open(filePath, "a") as writeFile:
+            writeFile.write("\n")
+        self.assertEqual(encoder.JsonSerializer.decode(filePath, records=[4]), [expected[4]])
+        encoder.JsonSerializer(data=expected).encode(filePath)
+        self.assertFalse(os.path.isfile(offset_index.get_index_path(filePath)))
+
+        results = sharding.encode_sharded(config.TEMPLATE_DATABASE, shards=3, jobs=1, output_directory=self.temp_dir)
+        for result in results:
+            self.assertEqual(encoder.registry[result["name"]].decode(result["filePath"], records=[8, 1, 5]),
+                             [expected[8], expected[1], expected[5]])
+
+    def test_query(self):
+        csvPath = benchmark.write_synthetic_csv(self.temp_path("shots.csv"), rows=3000)
+        expected = parser.UserInputs.build_data_container(data={"filePath": csvPath})
+        where = [("Sequence", "==", "sq0010"), ("Assignee", "in", [benchmark.ARTISTS[1], benchmark.ARTISTS[2]]),
+                 ("FrameNum", ">", 200)]
+        matches = [each for each in expected if each["Sequence"] == "sq0010" and
+                   each["Assignee"] in benchmark.ARTISTS[1:3] and int(each["FrameNum"]) > 200]
+        self.assertTrue(0 < len(matches) < 100)
+
+        indexes = {"Sequence": secondary_index.HASH, "Assignee": secondary_index.HASH,
+                   "FrameNum": secondary_index.SORTED}
+        for serializer_class in [encoder.JsonSerializer, encoder.PickleSerializer, columnar.ColumnarSerializer]:
+            filePath = self.temp_path("data" + serializer_class.TEMP_FILE_EXT)
+            serializer_class(data=expected).encode(filePath)
+            # streaming scan, without indexes
+            self.assertIsNone(query.plan_query(filePath, query.build_predicates(where)))
+            self.assertEqual(list(query.query(filePath, where)), matches)
+
+            serializer_class(data=expected).encode(filePath, secondary_indexes=indexes)
+            candidates = query.plan_query(filePath, query.build_predicates(where))
+            self.assertEqual(len(candidates), len(matches))
+            self.assertEqual(list(query.query(filePath, where)), matches)
+            self.assertEqual(list(query.query(filePath, [("FrameNum", "<=", 2)])),
+                             [each for each in expected if int(each["FrameNum"]) <= 2])
+            self.assertEqual(list(query.query(filePath, {"ShotName": "sh0000007"})), [expected[7]])
+
+        self.assertEqual(list(encoder.JsonSerializer.iter_decode(self.temp_path("data.json"))), expected)
+        self.assertRaises(ValueError, query.Predicate, "FrameNum", "~", 1)
+
+    def test_decode_cache(self):
+        expected = self.expected
+        filePath = encoder.JsonSerializer(data=expected).encode(self.temp_path("data.json"))
+        decode_cache = cache.DecodeCache(directory=self.temp_path("cache"))
+
+        first = encoder.JsonSerializer.decode(filePath, cache=decode_cache)
+        self.assertEqual(first, expected)
+        self.assertIs(encoder.JsonSerializer.decode(filePath, cache=decode_cache), first)
+        stats = decode_cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+        # a changed file is decoded again
+        encoder.JsonSerializer(data=expected[:3]).encode(filePath)
+        os.utime(filePath, (0, 0))
+        self.assertEqual(encoder.JsonSerializer.decode(filePath, cache=decode_cache), expected[:3])
+        self.assertEqual(decode_cache.get_stats()["invalidations"], 1)
+
+        # pre-parsed data is loaded from disk by a new cache
+        disk_cache = cache.DecodeCache(directory=decode_cache.directory)
+        self.assertEqual(encoder.JsonSerializer.decode(filePath, cache=disk_cache), expected[:3])
+        self.assertEqual(disk_cache.get_stats()["disk_hits"], 1)
+        self.assertEqual(len(os.listdir(decode_cache.directory)), 1)
+
+        # least recently used data is evicted once the size limit is reached
+        picklePath = encoder.PickleSerializer(data=expected).encode(self.temp_path("data.pickle"))
+        small_cache = cache.DecodeCache(max_bytes=cache.estimate_size(encoder.PickleSerializer.decode(picklePath)) + 1)
+        encoder.JsonSerializer.decode(filePath, cache=small_cache)
+        encoder.PickleSerializer.decode(picklePath, cache=small_cache)
+        stats = small_cache.get_stats()
+        self.assertEqual((stats["evictions"], stats["entries"]), (1, 1))
+        self.assertLessEqual(stats["bytes"], stats["max_bytes"])
+
+        content_cache = cache.DecodeCache(validation=cache.CONTENT)
+        self.assertEqual(encoder.PickleSerializer.decode(picklePath, cache=content_cache), expected)
+        self.assertEqual(encoder.PickleSerializer.decode(picklePath, cache=content_cache), expected)
+        self.assertEqual(content_cache.get_stats()["hits"], 1)
+
+
+class TestParallel(SerializerTestCase):
+    """
+    Parallel formats, shards, incremental encoding, batches and background tasks
+    """
+
+    def test_parallel_formats(self):
+        user_data = parser.DataContainer(information={"filePath": config.TEMPLATE_DATABASE})
+
+        for executor in runner.EXECUTORS:
+            output_directory = self.temp_path(executor)
+            results = runner.run_all_formats(user_data, jobs=3, executor=executor, output_directory=output_directory)
+            self.assertEqual([(result["kind"], result["name"]) for result in results], runner.get_format_tasks())
+            self.assertTrue(runner.report_results(results))
+
+            json_path = os.path.join(output_directory, encoder.JsonSerializer.TEMP_FILE_NAME)
+            self.assertEqual(encoder.JsonSerializer.decode(filePath=json_path), self.expected)
+
+        # errors are collected in the results instead of being raised
+        result = runner.run_format(runner.SERIALIZER, "JsonSerializer", user_data=[object()],
+                                   output_directory=self.temp_path("errors"))
+        self.assertIn("TypeError", result["error"])
+
+    def test_sharded_encoding(self):
+        information = {"filePath": config.TEMPLATE_DATABASE}
+        expected = self.expected
+
+        # every row is read exactly once, whatever the number of shards
+        headers, _ = sharding.read_headers(config.TEMPLATE_DATABASE)
+        for shards in [1, 2, 3, 7, 50]:
+            shard_data = list()
+            for byte_range in sharding.find_shard_ranges(config.TEMPLATE_DATABASE, shards):
+                shard_information = dict(information, byteRange=byte_range, headers=headers)
+                shard_data.extend(parser.UserInputs.build_data_container(data=shard_information))
+            self.assertEqual(shard_data, expected)
+
+        metrics.default_metrics.reset()
+        results = sharding.encode_sharded(config.TEMPLATE_DATABASE, shards=3, jobs=2, output_directory=self.temp_dir)
+        self.assertTrue(runner.report_results(results))
+        # the metrics of the pool workers are added to the metrics of this process
+        self.assertEqual(metrics.default_metrics.get("rows", operation="encode", format="JsonSerializer"),
+                         len(expected))
+
+        manifests = dict((result["name"], result["filePath"]) for result in results)
+        for name in ["JsonSerializer", "PickleSerializer"]:
+            self.assertEqual(encoder.registry[name].decode(filePath=manifests[name]), expected)
+
+        with columnar.ColumnarSerializer.decode(filePath=manifests["ColumnarSerializer"]) as dataset:
+            self.assertEqual(len(dataset), len(expected))
+            self.assertEqual(list(dataset), expected)
+            self.assertEqual(dataset[-1], expected[-1])
+            self.assertEqual(dataset[2:-2], expected[2:-2])
+            self.assertEqual(dataset.columns["ShotName"][4], expected[4]["ShotName"])
+
+        self.assertRaises(ValueError, encoder.PickleSerializer.decode, manifests["JsonSerializer"])
+
+    def test_incremental_encoding(self):
+        self.patch(incremental, "CHUNK_MASK", 31)
+        self.patch(incremental, "MIN_CHUNK_ROWS", 8)
+        self.patch(incremental, "MAX_CHUNK_ROWS", 128)
+        csvPath = benchmark.write_synthetic_csv(self.temp_path("shots.csv"), rows=2000)
+        output_directory = self.temp_path("output")
+
+        def check_outputs(results):
+            self.assertTrue(runner.report_results(results))
+            information = {"filePath": csvPath}
+            expected = parser.UserInputs.build_data_container(data=information)
+            for result in results:
+                if result["kind"] == runner.SERIALIZER:
+                    self.assertEqual(list(encoder.registry[result["name"]].decode(result["filePath"])), expected)
+                else:
+                    exporter = display_output.output_registry[result["name"]](data=expected)
+                    with open(result["filePath"]) as readFile:
+                        self.assertEqual(readFile.read(), exporter.convert_data2string())
+            return dict((result["name"], result["written"]) for result in results)
+
+        written = check_outputs(incremental.encode_incremental(csvPath, output_directory=output_directory))
+        chunks = len(incremental.find_chunks(csvPath))
+        self.assertGreater(chunks, 3)
+        self.assertEqual(set(written.values()), set([chunks]))
+
+        # nothing changed
+        written = check_outputs(incremental.encode_incremental(csvPath, output_directory=output_directory))
+        self.assertEqual(set(written.values()), set([0]))
+
+        # one row changed and a few rows added in the middle
+        with open(csvPath) as readFile:
+            lines = readFile.readlines()
+        lines[1000] = lines[1000].replace("sh", "changed_sh")
+        lines[500:500] = lines[10:15]
+        with open(csvPath, "w") as writeFile:
+            writeFile.writelines(lines)
+
+        written = check_outputs(incremental.encode_incremental(csvPath, output_directory=output_directory))
+        self.assertLessEqual(max(written.values()), 4)
+        self.assertGreater(min(written.values()), 0)
+
+        chunk_files = os.listdir(os.path.join(output_directory, incremental.CHUNK_DIRECTORY))
+        self.assertEqual(len([name for name in chunk_files if name.endswith(".json")]),
+                         len(incremental.find_chunks(csvPath)))
+
+    def test_incremental_schema(self):
+        csvPath = self.temp_path("shots.csv")
+        shutil.copy(config.TEMPLATE_DATABASE, csvPath)
+        output_directory = self.temp_path("output")
+        names = ["JsonSerializer", "PickleSerializer"]
+        manifestPaths = [result["filePath"] for result in
+                         incremental.encode_incremental(csvPath, names=names, output_directory=output_directory)]
+        self.assertEqual(encoder.JsonSerializer.decode(manifestPaths[0])[0]["FrameNum"], "112")
+
+        # the chunks are written again with the types of the inferred schema, which is kept next to the manifest
+        self.patch(config, "SCHEMA_INFER", True)
+        results = incremental.encode_incremental(csvPath, names=names, output_directory=output_directory)
+        self.assertTrue(all(result["written"] for result in results))
+        for name, manifestPath in zip(names, manifestPaths):
+            serializer_class = encoder.registry[name]
+            self.assertEqual(serializer_class.decode(manifestPath)[0]["FrameNum"], 112)
+            self.assertEqual(serializer_class.read_schema(manifestPath).to_dict()["fields"][2],
+                             {"name": "FrameNum", "type": "int"})
+
+        self.patch(config, "SCHEMA_INFER", False)
+        incremental.encode_incremental(csvPath, names=names, output_directory=output_directory)
+        self.assertEqual(encoder.PickleSerializer.decode(manifestPaths[1])[0]["FrameNum"], "112")
+        self.assertIsNone(encoder.PickleSerializer.read_schema(manifestPaths[1]))
+
+    def test_batch_mode(self):
+        for directory in ["a", "b"]:
+            os.makedirs(self.temp_path(directory))
+            shutil.copy(config.TEMPLATE_DATABASE, self.temp_path(directory, "shots.csv"))
+        shutil.copy(config.TEMPLATE_DATABASE, self.temp_path("b", "extra.csv"))
+        with open(self.temp_path("b", "notes.txt"), "w") as writeFile:
+            writeFile.write("not an input")
+
+        inputs = batch.collect_inputs([self.temp_path("a"), self.temp_path("b", "*"), self.temp_path("a", "shots.csv")])
+        self.assertEqual([os.path.relpath(filePath, self.temp_dir) for filePath in inputs],
+                         ["a/shots.csv", "b/extra.csv", "b/shots.csv"])
+
+        output_directory = self.temp_path("out")
+        summaries = batch.run_batch(inputs, jobs=2, output_directory=output_directory)
+        self.assertTrue(batch.report_batch(summaries))
+        self.assertEqual([os.path.basename(summary["output_directory"]) for summary in summaries],
+                         ["shots", "extra", "shots-2"])
+        for summary in summaries:
+            self.assertEqual(summary["rows"], len(self.expected))
+            self.assertGreater(summary["output_bytes"], 0)
+            filePath = os.path.join(summary["output_directory"], encoder.JsonSerializer.TEMP_FILE_NAME)
+            self.assertEqual(encoder.JsonSerializer.decode(filePath), self.expected)
+
+        # a broken input is reported in its summary, the others still run
+        summaries = batch.run_batch([inputs[0], self.temp_path("missing.csv")], output_directory=output_directory)
+        self.assertIsNone(summaries[0]["error"])
+        self.assertIsNotNone(summaries[1]["error"])
+        self.assertFalse(batch.report_batch(summaries))
+
+    def test_background_tasks(self):
+        expected = self.expected
+        with background.BackgroundExecutor(workers=2, max_pending=1) as executor:
+            tasks = [encoder.JsonSerializer(data=expected).encode_async(
+                self.temp_path("data%s.json" % index), executor=executor) for index in xrange(8)]
+            tasks.append(display_output.TextExporter(data=expected).export_async(
+                self.temp_path("output.txt"), executor=executor))
+            filePaths = [task.get(timeout=60) for task in tasks]
+            self.assertTrue(all(os.path.isfile(filePath) for filePath in filePaths))
+
+            decode_tasks = [encoder.JsonSerializer.decode_async(filePath, executor=executor)
+                            for filePath in filePaths[:-1]]
+            self.assertTrue(all(task.get(timeout=60) == expected for task in decode_tasks))
+
+            finished = list()
+            failed_task = executor.submit(int, "not a number")
+            failed_task.add_done_callback(finished.append)
+            self.assertRaises(background.BackgroundError, failed_task.get, 60)
+            self.assertEqual(finished, [failed_task])
+            self.assertFalse(failed_task.successful())
+
+        with background.BackgroundExecutor(workers=2, executor=background.PROCESS) as executor:
+            filePath = encoder.PickleSerializer(data=expected).encode_async(
+                self.temp_path("data.pickle"), executor=executor, index=True).get(timeout=60)
+            task = encoder.PickleSerializer.decode_async(filePath, executor=executor, records=[4, 1])
+            self.assertEqual(task.get(timeout=60), [expected[4], expected[1]])
+
+            # calls and results which can not be pickled fail, they do not hang
+            self.assertRaises(TypeError, executor.submit, len, threading.Lock())
+            task = executor.submit(threading.Lock)
+            self.assertRaises(background.BackgroundError, task.get, 60)
+
+
+class TestSchema(SerializerTestCase):
+    """
+    Schema validation and inference
+    """
+
+    def test_schema(self):
+        filePath = self.temp_path("shots.csv")
+        with open(filePath, "w") as writeFile:
+            writeFile.write("Sequence,ShotName,FrameNum\nsq010,sh010,12\nsq010,bad,0\n,sh030,x\nsq020,sh040,7\n")
+        shot_schema = schema.load_schema(os.path.join("database", "shot_schema.json"))
+
+        # every error of every invalid row is reported with its row number
+        report = schema.validate_file(filePath, shot_schema)
+        self.assertEqual((report.rows, report.invalid_rows), (4, 2))
+        self.assertEqual([(row_number, field) for row_number, field, message in report.errors],
+                         [(3, "ShotName"), (3, "FrameNum"), (4, "Sequence"), (4, "FrameNum")])
+
+        # valid rows are converted, missing optional columns take their default
+        self.patch(config, "SCHEMA_FILE", os.path.join("database", "shot_schema.json"))
+        user_data = list(parser.DataContainer(information={"filePath": filePath}))
+        self.assertEqual([(each["ShotName"], each["FrameNum"], each["Assignee"]) for each in user_data],
+                         [("sh010", 12, "Unassigned"), ("sh040", 7, "Unassigned")])
+        self.patch(config, "SCHEMA_ERRORS", schema.FAIL)
+        self.assertRaises(schema.SchemaError, list, parser.DataContainer(information={"filePath": filePath}))
+
+        # batches with an invalid row give the same records as the valid batches
+        validator = shot_schema.compile(["Sequence", "ShotName", "FrameNum"])
+        rows = [["sq010", "sh%03d" % number, str(number)] for number in range(1, 50)]
+        valid = validator.validate(rows, 1, schema.ValidationReport())
+        invalid = validator.validate(rows + [["sq010", "sh050"]], 1, schema.ValidationReport())
+        self.assertEqual(valid, invalid)
+        # rows with a missing or an extra value are found while the records are built
+        report = schema.ValidationReport()
+        self.assertEqual(validator.validate(rows + [["sq010", "sh050", "50", "extra"]], 1, report), valid)
+        self.assertEqual(report.invalid_rows, 1)
+        self.assertRaises(schema.SchemaError, shot_schema.compile, ["Sequence", "FrameNum"])
+        self.assertRaises(schema.SchemaError, schema.Schema([schema.Field("Shot")], strict=True).compile,
+                          ["Shot", "Artist"])
+
+    def test_schema_inference(self):
+        filePath = self.temp_path("shots.csv")
+        with open(filePath, "w") as writeFile:
+            writeFile.write("ShotName,FrameNum,Ratio,Final,Code\nsh010,12,1.5,true,0012\nsh020,,2,False,7\n")
+        self.assertEqual([field.type for field in schema.infer_file_schema(filePath).fields],
+                         ["str", "int", "float", "bool", "str"])
+
+        self.patch(config, "SCHEMA_INFER", True)
+        user_data = parser.DataContainer(information={"filePath": filePath})
+        jsonPath = encoder.JsonSerializer(data=user_data).encode(self.temp_path("shots.json"))
+        columnarPath = columnar.ColumnarSerializer(data=user_data).encode(self.temp_path("shots.col"))
+        # the decoded values have their types, and the schema is written next to the file
+        self.assertEqual(encoder.JsonSerializer.decode(jsonPath),
+                         [{"ShotName": "sh010", "FrameNum": 12, "Ratio": 1.5, "Final": True, "Code": "0012"},
+                          {"ShotName": "sh020", "FrameNum": None, "Ratio": 2.0, "Final": False, "Code": "7"}])
+        self.assertEqual(encoder.JsonSerializer.read_schema(jsonPath).to_dict(),
+                         schema.infer_file_schema(filePath).to_dict())
+
+        # the columnar file decodes the types of the schema
+        with columnar.ColumnarSerializer.decode(columnarPath) as dataset:
+            self.assertEqual(list(dataset), encoder.JsonSerializer.decode(jsonPath))
+        self.assertEqual(encoder.JsonSerializer.read_schema(columnarPath).to_dict(),
+                         schema.infer_file_schema(filePath).to_dict())
+        # the schema of a file written again with the same size is out of date
+        os.utime(columnarPath, (0, 0))
+        self.assertIsNone(encoder.JsonSerializer.read_schema(columnarPath))
+
+        # values after the sample which do not fit the type are reported, like the errors of a schema file
+        inferred = schema.infer_schema(["FrameNum"], [["12"]])
+        report = schema.ValidationReport()
+        records = inferred.compile(["FrameNum"]).validate([["13"], ["14b"]], 1, report)
+        self.assertEqual([each_record["FrameNum"] for each_record in records], [13])
+        self.assertEqual(report.errors, [(3, "FrameNum", "'14b' is not of type int")])
+
+        # data written without schema has no sidecar
+        encoder.JsonSerializer(data=[{"Shot": "sh010"}]).encode(jsonPath)
+        self.assertIsNone(encoder.JsonSerializer.read_schema(jsonPath))
+
+
+class TestTools(SerializerTestCase):
+    """
+    Benchmarks, start up time, metrics and the server
+    """
+
+    def test_benchmark_compare(self):
+        self.assertEqual(benchmark.percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(benchmark.percentile([3, 1, 2, 4], 99), 4)
+
+        formats = [name for _, name, _ in benchmark.get_benchmark_formats()]
+        self.assertTrue(set(encoder.registry).issubset(formats))
+        self.assertTrue(set(display_output.output_registry).issubset(formats))
+
+        result = {"kind": "serializer", "name": "JsonSerializer", "operation": "encode", "rows": 1000,
+                  "throughput_rows_per_sec": 1000.0, "peak_rss_bytes": 100, "output_bytes": 100}
+        slower = dict(result, throughput_rows_per_sec=800.0)
+        regressions = benchmark.compare_results({"results": [slower]}, {"results": [result]}, threshold=0.1)
+        self.assertEqual([regression["metric"] for regression in regressions], ["throughput_rows_per_sec"])
+        self.assertEqual(benchmark.compare_results({"results": [result]}, {"results": [slower]}), [])
+
+    def test_startup(self):
+        # the import time depends on the machine, it is checked against the budget by `benchmark.py --startup`
+        _, modules = benchmark.measure_startup(repeat=1)
+        self.assertEqual([name for name in benchmark.STARTUP_LAZY_MODULES if name in modules], [])
+
+        # declared formats are listed without importing their module
+        registry = common.LazyRegistry()
+        registry.declare("ColumnarSerializer", "scripts.columnar")
+        registry.declare("MissingSerializer", "scripts.no_such_module")
+        self.assertEqual(sorted(registry), ["ColumnarSerializer", "MissingSerializer"])
+        self.assertTrue("MissingSerializer" in registry)
+        self.assertRaises(ImportError, registry.get, "MissingSerializer")
+        self.assertIs(encoder.registry["ColumnarSerializer"], columnar.ColumnarSerializer)
+
+        # output directories are created when a file is written, not at import
+        filePath = encoder.JsonSerializer(data=[{"Sequence": "sq010"}]).encode(self.temp_path("new", "data.json"))
+        self.assertEqual(encoder.JsonSerializer.decode(filePath), [{"Sequence": "sq010"}])
+
+    def test_metrics(self):
+        user_data = [{"Sequence": "sq010", "Shot": "sh%03d" % number} for number in range(5)]
+        stats = metrics.Metrics()
+        self.patch(metrics, "default_metrics", stats)
+        filePath = encoder.JsonSerializer(data=user_data).encode(self.temp_path("data.json"))
+        encoder.JsonSerializer.decode(filePath)
+        exportPath = display_output.TextExporter(data=user_data).export(self.temp_path("data.txt"))
+
+        labels = {"format": "JsonSerializer"}
+        self.assertEqual(stats.get("rows", operation="encode", **labels), 5)
+        self.assertEqual(stats.get("rows", operation="decode", **labels), 5)
+        self.assertEqual(stats.get("rows", operation="export", format="TextExporter"), 5)
+        self.assertEqual(stats.get("bytes_written", operation="encode", **labels), os.path.getsize(filePath))
+        self.assertEqual(stats.get("bytes_read", operation="decode", **labels), os.path.getsize(filePath))
+        self.assertEqual(stats.get("bytes_written", operation="export", format="TextExporter"),
+                         os.path.getsize(exportPath))
+        self.assertEqual(stats.get("operation_seconds", operation="encode", **labels)[0], 1)
+        self.assertEqual([span["operation"] for span in stats.get_spans()], ["encode", "decode", "export"])
+
+        # errors are counted and raised again
+        with self.assertRaises(ValueError):
+            with metrics.trace("decode", metrics=stats, format="Broken"):
+                raise ValueError("broken file")
+        self.assertEqual(stats.get("operation_errors", operation="decode", format="Broken"), 1)
+
+        # cache lookups
+        decode_cache = cache.DecodeCache(max_bytes=1 << 20, directory=self.temp_path("cache"))
+        decode_cache.get("JsonSerializer", filePath, lambda: user_data)
+        decode_cache.get("JsonSerializer", filePath, lambda: user_data)
+        self.assertEqual(stats.get("cache_lookups", format="JsonSerializer", result="miss"), 1)
+        self.assertEqual(stats.get("cache_lookups", format="JsonSerializer", result="hit"), 1)
+
+        # exports and merge of the metrics of another process
+        prometheus = stats.to_prometheus()
+        self.assertIn('serialization_rows{format="JsonSerializer",operation="encode"} 5', prometheus)
+        self.assertIn("# TYPE serialization_operation_seconds summary", prometheus)
+        self.assertEqual(json.loads(stats.to_json())["serialization_rows"]["type"], "counter")
+        self.assertTrue(stats.write(self.temp_path("metrics.prom")).endswith(".prom"))
+
+        merged = metrics.Metrics()
+        merged.merge(stats.dump())
+        merged.merge(stats.dump())
+        self.assertEqual(merged.get("rows", operation="encode", **labels), 10)
+
+        # log levels
+        output = StringIO()
+        self.patch(common.io, "level", common.io.level)
+        self.patch(common.sys, "stdout", output)
+        common.io.set_level("WARN")
+        common.io.info("hidden message")
+        common.io.warn("shown message")
+        common.io.flush()
+        self.assertNotIn("hidden message", output.getvalue())
+        self.assertIn("shown message", output.getvalue())
+
+    def test_server(self):
+        user_data = [OrderedDict([("Sequence", "sq010"), ("Shot", "sh%03d" % number)]) for number in range(3)]
+        with server.SerializationServer(port=0) as http_server:
+            http_server.start()
+            with server.ServerClient(port=http_server.address[1]) as client:
+                self.assertIn("JsonSerializer", json.loads(client.request("/formats"))["serializers"])
+
+                data = client.encode("JsonSerializer", user_data)
+                self.assertEqual(json.loads(data), user_data)
+                data = client.encode("PickleSerializer", "Sequence,Shot\nsq010,sh000\nsq010,sh001\n")
+                self.assertEqual([dict(record.items()) for record in encoder.PickleSerializer.read(StringIO(data))],
+                                 user_data[:2])
+                self.assertIn("sh002", client.export("TextExporter", user_data))
+
+                # the output directory of the test is config.OUTPUT_DIRECTORY
+                filePath = client.export("HtmlExporter", user_data, filePath="shots.html")
+                self.assertEqual(filePath, os.path.join(os.path.realpath(self.temp_dir), "shots.html"))
+                self.assertTrue(os.path.isfile(filePath))
+                # the outputs can not be written outside of the output directory
+                for outsidePath in [os.path.join(tempfile.gettempdir(), "shots.json"), "../shots.json"]:
+                    with self.assertRaises(server.ServerError) as context:
+                        client.encode("JsonSerializer", user_data, filePath=outsidePath)
+                    self.assertEqual(context.exception.status, 403)
+
+                with self.assertRaises(server.ServerError) as context:
+                    client.encode("MissingSerializer", user_data)
+                self.assertEqual(context.exception.status, 404)
+                with self.assertRaises(server.ServerError) as context:
+                    client.request("/encode/JsonSerializer", "not json")
+                self.assertEqual(context.exception.status, 400)
+                with self.assertRaises(server.ServerError) as context:
+                    client.request("/encode/JsonSerializer", json.dumps(user_data), content_type="text/plain")
+                self.assertEqual(context.exception.status, 415)
+
+        socket_path = self.temp_path("server.sock")
+        with server.SerializationServer(socket_path=socket_path) as unix_server:
+            unix_server.start()
+            with server.ServerClient(socket_path=socket_path) as client:
+                self.assertEqual(client.request("/health"), "ok\n")
+                self.assertEqual(json.loads(client.encode("JsonSerializer", user_data)), user_data)
+        self.assertFalse(os.path.exists(socket_path))
+
+        # concurrent requests of the same format run in one batch, with one serializer object
+        batcher = server.RequestBatcher(window=0.2, max_batch=4)
+        tasks = [batcher.submit(server.ENCODE, "JsonSerializer", user_data) for _ in range(4)]
+        tasks.append(batcher.submit(server.ENCODE, "MissingSerializer", user_data))
+        batcher.close()
+        self.assertEqual([json.loads(task.get()) for task in tasks[:4]], [user_data] * 4)
+        self.assertRaises(background.BackgroundError, tasks[4].get)
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()